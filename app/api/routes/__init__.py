@@ -1,7 +1,9 @@
 # app/api/routes/__init__.py
 
 from fastapi import APIRouter
-from app.api.routes import studies
+from app.api.routes import health, metrics, studies
 
 router = APIRouter()
 router.include_router(studies.router, prefix="/studies", tags=["Studies"])
+router.include_router(metrics.router, tags=["Metrics"])
+router.include_router(health.router, tags=["Health"])
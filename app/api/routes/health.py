@@ -0,0 +1,27 @@
+# app/api/routes/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.health import health_checker
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def health_endpoint():
+    """
+    Endpoint reporting the service's health and the status and latency of each
+    dependency (probed at most once per HEALTH_CACHE_TTL seconds). Always 200 while the
+    service runs; see `/ready` for readiness.
+    """
+    return await health_checker.check()
+
+
+@router.get("/ready")
+async def ready_endpoint():
+    """
+    Endpoint for readiness checks: 200 when every dependency in
+    READY_REQUIRED_DEPENDENCIES is up, 503 otherwise.
+    """
+    report = await health_checker.check()
+    ready = health_checker.is_ready(report)
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **report})
@@ -0,0 +1,27 @@
+# app/api/routes/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.database import pool_stats
+from app.core.metrics import CONTENT_TYPE, DB_POOL_CONNECTIONS, JOBS, REGISTRY
+from app.services.jobs import job_manager
+
+router = APIRouter()
+
+
+def _sample_gauges():
+    # Pool and job gauges are read when scraped rather than updated on every change
+    for state, value in pool_stats().items():
+        DB_POOL_CONNECTIONS.labels(state).set(value)
+    for status, count in job_manager.counts().items():
+        JOBS.labels(status).set(count)
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """
+    Endpoint exposing the service metrics in the Prometheus text format: per-stage
+    pipeline and export latency histograms, studies, variants and tags processed,
+    requests in flight and pool usage.
+    """
+    _sample_gauges()
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
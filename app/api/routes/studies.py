@@ -1,60 +1,71 @@
 # app/api/routes/studies.py
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 import logging
 import os
 import json
-from pydantic import BaseModel
-from sqlalchemy import create_engine, text
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from app.core.config import config  # Import the instantiated Config
-from app.services.embeddings_service import EmbeddingsService
-from app.services.vectordb_service import VectorDBService
-from app.loaders.genomic_studies import load_subject_studies_to_datalake, export_subject_studies_to_json
+from app.services.health import health_checker
+from app.services.ingest_daemon import ingest_daemon
+from app.services.jobs import JobQueueFull, job_manager
+from app.services.pipeline import embeddings_service, load_subject_study_file, load_subjects, transfer_subject_studies
+from app.services import study_reads
+from app.services.study_reads import NotFound, read_cache
+from app.services import study_search
+from app.loaders.genomic_studies import export_subject_studies_to_json
 
 # Logger for this file
 logger = logging.getLogger(__name__)
 
-# Initialize services
-embeddings_service = EmbeddingsService()
-vectordb_service = VectorDBService()
-
 router = APIRouter()
 
-# Data and folder configuration
-DATA_FOLDER = "vitaledge/data/loader/queued"
-ARCHIVE_FOLDER = "vitaledge/data/loader/archive"
-
-# Use Config to fetch the database configuration
-db_config = config.DATABASE  # This is a dictionary generated by the property method
-db_url = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}"
-
 # Define a Pydantic model for the request body
 class LoadRequestStudies(BaseModel):
     file_path: str  # Path to the JSON file containing subject studies
     subject_id: Optional[str]  # Subject ID for additional filtering or validation
+    bulk: Optional[bool] = None  # Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD)
+    async_mode: bool = False  # Run as a background job and return its ID right away
+
+class TransferRequestStudies(BaseModel):
+    subject_id: Optional[str] = None  # Subject ID whose studies are transferred from MongoDB
+    subject_ids: Optional[List[str]] = None  # Transfer several subjects in one run
+    bulk: Optional[bool] = None  # Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD)
+    async_mode: bool = False  # Run as a background job and return its ID right away
+
+class BatchLoadRequestStudies(BaseModel):
+    file_paths: Optional[List[str]] = None  # Subject study files, each loaded as one subject
+    subject_ids: Optional[List[str]] = None  # Subjects whose studies are transferred from MongoDB
+    bulk: Optional[bool] = None  # Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD)
+    concurrency: Optional[int] = Field(default=None, ge=1)  # Subjects loaded at once (defaults to BATCH_LOAD_CONCURRENCY)
+    async_mode: bool = False  # Run as a background job and return its ID right away
 
 class ExportRequestStudies(BaseModel):
     file_path: str  # Path to the JSON file to be created that will contain exported subject studies
     subject_id: Optional[str]  # Subject ID for additional filtering or validation
+    subject_ids: Optional[List[str]] = None  # Export several subjects into the same file
+    ndjson: Optional[bool] = None  # Write NDJSON (defaults to the file extension: .ndjson or .jsonl)
 
 # Test database connection endpoint
 @router.get("/test-db-connection")
 async def test_db_connection():
     logger.debug("test_db_connection called.")
-    try:
-        engine = create_engine(db_url)
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT 1"))
+    # Uses the shared, cached Postgres probe instead of opening a connection per call
+    result = (await health_checker.check())["dependencies"]["postgres"]
+    if result["status"] == "up":
         return {"status": "success", "message": "Database connection is working"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+    return {"status": "error", "message": result["error"]}
 
 @router.post("/load_subject_study")
 async def load_subject_study_endpoint(data: LoadRequestStudies):
     """
     Endpoint to load subject study data into the Datalake from a JSON file.
-    - file_path: Path to the JSON file containing subject studies.
+    - file_path: Path to the JSON (array) or NDJSON file containing subject studies.
     - subject_id: Optional subject ID for validation.
+    - bulk: Optional override of the DATALAKE_BULK_LOAD setting.
+    - async_mode: Queue the load as a background job; poll `/studies/jobs/{job_id}` for progress.
     """
     try:
         file_path = data.file_path
@@ -64,49 +75,329 @@ async def load_subject_study_endpoint(data: LoadRequestStudies):
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
 
-        # Load JSON data
-        with open(file_path, "r") as json_file:
-            studies_data = json.load(json_file)
-
-        # Call the loader function to load study data into Datalake
-        study_ids = load_subject_studies_to_datalake(studies_data)
-        i = 0
-        logger.info(f"Study IDs from Datalake: {study_ids}")
-
-        # Generate embeddings and populate VectorDB
-        enriched_data = []
-        logger.info(f"Reading studies data  for {len(studies_data)} studies")
-        for study in studies_data:
-            de_id = study["patient_id"]
-            study_id = study_ids[i]
-            i += 1
-            study = study["study"]
-            logger.info(f"Processing study {study_id} named {study['name']}")
-
-            text = f"{study['summary']}\n{study['description']}"
-            logger.debug(f"Calling embedding service.")
-            tags = study['tags']
-            embedding = await embeddings_service.generate_embedding(text)
-            logger.info(f"Embeddings generated {len(embedding)}")
-            enriched_data.append({
-                "id": study_id,  # Use study ID as unique identifier
-                "text": text,
-                "embedding": embedding,
-                "category": "genomics",
-                "tags": tags
-            })
-
-        # Populate VectorDB
-        logger.info(f"Calling vetctordb.populate with enriched data: {len(enriched_data)}")
-        await vectordb_service.populate(enriched_data)  # Calls VectorDB `/populate`
-
-        return {"status": "success", "message": f"Data from {file_path} successfully loaded into the Datalake."}
+        if data.async_mode:
+            job = job_manager.submit(
+                "load_subject_study",
+                {"file_path": file_path, "subject_id": data.subject_id},
+                lambda progress: load_subject_study_file(file_path, bulk=data.bulk, progress=progress),
+            )
+            return JSONResponse(
+                status_code=202,
+                content={"status": "accepted", "job_id": job.id, "status_url": f"/studies/jobs/{job.id}"},
+            )
+
+        result = await load_subject_study_file(file_path, bulk=data.bulk)
+
+        return {
+            "status": "success",
+            "message": f"Data from {file_path} successfully loaded into the Datalake.",
+            "counts": result,
+        }
 
+    except HTTPException:
+        raise
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format in the file.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+
+@router.post("/transfer_subject_studies")
+async def transfer_subject_studies_endpoint(data: TransferRequestStudies):
+    """
+    Endpoint to load subject studies into the Datalake straight from the MongoDB
+    genomics database, without exporting them to a JSON file first.
+    - subject_id: Subject ID of the study individual.
+    - subject_ids: Optional list of subject IDs transferred in the same run.
+    - bulk: Optional override of the DATALAKE_BULK_LOAD setting.
+    - async_mode: Queue the transfer as a background job; poll `/studies/jobs/{job_id}` for progress.
+    """
+    try:
+        subject_ids = ([data.subject_id] if data.subject_id else []) + (data.subject_ids or [])
+        if not subject_ids:
+            raise HTTPException(status_code=400, detail="subject_id or subject_ids is required.")
+        logger.debug(f"Called transfer_subject_studies for subjects: {subject_ids}")
+
+        if data.async_mode:
+            job = job_manager.submit(
+                "transfer_subject_studies",
+                {"subject_ids": subject_ids},
+                lambda progress: transfer_subject_studies(subject_ids, bulk=data.bulk, progress=progress),
+            )
+            return JSONResponse(
+                status_code=202,
+                content={"status": "accepted", "job_id": job.id, "status_url": f"/studies/jobs/{job.id}"},
+            )
+
+        result = await transfer_subject_studies(subject_ids, bulk=data.bulk)
+
+        return {
+            "status": "success",
+            "message": f"{result['studies']} studies for {len(subject_ids)} subjects transferred into the Datalake.",
+            "counts": result,
+        }
+
+    except HTTPException:
+        raise
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/load_subject_studies_batch")
+async def load_subject_studies_batch_endpoint(data: BatchLoadRequestStudies):
+    """
+    Endpoint to load many subjects at once, from subject study files and/or straight
+    from the MongoDB genomics database. Subjects are loaded concurrently, each in its
+    own Datalake transaction, and a failed subject does not stop the others. Subjects
+    stored in the Datalake but not indexed in VectorDB are reported as "unindexed".
+    - file_paths: Paths to subject study files, one subject per file.
+    - subject_ids: Subject IDs transferred from MongoDB.
+    - bulk: Optional override of the DATALAKE_BULK_LOAD setting.
+    - concurrency: Optional override of the BATCH_LOAD_CONCURRENCY setting.
+    - async_mode: Queue the load as a background job; poll `/studies/jobs/{job_id}` for progress.
+    """
+    try:
+        file_paths = data.file_paths or []
+        subject_ids = data.subject_ids or []
+        if not (file_paths or subject_ids):
+            raise HTTPException(status_code=400, detail="file_paths or subject_ids is required.")
+        logger.debug(f"Called load_subject_studies_batch for {len(file_paths)} files and {len(subject_ids)} subjects")
+
+        if data.async_mode:
+            job = job_manager.submit(
+                "load_subject_studies_batch",
+                {"file_paths": file_paths, "subject_ids": subject_ids},
+                lambda progress: load_subjects(
+                    file_paths, subject_ids, bulk=data.bulk, concurrency=data.concurrency, progress=progress
+                ),
+            )
+            return JSONResponse(
+                status_code=202,
+                content={"status": "accepted", "job_id": job.id, "status_url": f"/studies/jobs/{job.id}"},
+            )
+
+        result = await load_subjects(file_paths, subject_ids, bulk=data.bulk, concurrency=data.concurrency)
+
+        return {
+            # Partial when some subjects failed or were not indexed; see the per-subject results
+            "status": "success" if not (result["failed"] or result["unindexed"]) else "partial",
+            "message": f"{result['succeeded']} of {result['subjects']} subjects loaded into the Datalake and indexed.",
+            "counts": result,
+        }
+
+    except HTTPException:
+        raise
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _conditional_response(request: Request, etag: str, content: dict):
+    # 304 without a body when the client already has this version of the page
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
+
+@router.get("/subjects/{de_id}/studies")
+async def get_subject_studies_endpoint(
+    request: Request,
+    de_id: str,
+    fields: Optional[str] = None,
+    after: int = Query(default=0, ge=0),
+    limit: int = Query(default=config.READ_PAGE_SIZE, ge=1, le=config.READ_MAX_PAGE_SIZE),
+):
+    """
+    Endpoint to read a subject's studies and scores, one page at a time.
+    - de_id: Subject ID of the study individual.
+    - fields: Optional comma-separated fields (study_id, name, summary, description, url,
+      category, score, score_percentile, tags); the subject study `id` is always returned.
+    - after: Return the studies after this `id`; pass the `next_after` of the previous page.
+    - limit: Page size (up to READ_MAX_PAGE_SIZE).
+    Supports conditional requests with If-None-Match.
+    """
+    try:
+        names = study_reads.select_fields(fields, study_reads.SUBJECT_STUDY_FIELDS, study_reads.SUBJECT_STUDY_DEFAULT_FIELDS)
+        etag, page = await study_reads.get_subject_studies(de_id, names, after, limit)
+        return _conditional_response(request, etag, {
+            "status": "success",
+            "subject_id": de_id,
+            "studies": page["items"],
+            "next_after": page["next_after"],
+        })
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/subjects/{de_id}/studies/{study_id}/variants")
+async def get_study_variants_endpoint(
+    request: Request,
+    de_id: str,
+    study_id: int,
+    fields: Optional[str] = None,
+    after: int = Query(default=0, ge=0),
+    limit: int = Query(default=config.READ_PAGE_SIZE, ge=1, le=config.READ_MAX_PAGE_SIZE),
+):
+    """
+    Endpoint to read the variants of a subject's study, one page at a time.
+    - de_id: Subject ID of the study individual.
+    - study_id: Study ID, as returned by `/studies/subjects/{de_id}/studies`.
+    - fields: Optional comma-separated fields (variant, genotype, gene, effect_size,
+      effect_polarity, variant_frequency, significance); the variant `id` is always returned.
+    - after: Return the variants after this `id`; pass the `next_after` of the previous page.
+    - limit: Page size (up to READ_MAX_PAGE_SIZE).
+    Supports conditional requests with If-None-Match.
+    """
+    try:
+        names = study_reads.select_fields(fields, study_reads.VARIANT_FIELDS, study_reads.VARIANT_DEFAULT_FIELDS)
+        etag, page = await study_reads.get_study_variants(de_id, study_id, names, after, limit)
+        return _conditional_response(request, etag, {
+            "status": "success",
+            "subject_id": de_id,
+            "study_id": study_id,
+            "variants": page["items"],
+            "next_after": page["next_after"],
+        })
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/phenotype_tags/{tag}/subjects")
+async def get_tag_subjects_endpoint(
+    request: Request,
+    tag: str,
+    fields: Optional[str] = None,
+    after: int = Query(default=0, ge=0),
+    limit: int = Query(default=config.READ_PAGE_SIZE, ge=1, le=config.READ_MAX_PAGE_SIZE),
+):
+    """
+    Endpoint to read the subjects with studies tagged with a phenotype tag, one page at a time.
+    - tag: Phenotype tag name.
+    - fields: Optional comma-separated fields (de_id, studies: the number of tagged studies);
+      the subject `id` is always returned.
+    - after: Return the subjects after this `id`; pass the `next_after` of the previous page.
+    - limit: Page size (up to READ_MAX_PAGE_SIZE).
+    Supports conditional requests with If-None-Match.
+    """
+    try:
+        names = study_reads.select_fields(fields, study_reads.TAG_SUBJECT_FIELDS, study_reads.TAG_SUBJECT_DEFAULT_FIELDS)
+        etag, page = await study_reads.get_tag_subjects(tag, names, after, limit)
+        return _conditional_response(request, etag, {
+            "status": "success",
+            "tag": tag,
+            "subjects": page["items"],
+            "next_after": page["next_after"],
+        })
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/reads/cache")
+async def read_cache_stats_endpoint():
+    """
+    Endpoint to report hit, miss and invalidation counters of the read cache.
+    """
+    return {"status": "success", "cache": read_cache.stats()}
+
+
+@router.get("/search")
+async def search_studies_endpoint(
+    query: str,
+    top_k: int = Query(default=config.SEARCH_TOP_K, ge=1, le=config.SEARCH_MAX_TOP_K),
+    category: Optional[str] = None,
+    tags: Optional[List[str]] = Query(default=None),
+):
+    """
+    Endpoint to find the studies semantically closest to a free-text query.
+    - query: Text to search for, e.g. a phenotype or trait description.
+    - top_k: Number of studies to return (up to SEARCH_MAX_TOP_K).
+    - category: Optional study category (e.g. Cardiovascular) to search within; applied
+      to the nearest top_k * SEARCH_CATEGORY_OVERFETCH studies, so fewer than top_k
+      studies may come back.
+    - tags: Optional phenotype tags to search within (repeat the parameter for several).
+    Returns the studies best match first, with their similarity score. Repeated searches
+    are served from cache for SEARCH_RESULTS_CACHE_TTL seconds.
+    """
+    try:
+        result = await study_search.search_studies(query, top_k, category, tags)
+        return {
+            "status": "success",
+            "query": query,
+            "results": result["results"],
+            "cached": result["cached"],
+        }
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/cache")
+async def search_cache_stats_endpoint():
+    """
+    Endpoint to report hit and miss counters of the search query embedding and result caches.
+    """
+    return {
+        "status": "success",
+        "embeddings": study_search.query_embeddings.stats(),
+        "results": study_search.search_results.stats(),
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    """
+    Endpoint to report the status and per-stage progress of a background job.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job.to_dict()
+
+
+@router.get("/ingest/status")
+async def ingest_status_endpoint():
+    """
+    Endpoint to report the queued-folder ingest daemon's throughput.
+    """
+    if not config.INGEST_ENABLED:
+        return {"status": "disabled"}
+    return {"status": "success", "ingest": ingest_daemon.stats()}
+
+
+@router.get("/embeddings/cache")
+async def embeddings_cache_stats_endpoint():
+    """
+    Endpoint to report hit, miss and eviction counters of the embeddings cache.
+    """
+    cache = embeddings_service.cache
+    if cache is None:
+        return {"status": "disabled"}
+    return {"status": "success", "cache": cache.stats()}
+
 
 @router.post("/export_subject_study")
 async def export_subject_study_endpoint(data: ExportRequestStudies):
@@ -114,16 +405,26 @@ async def export_subject_study_endpoint(data: ExportRequestStudies):
     Endpoint to export subject study from MongoDB genomics database, to a JSON file.
     - file_path: Path to the JSON file that will be created to contain subject studies.
     - subject_id: Subject ID of the study individual.
+    - subject_ids: Optional list of subject IDs exported into the same file.
+    - ndjson: Optional override of the output format (NDJSON instead of a JSON array).
     """
     try:
         output_file = data.file_path
-        subject_id = data.subject_id
-        logger.info(f"Exporting studied for subject {subject_id} to file: {output_file}")
+        subject_ids = ([data.subject_id] if data.subject_id else []) + (data.subject_ids or [])
+        if not subject_ids:
+            raise HTTPException(status_code=400, detail="subject_id or subject_ids is required.")
+        logger.info(f"Exporting studies for subjects {subject_ids} to file: {output_file}")
+
+        # Call the exporter function; the MongoDB cursor is iterated on a worker thread
+        counts = await asyncio.to_thread(export_subject_studies_to_json, subject_ids, output_file, data.ndjson)
 
-        # Call the exporter function
-        export_subject_studies_to_json(subject_id, output_file)
-     
-        return {"status": "success", "message": f"Subject studies from genomics database successfully exported to {output_file}."}
+        return {
+            "status": "success",
+            "message": f"Subject studies from genomics database successfully exported to {output_file}.",
+            "studies": counts,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,4 +1,5 @@
 import os
+from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import Field, validator
 from pydantic_settings import BaseSettings
@@ -14,6 +15,11 @@ class Config(BaseSettings):
     DB_PASSWORD: str = Field(default="password", description="Database password")
     DB_HOST: str = Field(default="localhost", description="Database host")
     DB_PORT: int = Field(default=5432, description="Database port")
+    DB_POOL_MIN_SIZE: int = Field(default=1, description="Connections opened when the database pool is created")
+    DB_POOL_MAX_SIZE: int = Field(default=10, description="Maximum number of pooled database connections")
+    DB_POOL_TIMEOUT: float = Field(default=30.0, description="Seconds to wait for a free pooled connection")
+    DB_LOAD_CONCURRENCY: int = Field(default=4, description="Maximum number of concurrent Datalake loads, one pooled connection each (keep below DB_POOL_MAX_SIZE)")
+    DB_AUTO_MIGRATE: bool = Field(default=False, description="Apply pending Datalake schema migrations once at app startup (otherwise use scripts/migrate_datalake.py)")
 
     @property
     def DATABASE(self) -> dict:
@@ -25,8 +31,78 @@ class Config(BaseSettings):
             "port": self.DB_PORT,
         }
 
+    DATALAKE_BULK_LOAD: bool = Field(default=True, description="Load subject study files with COPY and set-based statements")
+    LOAD_BATCH_SIZE: int = Field(default=500, description="Study records read, written and embedded per batch")
+    BATCH_LOAD_CONCURRENCY: int = Field(default=4, description="Subjects loaded at once by a multi-subject batch load")
+    BATCH_LOAD_RETRIES: int = Field(default=3, description="Retries of a subject whose transaction was rolled back by a deadlock")
+    BATCH_LOAD_MAX_STUDIES: int = Field(default=20000, description="Most studies of one subject in a batch load, which holds each subject in memory (times BATCH_LOAD_CONCURRENCY)")
+
+    # MongoDB (genomics database) settings
+    MONGO_URI: str = Field(default="mongodb://localhost:27017", description="MongoDB connection URI")
+    MONGO_DB_NAME: str = Field(default="genomic_pipeline_db", description="MongoDB database holding parsed subject studies")
+    MONGO_STUDIES_COLLECTION: str = Field(default="studies", description="MongoDB collection of parsed subject studies")
+    MONGO_MAX_POOL_SIZE: int = Field(default=20, description="Maximum number of pooled MongoDB connections")
+    MONGO_SERVER_SELECTION_TIMEOUT: float = Field(default=5.0, description="Seconds to wait for a MongoDB server before failing")
+    MONGO_EXPORT_BATCH_SIZE: int = Field(default=500, description="Documents fetched per MongoDB cursor batch when exporting studies")
+
+    # Background job settings
+    JOBS_WORKERS: int = Field(default=2, description="Number of background ingestion jobs run concurrently")
+    JOBS_MAX_QUEUED: int = Field(default=100, description="Maximum number of queued background jobs")
+    JOBS_MAX_RETAINED: int = Field(default=1000, description="Number of jobs kept for status polling")
+
+    # Queued-folder ingest daemon settings
+    INGEST_ENABLED: bool = Field(default=False, description="Run the queued-folder ingest daemon in the app")
+    INGEST_QUEUED_FOLDER: str = Field(default="vitaledge/data/loader/queued", description="Folder watched for subject study files")
+    INGEST_PROCESSING_FOLDER: str = Field(default="vitaledge/data/loader/processing", description="Folder holding files being ingested")
+    INGEST_ARCHIVE_FOLDER: str = Field(default="vitaledge/data/loader/archive", description="Folder for successfully ingested files")
+    INGEST_ERROR_FOLDER: str = Field(default="vitaledge/data/loader/error", description="Folder for files that failed to ingest")
+    INGEST_CONCURRENCY: int = Field(default=4, description="Number of files ingested in parallel")
+    INGEST_POLL_INTERVAL: float = Field(default=2.0, description="Seconds between scans of an empty queued folder")
+    INGEST_SETTLE_SECONDS: float = Field(default=2.0, description="Seconds a queued file must go unmodified before it is claimed (0 if writers rename files into place)")
+
+    # Read API settings
+    READ_PAGE_SIZE: int = Field(default=100, description="Rows per page of the read endpoints when no limit is given")
+    READ_MAX_PAGE_SIZE: int = Field(default=1000, description="Largest page the read endpoints return")
+    READ_CACHE_SIZE: int = Field(default=1000, description="Pages kept in the read cache")
+    READ_CACHE_TTL: float = Field(default=30.0, description="Seconds a cached read page is served before it is read again")
+
+    # Study search settings
+    SEARCH_TOP_K: int = Field(default=10, description="Studies returned by a search when top_k is not given")
+    SEARCH_MAX_TOP_K: int = Field(default=100, description="Most studies a search may return")
+    SEARCH_CATEGORY_OVERFETCH: int = Field(default=5, description="Nearest studies fetched per requested result when a search is limited to a study category")
+    SEARCH_EMBEDDING_CACHE_SIZE: int = Field(default=1000, description="Search query embeddings kept in memory")
+    SEARCH_EMBEDDING_CACHE_TTL: float = Field(default=3600.0, description="Seconds a search query embedding is reused")
+    SEARCH_RESULTS_CACHE_SIZE: int = Field(default=1000, description="Search result sets kept in memory")
+    SEARCH_RESULTS_CACHE_TTL: float = Field(default=60.0, description="Seconds a search result set is reused; newly indexed studies show up after this")
+
+    # Health and readiness probe settings
+    HEALTH_CACHE_TTL: float = Field(default=5.0, description="Seconds a dependency health report is reused before probing again")
+    HEALTH_PROBE_TIMEOUT: float = Field(default=2.0, description="Seconds each dependency probe may take before it counts as down")
+    READY_REQUIRED_DEPENDENCIES: List[str] = Field(default=["postgres", "embeddings", "vectordb"], description="Dependencies that must be up for /ready to succeed")
+    EMBEDDINGS_HEALTH_PATH: str = Field(default="/health", description="Path probed on the Embeddings microservice")
+    VECTORDB_HEALTH_PATH: str = Field(default="/health", description="Path probed on the VectorDB microservice")
+
     # Logging settings
     LOG_LEVEL: str = Field(default="INFO", description="Logging level")
+    LOG_FILE: str = Field(default="logs/vitaledge_genomics_handler.log", description="Log file, rotated by size")
+    LOG_JSON: bool = Field(default=False, description="Write structured JSON log lines instead of text")
+    LOG_QUEUE_SIZE: int = Field(default=10000, description="Log records buffered for the log writer thread before new ones are dropped")
+    LOG_RATE_LIMIT: float = Field(default=20.0, description="DEBUG/INFO records per second allowed from one log call site (0 for no limit)")
+    LOG_RATE_BURST: int = Field(default=100, description="DEBUG/INFO records one log call site may write at once before LOG_RATE_LIMIT applies")
+
+    # Request timing and profiling settings
+    SERVER_TIMING_PATHS: List[str] = Field(default=["/studies"], description="Path prefixes whose responses get a Server-Timing header")
+    PROFILE_HEADER: str = Field(default="X-Debug-Profile", description="Request header that asks for the request to be profiled")
+    PROFILE_TOKEN: Optional[str] = Field(default=None, description="Value of PROFILE_HEADER that enables profiling; profiling is off when unset")
+    PROFILE_DIR: str = Field(default="logs/profiles", description="Folder for request profiles (cProfile .prof files)")
+    PROFILE_MAX_FILES: int = Field(default=20, description="Number of request profiles kept; older ones are deleted")
+
+    # Shared HTTP client settings (used for the Embeddings and VectorDB microservices)
+    HTTP_MAX_CONNECTIONS: int = Field(default=50, description="Maximum number of pooled HTTP connections")
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, description="Maximum number of idle keep-alive HTTP connections")
+    HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Seconds an idle keep-alive connection is kept open")
+    HTTP_TIMEOUT: float = Field(default=30.0, description="Default HTTP read/write/pool timeout in seconds")
+    HTTP_CONNECT_TIMEOUT: float = Field(default=5.0, description="HTTP connect timeout in seconds")
 
     # Embeddings service settings
     EMBEDDINGS_HOST: str = Field(default="127.0.0.1", description="Host for the Embeddings microservice")
@@ -42,6 +118,15 @@ class Config(BaseSettings):
             return f"http://{host}:{port}"
         return v
 
+    EMBEDDINGS_BATCH_SIZE: int = Field(default=32, description="Number of texts sent to the Embeddings microservice per request")
+    EMBEDDINGS_MAX_CONCURRENCY: int = Field(default=4, description="Maximum number of concurrent requests to the Embeddings microservice")
+    EMBEDDINGS_MODEL: str = Field(default="default", description="Embedding model name, part of the embeddings cache key")
+
+    # Embeddings cache settings
+    EMBEDDINGS_CACHE_ENABLED: bool = Field(default=True, description="Cache embeddings by text and model")
+    EMBEDDINGS_CACHE_SIZE: int = Field(default=10000, description="Maximum number of embeddings kept in memory")
+    EMBEDDINGS_CACHE_PATH: Optional[str] = Field(default=None, description="SQLite file for a persistent embeddings cache")
+
     VECTORDB_HOST: str = Field(default="127.0.0.1", description="Host for the VectorDB microservice")
     VECTORDB_PORT: int = Field(default=8008, description="Port for the VectorDB microservice")
     VECTORDB_URL: str = Field(default=None, description="URL for the VectorDB microservice")
@@ -53,6 +138,11 @@ class Config(BaseSettings):
             port = values.get("VECTORDB_PORT", 8008)
             return f"http://{host}:{port}"
         return v
+
+    VECTORDB_SEARCH_PATH: str = Field(default="/search/search", description="Path of the VectorDB nearest-neighbour search endpoint")
+    VECTORDB_FLUSH_DOCUMENTS: int = Field(default=100, description="Maximum documents per VectorDB populate request")
+    VECTORDB_FLUSH_BYTES: int = Field(default=4_000_000, description="Maximum JSON body size in bytes per VectorDB populate request")
+    VECTORDB_MAX_PENDING_CHUNKS: int = Field(default=2, description="Chunks buffered ahead of the VectorDB sender before producers wait")
     
 # Instantiate the config
 config = Config()
@@ -0,0 +1,155 @@
+"""
+File: database.py
+Project: VitalEdge Genomics Tubes
+Description: Pooled PostgreSQL connections for the Datalake loaders.
+
+The pool is created from `Config.DATABASE` in the app lifespan (see `app/main.py`).
+Connections are handed out with `pooled_connection()`, which waits for a free
+connection (up to DB_POOL_TIMEOUT seconds) instead of failing when the pool is busy.
+Blocking database work is run off the event loop with `asyncio.to_thread`.
+
+Health probes use `ping_database()`, on one dedicated connection outside the pool, so
+their answer neither waits for nor depends on the connections held by loads.
+"""
+from contextlib import contextmanager
+import math
+import threading
+from typing import Optional
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from app.core.config import config
+from app.utils.logging import logger
+
+class PoolBusy(psycopg2.pool.PoolError):
+    """
+    Raised when no pooled connection becomes free within the wait allowed.
+    """
+
+
+_pool: Optional[ThreadedConnectionPool] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_pool_lock = threading.Lock()
+
+# Dedicated health probe connection, see ping_database()
+_probe_conn = None
+_probe_lock = threading.Lock()
+
+# Connections borrowed and threads waiting for one, for pool_stats()
+_usage = {"in_use": 0, "waiting": 0}
+_usage_lock = threading.Lock()
+
+
+def init_db_pool() -> Optional[ThreadedConnectionPool]:
+    """
+    Creates the connection pool. Called once at application startup; if the database
+    is not reachable yet, the pool is created on first use instead.
+    """
+    try:
+        return get_db_pool()
+    except psycopg2.OperationalError as e:
+        logger.warning(f"Database pool not created at startup: {e}")
+        return None
+
+
+def get_db_pool() -> ThreadedConnectionPool:
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(config.DB_POOL_MIN_SIZE, config.DB_POOL_MAX_SIZE, **config.DATABASE)
+            _slots = threading.BoundedSemaphore(config.DB_POOL_MAX_SIZE)
+            logger.info(f"Database pool created (min={config.DB_POOL_MIN_SIZE}, max={config.DB_POOL_MAX_SIZE})")
+        return _pool
+
+
+def close_db_pool():
+    """
+    Closes all pooled connections and the probe connection. Called at application shutdown.
+    """
+    global _pool, _slots, _probe_conn
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _slots = None
+            logger.info("Database pool closed")
+    if _probe_lock.acquire(blocking=False):
+        try:
+            if _probe_conn is not None:
+                _probe_conn.close()
+                _probe_conn = None
+        finally:
+            _probe_lock.release()
+
+
+def ping_database(timeout: float):
+    """
+    Runs SELECT 1 on the dedicated probe connection, (re)connecting it if needed.
+    - timeout: Seconds allowed to connect and to run the query.
+    Raises on any database error, and RuntimeError while a previous ping has not returned
+    (e.g. a server that stopped answering).
+    """
+    global _probe_conn
+    if not _probe_lock.acquire(blocking=False):
+        raise RuntimeError("The previous ping has not returned")
+    try:
+        if _probe_conn is None or _probe_conn.closed:
+            _probe_conn = psycopg2.connect(
+                **config.DATABASE,
+                connect_timeout=max(1, math.ceil(timeout)),
+                options=f"-c statement_timeout={max(1, int(timeout * 1000))}",
+            )
+            _probe_conn.autocommit = True
+        try:
+            with _probe_conn.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+                cursor.fetchone()
+        except psycopg2.Error:
+            # Reconnect on the next ping
+            _probe_conn.close()
+            _probe_conn = None
+            raise
+    finally:
+        _probe_lock.release()
+
+
+@contextmanager
+def pooled_connection(timeout: Optional[float] = None):
+    """
+    Borrow a connection from the pool. Uncommitted work is rolled back when it is returned.
+    - timeout: Seconds to wait for a free connection (defaults to DB_POOL_TIMEOUT; 0 to not wait).
+    Raises PoolBusy when none is free in time.
+    """
+    timeout = config.DB_POOL_TIMEOUT if timeout is None else timeout
+    pool = get_db_pool()
+    slots = _slots
+    _count_usage("waiting", 1)
+    try:
+        acquired = slots.acquire(timeout=timeout)
+    finally:
+        _count_usage("waiting", -1)
+    if not acquired:
+        raise PoolBusy(f"No database connection available within {timeout}s")
+    try:
+        conn = pool.getconn()
+        _count_usage("in_use", 1)
+        try:
+            yield conn
+        finally:
+            _count_usage("in_use", -1)
+            pool.putconn(conn)
+    finally:
+        slots.release()
+
+
+def _count_usage(key, delta):
+    with _usage_lock:
+        _usage[key] += delta
+
+
+def pool_stats() -> dict:
+    """
+    Current pool usage: maximum size, connections in use and threads waiting for one.
+    """
+    with _usage_lock:
+        return {"max": config.DB_POOL_MAX_SIZE if _pool is not None else 0, **_usage}
+
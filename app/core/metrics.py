@@ -0,0 +1,344 @@
+"""
+File: metrics.py
+Project: VitalEdge Genomics Tubes
+Description: In-process counters, gauges and histograms, exposed at `/metrics` in the
+             Prometheus text exposition format.
+
+Recording is a dict lookup, a lock and an addition, so metrics stay on in production.
+Histograms keep per-bucket counts only (no samples). Labelled metrics hand out one
+child per label combination with `labels(...)`; keep label values to a small, fixed set
+(stage names, service names, route templates), never IDs.
+
+The metrics of the service are defined at the bottom of this module.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 1 ms to 2 min
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    @contextmanager
+    def track_inprogress(self):
+        """
+        Counts the enclosed block as in progress.
+        """
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observes the elapsed time of the enclosed block, in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Returns the child for the given label values (in the order of `labelnames`).
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} is labelled; use labels(...)")
+        return self._children[()]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._sample_lines(key, child))
+        return lines
+
+    def _sample_lines(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count. By convention the name ends in `_total`.
+    """
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, e.g. requests in flight or connections in use.
+    """
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled().set(value)
+
+    def track_inprogress(self):
+        return self._unlabelled().track_inprogress()
+
+
+class Histogram(_Metric):
+    """
+    Counts observations (e.g. latencies in seconds) into cumulative buckets.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def _sample_lines(self, key, child) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The set of metrics rendered by `/metrics`.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting HTTP requests in flight and timing each request by method,
+    route template and status code.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The route template (e.g. /studies/jobs/{job_id}) keeps the label set small
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], path, status).observe(time.perf_counter() - started)
+
+
+# HTTP server
+HTTP_REQUESTS_IN_FLIGHT = Gauge("genomics_http_requests_in_flight", "HTTP requests currently being served")
+HTTP_REQUEST_SECONDS = Histogram(
+    "genomics_http_request_duration_seconds", "HTTP request latency by method, route and status",
+    ["method", "route", "status"],
+)
+
+# Load pipeline and export
+PIPELINE_STAGE_SECONDS = Histogram(
+    "genomics_pipeline_stage_seconds",
+    "Time per load pipeline stage and batch (read, decode, datalake, embedding)",
+    ["stage"],
+)
+EXPORT_STAGE_SECONDS = Histogram(
+    "genomics_export_stage_seconds", "Time per study export, split into MongoDB reads and file writes", ["stage"],
+)
+STUDIES_PROCESSED = Counter(
+    "genomics_studies_processed_total", "Subject studies written to the Datalake, by load status", ["status"],
+)
+VARIANTS_PROCESSED = Counter("genomics_variants_processed_total", "Study variants read by the load pipeline")
+TAGS_PROCESSED = Counter("genomics_tags_processed_total", "Study phenotype tags read by the load pipeline")
+STUDIES_EXPORTED = Counter("genomics_studies_exported_total", "Subject studies exported from MongoDB")
+
+# Upstream services
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "genomics_upstream_request_seconds", "Latency of requests to the Embeddings and VectorDB services", ["service"],
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "genomics_upstream_requests_in_flight", "Requests to the Embeddings and VectorDB services in flight", ["service"],
+)
+
+# Pools, sampled when /metrics is scraped
+DB_POOL_CONNECTIONS = Gauge(
+    "genomics_db_pool_connections", "Datalake connection pool: max size, connections in use and threads waiting", ["state"],
+)
+JOBS = Gauge("genomics_jobs", "Background jobs by status", ["status"])
+
+# Read API
+READ_CACHE_REQUESTS = Counter("genomics_read_cache_requests_total", "Read API page lookups in the read cache, by result", ["result"])
+
+SEARCH_CACHE_REQUESTS = Counter(
+    "genomics_search_cache_requests_total", "Study search lookups in the query embedding and result caches, by result",
+    ["cache", "result"],
+)
+
+# Logging
+LOG_RECORDS_DROPPED = Counter("genomics_log_records_dropped_total", "Log records dropped because the log queue was full")
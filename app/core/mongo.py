@@ -0,0 +1,54 @@
+"""
+File: mongo.py
+Project: VitalEdge Genomics Tubes
+Description: Shared, pooled MongoDB client for the genomics database.
+
+MongoClient keeps its own connection pool and is safe to share between threads, so a
+single client is created on first use and reused by every export instead of
+connecting per request. It is closed with the FastAPI app lifespan (see `app/main.py`).
+"""
+import threading
+from typing import Optional
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from app.core.config import config
+from app.utils.logging import logger
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client() -> MongoClient:
+    """
+    Returns the shared client, creating it on first use. MongoClient connects lazily,
+    so this does not block when MongoDB is unreachable.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                config.MONGO_URI,
+                maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+                serverSelectionTimeoutMS=int(config.MONGO_SERVER_SELECTION_TIMEOUT * 1000),
+            )
+            logger.info(f"MongoDB client created for {config.MONGO_URI} (maxPoolSize={config.MONGO_MAX_POOL_SIZE})")
+        return _client
+
+
+def get_studies_collection() -> Collection:
+    """
+    Returns the collection holding parsed subject studies.
+    """
+    return get_mongo_client()[config.MONGO_DB_NAME][config.MONGO_STUDIES_COLLECTION]
+
+
+def close_mongo_client():
+    """
+    Closes the shared client and its pooled connections. Called at application shutdown.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+            logger.info("MongoDB client closed")
@@ -0,0 +1,145 @@
+"""
+File: request_timing.py
+Project: VitalEdge Genomics Tubes
+Description: Per-request stage timings, returned in a `Server-Timing` header, and
+             opt-in request profiling.
+
+`RequestTimingMiddleware` collects the time spent in each pipeline and export stage
+(read, decode, datalake, embedding, vectordb, mongo, write) of a request to a path in
+SERVER_TIMING_PATHS, and returns it with the total as
+`Server-Timing: read;dur=12.1, datalake;dur=80.4, total;dur=130.2` (milliseconds).
+Stages are recorded with `record_timing`; the timings live in a context variable, so
+concurrent requests do not mix and worker threads started with `asyncio.to_thread`
+report to the request that started them. Background jobs are not timed.
+
+A request carrying PROFILE_HEADER with the value PROFILE_TOKEN is also run under
+cProfile, and the profile is saved to PROFILE_DIR (inspect it with `python -m pstats`
+or snakeviz). Only the event loop thread is profiled, so work on worker threads shows
+up as waiting, and other requests served at the same time are included. One request is
+profiled at a time; the PROFILE_MAX_FILES newest profiles are kept.
+"""
+import asyncio
+import cProfile
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import hmac
+import os
+import re
+import time
+import uuid
+from typing import Optional
+from app.core.config import config
+from app.utils.logging import logger
+
+_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+# Set while a request is being profiled; only one cProfile profiler can be active
+_profiling = False
+
+
+def record_timing(name: str, seconds: float):
+    """
+    Adds `seconds` to stage `name` of the current request, if its timings are collected.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def format_server_timing(timings: dict, total: float) -> str:
+    """
+    Server-Timing header value for stage timings and a total, in seconds.
+    """
+    metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+def _profile_requested(scope) -> bool:
+    if not config.PROFILE_TOKEN:
+        return False
+    header = config.PROFILE_HEADER.lower().encode("latin-1")
+    for name, value in scope.get("headers", ()):
+        if name == header:
+            return hmac.compare_digest(value, config.PROFILE_TOKEN.encode("latin-1"))
+    return False
+
+
+def _profile_file_name(scope) -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "root"
+    return f"{timestamp}-{scope['method']}-{path}-{uuid.uuid4().hex[:8]}.prof"
+
+
+def _save_profile(profiler: cProfile.Profile, file_name: str):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(os.path.join(config.PROFILE_DIR, file_name))
+
+    # Keep the newest PROFILE_MAX_FILES profiles
+    profiles = sorted(
+        (entry for entry in os.scandir(config.PROFILE_DIR) if entry.name.endswith(".prof")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:max(len(profiles) - config.PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware adding the Server-Timing header and running requested profiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _profiling
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timed = scope["path"].startswith(tuple(config.SERVER_TIMING_PATHS))
+        profile = _profile_requested(scope)
+        if profile and _profiling:
+            logger.warning(f"Not profiling {scope['path']}: another request is being profiled")
+            profile = False
+        if not (timed or profile):
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _timings.set(timings)
+        profile_file = _profile_file_name(scope) if profile else None
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if timed:
+                    server_timing = format_server_timing(timings, time.perf_counter() - started)
+                    headers.append((b"server-timing", server_timing.encode("latin-1")))
+                if profile_file:
+                    headers.append((b"x-profile-file", profile_file.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = None
+        if profile:
+            _profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _timings.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _profiling = False
+                try:
+                    await asyncio.to_thread(_save_profile, profiler, profile_file)
+                    logger.info(f"Saved profile of {scope['method']} {scope['path']} to {profile_file}")
+                except OSError as e:
+                    logger.error(f"Could not save profile {profile_file}: {e}")
@@ -0,0 +1,420 @@
+"""
+File: schema.py
+Project: VitalEdge Genomics Tubes
+Description: Versioned schema of the Datalake tables written by the subject study
+             loaders, and the migrations that bring a database up to it.
+
+Migrations are numbered and applied in order, each in its own transaction; the applied
+versions are recorded in `schema_migrations`. Every migration is idempotent (it checks
+for the tables, columns and indexes it creates), so it can also run against a Datalake
+that was set up by hand before the schema was versioned.
+
+The schema provides what the loaders' hot queries need: `subjects.de_id` and
+`phenotype_tags.name` lookups, `ON CONFLICT (name)` upserts of `studies` and
+`phenotype_tags`, `ON CONFLICT (subject_id, study_id)` upserts of `subject_studies`,
+the deletes of the tags and variants of a changed subject study, and the keyset pages
+of the read API. `explain_hot_queries` checks with EXPLAIN that these queries use the
+indexes.
+
+`subject_study_variants` can optionally be hash-partitioned by subject with
+`partition_variants`. Apply the schema with `scripts/migrate_datalake.py`, or once at
+app startup by setting DB_AUTO_MIGRATE. Migrations take locks that block loads (and
+rewrite large tables), so they never run inside a load: the loaders only check that
+the schema is current and fail otherwise.
+"""
+import threading
+from app.core.config import config
+from app.core.database import pooled_connection
+from app.utils.logging import logger
+
+# Key of the advisory lock that serializes migrations across processes
+_MIGRATION_LOCK_KEY = 7_206_124_001
+
+# Set once the schema is known to be current
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _create_tables(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS subjects (
+        id serial PRIMARY KEY,
+        de_id text NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS studies (
+        id serial PRIMARY KEY,
+        name text NOT NULL UNIQUE,
+        summary text,
+        description text,
+        url text,
+        category text
+    );
+    CREATE TABLE IF NOT EXISTS phenotype_tags (
+        id serial PRIMARY KEY,
+        name text NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS subject_studies (
+        id bigserial PRIMARY KEY,
+        subject_id integer NOT NULL REFERENCES subjects (id),
+        study_id integer NOT NULL REFERENCES studies (id),
+        score double precision,
+        score_percentile integer
+    );
+    CREATE TABLE IF NOT EXISTS subject_study_phenotypes (
+        subject_study_id bigint NOT NULL REFERENCES subject_studies (id),
+        phenotype_tag_id integer NOT NULL REFERENCES phenotype_tags (id)
+    );
+    CREATE TABLE IF NOT EXISTS subject_study_variants (
+        id bigserial PRIMARY KEY,
+        study_id bigint NOT NULL REFERENCES subject_studies (id),
+        variant text,
+        genotype text,
+        gene text,
+        effect_size double precision,
+        effect_polarity text,
+        variant_frequency double precision,
+        significance double precision
+    );
+    """)
+
+
+def _add_fingerprints(cursor):
+    cursor.execute("""
+    ALTER TABLE studies ADD COLUMN IF NOT EXISTS fingerprint text;
+    ALTER TABLE subject_studies ADD COLUMN IF NOT EXISTS fingerprint text;
+    """)
+
+
+def _add_indexes(cursor):
+    # Name lookups and the ON CONFLICT (name) upserts
+    _ensure_index(cursor, "subjects", ["de_id"], "subjects_de_id_idx")
+    _ensure_index(cursor, "studies", ["name"], "studies_name_key", unique=True)
+    if not _has_index(cursor, "phenotype_tags", ["name"], unique=True):
+        # Point links to repeated tag names at the first tag, then drop the repeats
+        cursor.execute("""
+        UPDATE subject_study_phenotypes p SET phenotype_tag_id = first.id
+        FROM phenotype_tags t
+        JOIN (SELECT name, min(id) AS id FROM phenotype_tags GROUP BY name) first USING (name)
+        WHERE p.phenotype_tag_id = t.id AND t.id <> first.id;
+        DELETE FROM phenotype_tags t
+        USING phenotype_tags first
+        WHERE first.name = t.name AND first.id < t.id;
+        """)
+        _ensure_index(cursor, "phenotype_tags", ["name"], "phenotype_tags_name_key", unique=True)
+
+    # One row per subject and study. Reloads before fingerprints inserted the same
+    # subject study again; the loaders always read the latest, so the older ones go.
+    if not _has_index(cursor, "subject_studies", ["subject_id", "study_id"], unique=True):
+        cursor.execute("""
+        CREATE TEMP TABLE stale_subject_studies ON COMMIT DROP AS
+        SELECT id FROM (
+            SELECT id, row_number() OVER (PARTITION BY subject_id, study_id ORDER BY id DESC) AS position
+            FROM subject_studies
+        ) ranked
+        WHERE position > 1;
+        DELETE FROM subject_study_phenotypes WHERE subject_study_id IN (SELECT id FROM stale_subject_studies);
+        DELETE FROM subject_study_variants WHERE study_id IN (SELECT id FROM stale_subject_studies);
+        DELETE FROM subject_studies WHERE id IN (SELECT id FROM stale_subject_studies);
+        """)
+        if cursor.rowcount:
+            logger.warning(f"Removed {cursor.rowcount} repeated subject studies before adding their unique constraint")
+        cursor.execute("""
+        ALTER TABLE subject_studies
+        ADD CONSTRAINT subject_studies_subject_id_study_id_key UNIQUE (subject_id, study_id);
+        """)
+    _ensure_index(cursor, "subject_studies", ["study_id"], "subject_studies_study_id_idx")
+
+    # Tags and variants of a subject study, replaced when it changes
+    _ensure_index(cursor, "subject_study_phenotypes", ["subject_study_id"], "subject_study_phenotypes_subject_study_id_idx")
+    _ensure_index(cursor, "subject_study_variants", ["study_id"], "subject_study_variants_study_id_idx")
+
+
+def _add_variant_subjects(cursor):
+    # The subject of each variant, so the table can be partitioned by subject
+    cursor.execute("ALTER TABLE subject_study_variants ADD COLUMN IF NOT EXISTS subject_id integer;")
+    cursor.execute("""
+    UPDATE subject_study_variants v SET subject_id = ss.subject_id
+    FROM subject_studies ss
+    WHERE ss.id = v.study_id AND v.subject_id IS NULL;
+    """)
+    cursor.execute("ALTER TABLE subject_study_variants ALTER COLUMN subject_id SET NOT NULL;")
+
+
+def _add_read_indexes(cursor):
+    # Keyset pages of a subject's studies and of a subject study's variants, and tag -> subjects
+    _ensure_index(cursor, "subject_studies", ["subject_id", "id"], "subject_studies_subject_id_id_idx")
+    _ensure_index(cursor, "subject_study_variants", ["study_id", "id"], "subject_study_variants_study_id_id_idx")
+    _ensure_index(cursor, "subject_study_phenotypes", ["phenotype_tag_id"], "subject_study_phenotypes_phenotype_tag_id_idx")
+
+
+# (version, description, apply); apply runs with a cursor inside the migration's transaction
+MIGRATIONS = [
+    (1, "Datalake tables written by the subject study loaders", _create_tables),
+    (2, "Fingerprints of studies and subject studies", _add_fingerprints),
+    (3, "Indexes for lookups and upserts, unique subject studies", _add_indexes),
+    (4, "Subject of each subject study variant", _add_variant_subjects),
+    (5, "Indexes for the read API", _add_read_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _index_columns(cursor, table):
+    """
+    Returns [(index name, [column names], unique)] of the indexes of a table.
+    """
+    cursor.execute("""
+    SELECT c.relname, i.indisunique,
+           array(
+               SELECT a.attname
+               FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k (attnum, position)
+               JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+               ORDER BY k.position
+           )
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = %s::regclass;
+    """, (table,))
+    return [(name, list(columns), unique) for name, unique, columns in cursor.fetchall()]
+
+
+def _has_index(cursor, table, columns, unique=False) -> bool:
+    # A unique index must be on exactly these columns; a lookup index only needs to start with them
+    for _, index_columns, index_unique in _index_columns(cursor, table):
+        if unique and index_unique and index_columns == columns:
+            return True
+        if not unique and index_columns[:len(columns)] == columns:
+            return True
+    return False
+
+
+def _ensure_index(cursor, table, columns, name, unique=False):
+    if _has_index(cursor, table, columns, unique):
+        return
+    cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)});")
+    logger.info(f"Created index {name} on {table} ({', '.join(columns)})")
+
+
+def applied_versions(conn) -> list:
+    """
+    Versions recorded in `schema_migrations`, in order.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+        if not cursor.fetchone()[0]:
+            conn.rollback()
+            return []
+        cursor.execute("SELECT version FROM schema_migrations ORDER BY version;")
+        versions = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    return versions
+
+
+def apply_migrations(conn, target=None) -> list:
+    """
+    Applies the pending migrations up to `target` (defaults to the latest).
+    - conn: psycopg2 connection; each migration is committed on it.
+    Returns the versions applied.
+
+    An advisory lock keeps concurrent processes from migrating at the same time.
+    """
+    target = SCHEMA_VERSION if target is None else target
+    applied = []
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s);", (_MIGRATION_LOCK_KEY,))
+        try:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version integer PRIMARY KEY,
+                description text NOT NULL,
+                applied_at timestamptz NOT NULL DEFAULT now()
+            );
+            """)
+            conn.commit()
+            cursor.execute("SELECT version FROM schema_migrations;")
+            done = {row[0] for row in cursor.fetchall()}
+            for version, description, apply in MIGRATIONS:
+                if version in done or version > target:
+                    continue
+                try:
+                    apply(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                        (version, description)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    logger.error(f"Schema migration {version} ({description}) failed")
+                    raise
+                applied.append(version)
+                logger.info(f"Applied schema migration {version}: {description}")
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s);", (_MIGRATION_LOCK_KEY,))
+            conn.commit()
+    return applied
+
+
+def ensure_schema(conn):
+    """
+    Checks that the Datalake schema is current before a load; an outdated schema is a
+    RuntimeError. Never migrates. Checked once per process, once it is current.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        versions = applied_versions(conn)
+        if not versions or versions[-1] < SCHEMA_VERSION:
+            raise RuntimeError(
+                f"Datalake schema is at version {versions[-1] if versions else 0}, expected {SCHEMA_VERSION}; "
+                "run scripts/migrate_datalake.py"
+            )
+        _schema_ready = True
+
+
+def migrate_on_startup():
+    """
+    Applies the pending migrations at app startup, when DB_AUTO_MIGRATE is set. Failures
+    are logged; loads then fail on the outdated schema until it is migrated.
+    """
+    try:
+        with pooled_connection() as conn:
+            applied = apply_migrations(conn)
+    except Exception as e:
+        logger.error(f"Datalake schema migration at startup failed: {e}")
+        return
+    if applied:
+        logger.info(f"Datalake schema migrated to version {SCHEMA_VERSION} (applied {', '.join(map(str, applied))})")
+
+
+def is_partitioned(conn, table: str) -> bool:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+        row = cursor.fetchone()
+    conn.rollback()
+    return bool(row and row[0])
+
+
+def partition_variants(conn, partitions: int) -> bool:
+    """
+    Rebuilds `subject_study_variants` as a table hash-partitioned by subject_id, with
+    `partitions` partitions, and moves its rows over, in one transaction.
+    Returns False if the table is already partitioned.
+
+    A subject's variants then live in one partition, and the variant deletes of the
+    loaders (which filter on the subject) only touch that partition. The rows are
+    copied, so run it in a maintenance window on a large table.
+    """
+    if is_partitioned(conn, "subject_study_variants"):
+        return False
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute("SELECT pg_get_serial_sequence('subject_study_variants', 'id');")
+            sequence = cursor.fetchone()[0]
+            cursor.execute("""
+            ALTER TABLE subject_study_variants RENAME TO subject_study_variants_unpartitioned;
+            CREATE TABLE subject_study_variants (
+                LIKE subject_study_variants_unpartitioned INCLUDING DEFAULTS,
+                PRIMARY KEY (id, subject_id),
+                FOREIGN KEY (study_id) REFERENCES subject_studies (id)
+            ) PARTITION BY HASH (subject_id);
+            """)
+            for remainder in range(partitions):
+                cursor.execute(
+                    f"CREATE TABLE subject_study_variants_p{remainder} PARTITION OF subject_study_variants "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder});"
+                )
+            cursor.execute("""
+            INSERT INTO subject_study_variants SELECT * FROM subject_study_variants_unpartitioned;
+            """)
+            moved = cursor.rowcount
+            if sequence:
+                # The id sequence must outlive the old table
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY subject_study_variants.id;")
+            cursor.execute("DROP TABLE subject_study_variants_unpartitioned;")
+            # The indexes of migrations 3 and 5; the (study_id, id) index also serves study_id lookups
+            _ensure_index(cursor, "subject_study_variants", ["study_id", "id"], "subject_study_variants_study_id_id_idx")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info(f"Partitioned subject_study_variants by subject into {partitions} partitions ({moved} variants moved)")
+    return True
+
+
+# (name, table, query) of the loaders' and read API's hot queries, with placeholder values
+HOT_QUERIES = [
+    ("subject by de_id", "subjects", "SELECT id FROM subjects WHERE de_id = 'x'"),
+    ("study by name", "studies", "SELECT id FROM studies WHERE name = 'x'"),
+    ("study upsert", "studies", """
+        INSERT INTO studies (name) VALUES ('x')
+        ON CONFLICT (name) DO UPDATE SET fingerprint = EXCLUDED.fingerprint"""),
+    ("phenotype tag by name", "phenotype_tags", "SELECT id FROM phenotype_tags WHERE name = 'x'"),
+    ("phenotype tag upsert", "phenotype_tags", """
+        INSERT INTO phenotype_tags (name) VALUES ('x')
+        ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name"""),
+    ("subject study by subject and study", "subject_studies",
+     "SELECT id, fingerprint FROM subject_studies WHERE subject_id = 1 AND study_id = 1"),
+    ("subject study upsert", "subject_studies", """
+        INSERT INTO subject_studies (subject_id, study_id) VALUES (1, 1)
+        ON CONFLICT (subject_id, study_id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint"""),
+    ("subject study tags delete", "subject_study_phenotypes",
+     "DELETE FROM subject_study_phenotypes WHERE subject_study_id = 1"),
+    ("subject study variants delete", "subject_study_variants",
+     "DELETE FROM subject_study_variants WHERE subject_id = 1 AND study_id = 1"),
+    ("subject studies page", "subject_studies",
+     "SELECT id FROM subject_studies WHERE subject_id = 1 AND id > 0 ORDER BY id LIMIT 101"),
+    ("subject study variants page", "subject_study_variants",
+     "SELECT id FROM subject_study_variants WHERE subject_id = 1 AND study_id = 1 AND id > 0 ORDER BY id LIMIT 101"),
+    ("phenotype tag subjects", "subject_study_phenotypes",
+     "SELECT subject_study_id FROM subject_study_phenotypes WHERE phenotype_tag_id = 1"),
+]
+
+
+def _plan_indexes(node, table, found):
+    # Collects the indexes used (bitmap index scans name no relation) and whether
+    # `table` (or one of its partitions) is scanned sequentially
+    relation = node.get("Relation Name", "")
+    on_table = relation == table or relation.startswith(f"{table}_p")
+    if node.get("Index Name"):
+        found["indexes"].append(node["Index Name"])
+    if on_table and node.get("Node Type") == "Seq Scan":
+        found["seq_scan"] = True
+    found["indexes"].extend(node.get("Conflict Arbiter Indexes", []))
+    for child in node.get("Plans", []):
+        _plan_indexes(child, table, found)
+
+
+def explain_hot_queries(conn, queries=HOT_QUERIES) -> list:
+    """
+    EXPLAINs the hot queries and reports the indexes each one uses.
+    Returns one {"name", "table", "indexes", "ok"} dict per query.
+
+    Sequential scans are disabled for the check, since the planner rightly prefers them
+    on small tables; a query that still scans its table sequentially has no usable index.
+    Nothing is executed or written.
+    """
+    results = []
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute("SET LOCAL enable_seqscan = off;")
+            for name, table, query in queries:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}")
+                plan = cursor.fetchone()[0][0]["Plan"]
+                found = {"indexes": [], "seq_scan": False}
+                _plan_indexes(plan, table, found)
+                indexes = list(dict.fromkeys(found["indexes"]))
+                results.append({
+                    "name": name,
+                    "table": table,
+                    "indexes": indexes,
+                    "ok": bool(indexes) and not found["seq_scan"],
+                })
+        finally:
+            conn.rollback()
+    return results
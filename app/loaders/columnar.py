@@ -0,0 +1,313 @@
+import os
+import numpy as np
+from app.loaders.fingerprints import subject_study_fingerprints
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only columnar study files need it
+    pa = None
+
+PARQUET_SUFFIXES = (".parquet",)
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+COLUMNAR_SUFFIXES = PARQUET_SUFFIXES + ARROW_SUFFIXES
+
+# Study-level columns, in the order of the bulk loader's study rows
+STUDY_COLUMNS = [
+    "patient_id", "name", "summary", "description", "url", "category",
+    "genetic_score", "percentile", "study_fingerprint", "fingerprint",
+]
+
+# Variant struct fields, in the order of the `stage_study_variants` columns
+VARIANT_FIELDS = [
+    "variant", "genotype", "gene", "effect_size", "effect_polarity", "variant_frequency", "significance",
+]
+
+# Record keys of the variant fields in subject study JSON
+_VARIANT_KEYS = [
+    "variant", "genotype", "gene", "effect-size", "effect-polarity", "variant-frequency", "significance",
+]
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Columnar study files require pyarrow (pip install pyarrow)")
+
+
+def is_columnar_file(path):
+    """
+    Whether the file name is that of an Arrow IPC or Parquet study file.
+    """
+    return os.fspath(path).endswith(COLUMNAR_SUFFIXES)
+
+
+def study_schema():
+    """
+    Arrow schema of a columnar subject study file: one row per subject study, with
+    its tags and variants as list columns and the loader fingerprints precomputed.
+    """
+    _require_pyarrow()
+    return pa.schema([
+        ("patient_id", pa.string()),
+        ("name", pa.string()),
+        ("summary", pa.string()),
+        ("description", pa.string()),
+        ("url", pa.string()),
+        ("category", pa.string()),
+        ("genetic_score", pa.float64()),
+        ("percentile", pa.int64()),
+        ("study_fingerprint", pa.string()),
+        ("fingerprint", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("variants", pa.list_(pa.struct([
+            ("variant", pa.string()),
+            ("genotype", pa.string()),
+            ("gene", pa.string()),
+            ("effect_size", pa.float64()),
+            ("effect_polarity", pa.string()),
+            ("variant_frequency", pa.float64()),
+            ("significance", pa.float64()),
+        ]))),
+    ])
+
+
+def to_float64(values):
+    """
+    Convert a sequence of numbers or numeric strings to a float64 array in one call.
+    Missing values become NaN.
+    """
+    return np.array(values, dtype=np.float64)
+
+
+def parse_significance(values):
+    """
+    Vectorized `float(significance.replace(" x 10", "e"))` over significance strings
+    such as "2.1 x 10-8". Missing values become NaN.
+    """
+    values = np.asarray(values, dtype=object)
+    strings = np.where(np.equal(values, None), "nan", values).astype(str)
+    return np.char.replace(strings, " x 10", "e").astype(np.float64)
+
+
+def _nullable(array):
+    # Python values of a float64 array, with NaN as None
+    return np.where(np.isnan(array), None, array).tolist()
+
+
+def studies_to_table(studies_data):
+    """
+    Convert subject study records (as written by parse_raw_file) to an Arrow table.
+    Effect sizes, variant frequencies and significances are normalized with one
+    NumPy call per column instead of per variant.
+    """
+    _require_pyarrow()
+    columns = {name: [] for name in STUDY_COLUMNS + ["tags"]}
+    variant_values = {key: [] for key in _VARIANT_KEYS}
+    offsets = [0]
+
+    for study in studies_data:
+        study_data = study["study"]
+        score_data = study["score"]
+        columns["patient_id"].append(study["patient_id"])
+        columns["name"].append(study_data["name"])
+        columns["summary"].append(study_data.get("summary"))
+        columns["description"].append(study_data.get("description"))
+        columns["url"].append(study_data.get("url"))
+        columns["category"].append(study_data.get("category"))
+        columns["genetic_score"].append(score_data.get("genetic-score"))
+        columns["percentile"].append(score_data.get("percentile"))
+        columns["tags"].append(study_data.get("tags", []))
+        for variant in study.get("variants", []):
+            for key in _VARIANT_KEYS:
+                variant_values[key].append(variant.get(key))
+        offsets.append(len(variant_values["variant"]))
+
+    effect_size = to_float64(variant_values["effect-size"])
+    variant_frequency = to_float64(variant_values["variant-frequency"])
+    significance = parse_significance(variant_values["significance"])
+
+    # Fingerprints are computed from the normalized values, so they match the ones the
+    # loaders compute for the same records in JSON
+    variant_columns = [
+        variant_values["variant"], variant_values["genotype"], variant_values["gene"], _nullable(effect_size),
+        variant_values["effect-polarity"], _nullable(variant_frequency), _nullable(significance),
+    ]
+    for ord in range(len(columns["name"])):
+        start, end = offsets[ord], offsets[ord + 1]
+        study_fingerprint, fingerprint = subject_study_fingerprints(
+            tuple(columns[name][ord] for name in ("name", "summary", "description", "url", "category")),
+            (columns["genetic_score"][ord], columns["percentile"][ord]),
+            columns["tags"][ord],
+            list(zip(*(column[start:end] for column in variant_columns))),
+        )
+        columns["study_fingerprint"].append(study_fingerprint)
+        columns["fingerprint"].append(fingerprint)
+
+    schema = study_schema()
+    variant_type = schema.field("variants").type.value_type
+    variants = pa.StructArray.from_arrays([
+        pa.array(variant_values["variant"], pa.string()),
+        pa.array(variant_values["genotype"], pa.string()),
+        pa.array(variant_values["gene"], pa.string()),
+        pa.array(effect_size, pa.float64(), from_pandas=True),
+        pa.array(variant_values["effect-polarity"], pa.string()),
+        pa.array(variant_frequency, pa.float64(), from_pandas=True),
+        pa.array(significance, pa.float64(), from_pandas=True),
+    ], fields=list(variant_type))
+    arrays = [pa.array(columns[field.name], field.type) for field in schema if field.name != "variants"]
+    arrays.append(pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), variants))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class StudyTable:
+    """
+    A batch of subject studies held as an Arrow table (see `study_schema`). Accepted by
+    the Datalake loaders in place of a list of study records.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @classmethod
+    def concat(cls, tables):
+        """
+        One StudyTable holding the rows of several.
+        """
+        return cls(pa.concat_tables([table.table for table in tables]))
+
+    def value_count(self, column):
+        """
+        Total number of values in a list column (e.g. "variants" or "tags").
+        """
+        return sum(len(chunk.flatten()) for chunk in self.table.column(column).chunks)
+
+    def to_records(self, variants=True):
+        """
+        Convert the batch to subject study records, in the JSON layout. Without
+        `variants`, only the study text, tags and score are converted.
+        """
+        table = self.table if variants else self.table.drop_columns(["variants"])
+        records = []
+        for row in table.to_pylist():
+            record = {
+                "patient_id": row["patient_id"],
+                "study": {
+                    "name": row["name"],
+                    "summary": row["summary"],
+                    "description": row["description"],
+                    "url": row["url"],
+                    "category": row["category"],
+                    "tags": row["tags"],
+                },
+                "score": {"genetic-score": row["genetic_score"], "percentile": row["percentile"]},
+            }
+            if variants:
+                record["variants"] = [
+                    {
+                        "variant": variant["variant"],
+                        "genotype": variant["genotype"],
+                        "gene": variant["gene"],
+                        "effect-size": variant["effect_size"],
+                        "effect-polarity": variant["effect_polarity"],
+                        "variant-frequency": variant["variant_frequency"],
+                        "significance": None if variant["significance"] is None else repr(variant["significance"]),
+                    }
+                    for variant in row["variants"]
+                ]
+            records.append(record)
+        return records
+
+    def stage_rows(self):
+        """
+        Rows staged by the bulk loader: (study_rows, tag_rows, variant_table). Study and
+        tag rows are tuples as from `prepare_subject_study_rows`; the variants stay
+        columnar as an Arrow table of `ord`, `seq` and the variant fields.
+        """
+        table = self.table
+        study_rows = [
+            (ord, *row) for ord, row in enumerate(zip(*(table.column(name).to_pylist() for name in STUDY_COLUMNS)))
+        ]
+
+        tags = table.column("tags").combine_chunks()
+        tag_rows = list(zip(pc.list_parent_indices(tags).to_pylist(), tags.flatten().to_pylist()))
+
+        variants = table.column("variants").combine_chunks()
+        ords = pc.list_parent_indices(variants).to_numpy()
+        starts = variants.offsets.to_numpy()
+        seq = np.arange(len(ords)) - (starts[ords] - starts[0])
+        variant_table = pa.Table.from_arrays(
+            [pa.array(ords, pa.int32()), pa.array(seq, pa.int32()), *variants.flatten().flatten()],
+            names=["ord", "seq"] + VARIANT_FIELDS,
+        )
+        return study_rows, tag_rows, variant_table
+
+
+def write_copy_csv(table, sink):
+    """
+    Write an Arrow table as headerless CSV for `COPY ... FROM STDIN WITH (FORMAT csv)`;
+    nulls are written as unquoted empty values, which COPY reads as NULL.
+    """
+    _require_pyarrow()
+    pa_csv.write_csv(table, sink, pa_csv.WriteOptions(include_header=False))
+
+
+class StudyTableWriter:
+    """
+    Writes subject study records to an Arrow IPC or Parquet file (chosen by the file
+    name), converting them to columns every `batch_size` records.
+    """
+
+    def __init__(self, output_file, batch_size=1000):
+        _require_pyarrow()
+        self.output_file = os.fspath(output_file)
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = []
+        if self.output_file.endswith(PARQUET_SUFFIXES):
+            self._writer = pq.ParquetWriter(self.output_file, study_schema(), compression="zstd")
+        else:
+            self._writer = pa_ipc.new_file(self.output_file, study_schema())
+
+    def write(self, study):
+        self._pending.append(study)
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(studies_to_table(self._pending))
+            self._pending = []
+
+
+def iter_study_tables(file_path, batch_size):
+    """
+    Stream an Arrow IPC or Parquet subject study file as StudyTable batches of at most
+    `batch_size` studies.
+    """
+    _require_pyarrow()
+    file_path = os.fspath(file_path)
+    if file_path.endswith(PARQUET_SUFFIXES):
+        parquet_file = pq.ParquetFile(file_path)
+        try:
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                yield StudyTable(pa.Table.from_batches([batch]))
+        finally:
+            parquet_file.close()
+    else:
+        with pa.memory_map(file_path) as source:
+            reader = pa_ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(i)])
+                for start in range(0, table.num_rows, batch_size):
+                    yield StudyTable(table.slice(start, batch_size))
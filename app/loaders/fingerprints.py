@@ -0,0 +1,25 @@
+import hashlib
+import json
+
+
+def fingerprint(*parts):
+    """
+    Digest of the given JSON-serializable values, stored to detect changed records on reload.
+    """
+    encoded = json.dumps(parts, separators=(",", ":"), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def subject_study_fingerprints(study_text, score, tags, variants):
+    """
+    Fingerprints of a subject study record.
+    - study_text: (name, summary, description, url, category)
+    - score: (genetic_score, percentile)
+    - tags: List of tag names.
+    - variants: List of normalized variant tuples (variant, genotype, gene, effect_size,
+      effect_polarity, variant_frequency, significance).
+    Returns (study_fingerprint, fingerprint): the first covers the study text only, the
+    second the whole subject study.
+    """
+    study_fingerprint = fingerprint(*study_text)
+    return study_fingerprint, fingerprint(study_fingerprint, *score, tags, variants)
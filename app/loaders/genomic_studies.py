@@ -1,63 +1,157 @@
 import psycopg2
 from psycopg2.extras import execute_batch
-from pymongo import MongoClient
-from pathlib import Path
-import json
+import asyncio
+import io
 import logging
+from app.core.config import config
+from app.core.database import pooled_connection
+from app.core.schema import ensure_schema
+from app.loaders.columnar import StudyTable, write_copy_csv
+from app.loaders.fingerprints import subject_study_fingerprints
+from app.loaders.phenotype_tags import PhenotypeTagDictionary
+from app.loaders.study_export import export_subject_studies
 
 # Logger for this file
 logger = logging.getLogger(__name__)
 
-DB_CONFIG = {
-    "dbname": "vitaledge_datalake",
-    "user": "samseatt",
-    "password": "password",
-    "host": "localhost",
-    "port": 5432
-}
+DB_CONFIG = config.DATABASE
 
-def load_subject_studies_to_datalake(studies_data):
+# Process-wide phenotype tag dictionary shared by all loads
+phenotype_tags = PhenotypeTagDictionary(pooled_connection)
+
+# Limits concurrent async loads so they cannot exhaust the connection pool
+_load_slots = asyncio.Semaphore(config.DB_LOAD_CONCURRENCY)
+
+
+async def aload_subject_studies_to_datalake(studies_data, bulk=True):
     """
-    Load subject study data into the Datalake PostgreSQL database.
+    Async entry point for the Datalake loaders.
     - studies_data: List of study records from the JSON file.
+    - bulk: Use the set-based bulk loader instead of the row-by-row loader.
+    Returns (study_ids, statuses), see `bulk_load_subject_studies_to_datalake`.
+
+    The blocking load runs on a worker thread with a pooled connection, so the event
+    loop keeps serving other requests while it runs.
+    """
+    loader = bulk_load_subject_studies_to_datalake if bulk else load_subject_studies_to_datalake
+    async with _load_slots:
+        return await asyncio.to_thread(loader, studies_data)
+
+
+def clear_subject_study_fingerprints(subject_studies, conn=None):
+    """
+    Clears the fingerprints of subject studies, so the next load of their records
+    counts them as changed and embeds and indexes them again. Used when records were
+    written to the Datalake but could not be indexed in VectorDB.
+    - subject_studies: (subject de_id, study id) pairs.
+    - conn: Optional connection to use; defaults to one borrowed from the pool.
+    Returns the number of subject studies updated.
     """
+    if conn is None:
+        with pooled_connection() as conn:
+            return clear_subject_study_fingerprints(subject_studies, conn)
+
+    de_ids = [de_id for de_id, _ in subject_studies]
+    study_ids = [study_id for _, study_id in subject_studies]
     try:
-        # Establish database connection
-        conn = psycopg2.connect(**DB_CONFIG)
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            UPDATE subject_studies ss
+            SET fingerprint = NULL
+            FROM subjects s, unnest(%s::text[], %s::integer[]) AS pending(de_id, study_id)
+            WHERE s.de_id = pending.de_id AND ss.subject_id = s.id AND ss.study_id = pending.study_id;
+            """, (de_ids, study_ids))
+            updated = cursor.rowcount
+        conn.commit()
+        return updated
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+
+
+def load_subject_studies_to_datalake(studies_data, conn=None):
+    """
+    Load subject study data into the Datalake PostgreSQL database.
+    - studies_data: List of study records from the JSON file, or a StudyTable.
+    - conn: Optional connection to use; defaults to one borrowed from the pool.
+    Returns (study_ids, statuses), see `bulk_load_subject_studies_to_datalake`.
+    """
+    if conn is None:
+        with pooled_connection() as conn:
+            return load_subject_studies_to_datalake(studies_data, conn)
+
+    if isinstance(studies_data, StudyTable):
+        studies_data = studies_data.to_records()
+
+    cursor = None
+    try:
+        ensure_schema(conn)
         cursor = conn.cursor()
 
         # Queries for inserting into tables
         subject_lookup_query = "SELECT id FROM subjects WHERE de_id = %s;"
 
+        # Studies are only rewritten when their fingerprint changed
         study_insert_query = """
         INSERT INTO studies (
-            name, summary, description, url, category
-        ) VALUES (%s, %s, %s, %s, %s)
+            name, summary, description, url, category, fingerprint
+        ) VALUES (%s, %s, %s, %s, %s, %s)
         ON CONFLICT (name) DO UPDATE SET
             summary = EXCLUDED.summary,
             description = EXCLUDED.description,
             url = EXCLUDED.url,
-            category = EXCLUDED.category
+            category = EXCLUDED.category,
+            fingerprint = EXCLUDED.fingerprint
+        WHERE studies.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint
         RETURNING id;
         """
+        study_lookup_query = "SELECT id FROM studies WHERE name = %s;"
 
-        subject_study_insert_query = """
+        subject_study_lookup_query = """
+        SELECT id, fingerprint FROM subject_studies
+        WHERE subject_id = %s AND study_id = %s;
+        """
+
+        # Upsert on the (subject_id, study_id) unique constraint; xmax = 0 only for inserted rows
+        subject_study_upsert_query = """
         INSERT INTO subject_studies (
-            subject_id, study_id, score, score_percentile
-        ) VALUES (%s, %s, %s, %s)
-        RETURNING id;
+            subject_id, study_id, score, score_percentile, fingerprint
+        ) VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (subject_id, study_id) DO UPDATE SET
+            score = EXCLUDED.score,
+            score_percentile = EXCLUDED.score_percentile,
+            fingerprint = EXCLUDED.fingerprint
+        RETURNING id, (xmax = 0) AS inserted;
+        """
+
+        subject_study_update_query = """
+        UPDATE subject_studies SET score = %s, score_percentile = %s, fingerprint = %s
+        WHERE id = %s;
         """
 
         variant_insert_query = """
         INSERT INTO subject_study_variants (
-            study_id, variant, genotype, gene, effect_size, effect_polarity, variant_frequency, significance
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+            study_id, subject_id, variant, genotype, gene, effect_size, effect_polarity, variant_frequency, significance
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
         """
 
         study_ids = []
+        statuses = []
+
+        # Resolve all phenotype tags of the file at once
+        tag_ids = phenotype_tags.resolve(
+            (tag for study in studies_data for tag in study["study"].get("tags", [])), conn
+        )
+
+        # Fingerprints, and the last occurrence of each (subject, study) pair in the batch
+        study_rows = prepare_subject_study_rows(studies_data)[0]
+        last_ord = {(row[1], row[2]): row[0] for row in study_rows}
+
+        # Per-study messages, and the SQL rendering in them, only at DEBUG
+        debug = logger.isEnabledFor(logging.DEBUG)
 
         # Process each study in the data
-        for study in studies_data:
+        for ord, study in enumerate(studies_data):
             # Extract 'de_id' from JSON, treating it as 'patient_id'
             de_id = study["patient_id"]
             cursor.execute(subject_lookup_query, (de_id,))
@@ -72,46 +166,91 @@ def load_subject_studies_to_datalake(studies_data):
             score_data = study["score"]
             variants_data = study.get("variants", [])
 
+            study_fingerprint, fingerprint = study_rows[ord][9:11]
+
             # Insert study into studies table
             study_values = (
                 study_data["name"],
                 study_data.get("summary"),
                 study_data.get("description"),
                 study_data.get("url"),
-                study_data.get("category")
+                study_data.get("category"),
+                study_fingerprint
             )
-            logger.info("Executing query for studies:")
-            logger.info(cursor.mogrify(study_insert_query, study_values))
+            if debug:
+                logger.debug(f"Executing query for studies: {cursor.mogrify(study_insert_query, study_values).decode()}")
             cursor.execute(study_insert_query, study_values)
-            study_id = cursor.fetchone()[0]
+            result = cursor.fetchone()
+            if not result:
+                # Unchanged study
+                cursor.execute(study_lookup_query, (study_data["name"],))
+                result = cursor.fetchone()
+            study_id = result[0]
             study_ids.append(study_id)
 
-            # Insert into subject_studies table
-            subject_study_values = (
-                subject_id,
-                study_id,
-                score_data.get("genetic-score"),
-                score_data.get("percentile")
-            )
-            logger.info("Executing query for subject_studies:")
-            logger.info(cursor.mogrify(subject_study_insert_query, subject_study_values))
-            cursor.execute(subject_study_insert_query, subject_study_values)
-            subject_study_id = cursor.fetchone()[0]
-            logger.info(f"Successfully inserted subject-study with subject_study_id: {subject_study_id}")
+            # Only the last occurrence of a repeated subject study is loaded
+            if last_ord[(de_id, study_data["name"])] != ord:
+                statuses.append("duplicate")
+                continue
+
+            cursor.execute(subject_study_lookup_query, (subject_id, study_id))
+            existing = cursor.fetchone()
+            if existing and existing[1] == fingerprint:
+                statuses.append("unchanged")
+                continue
+
+            if existing:
+                subject_study_id, inserted = existing[0], False
+                cursor.execute(subject_study_update_query, (
+                    score_data.get("genetic-score"),
+                    score_data.get("percentile"),
+                    fingerprint,
+                    subject_study_id
+                ))
+            else:
+                # Upserted, since a concurrent load may have inserted it since the lookup
+                subject_study_values = (
+                    subject_id,
+                    study_id,
+                    score_data.get("genetic-score"),
+                    score_data.get("percentile"),
+                    fingerprint
+                )
+                if debug:
+                    logger.debug("Executing query for subject_studies: "
+                                 f"{cursor.mogrify(subject_study_upsert_query, subject_study_values).decode()}")
+                cursor.execute(subject_study_upsert_query, subject_study_values)
+                subject_study_id, inserted = cursor.fetchone()
+
+            if inserted:
+                statuses.append("new")
+                if debug:
+                    logger.debug(f"Successfully inserted subject-study with subject_study_id: {subject_study_id}")
+            else:
+                # Changed: updated in place, its tags and variants are replaced
+                cursor.execute("DELETE FROM subject_study_phenotypes WHERE subject_study_id = %s;", (subject_study_id,))
+                cursor.execute(
+                    "DELETE FROM subject_study_variants WHERE subject_id = %s AND study_id = %s;",
+                    (subject_id, subject_study_id)
+                )
+                statuses.append("changed")
+                if debug:
+                    logger.debug(f"Successfully updated subject-study with subject_study_id: {subject_study_id}")
 
             # Insert phenotype tags (if any)
             for tag in study_data.get("tags", []):
-                tag_id = get_or_create_phenotype_tag(cursor, tag)
                 cursor.execute(
                     "INSERT INTO subject_study_phenotypes (subject_study_id, phenotype_tag_id) VALUES (%s, %s);",
-                    (subject_study_id, tag_id)
+                    (subject_study_id, tag_ids[tag])
                 )
-            logger.info(f"Successfully inserted tags.")
+            if debug:
+                logger.debug(f"Successfully inserted tags.")
 
             # Insert variants
             variant_values = [
                 (
                     subject_study_id,
+                    subject_id,
                     variant.get("variant"),
                     variant.get("genotype"),
                     variant.get("gene"),
@@ -122,15 +261,15 @@ def load_subject_studies_to_datalake(studies_data):
                 )
                 for variant in variants_data
             ]
-            logger.info(f"Successfully parsed {len(variants_data)} variants")
             if variant_values:
                 execute_batch(cursor, variant_insert_query, variant_values)
-                logger.info(f"Successfully inserted {len(variant_values)} variants")
+            if debug:
+                logger.debug(f"Successfully inserted {len(variant_values)} variants")
 
         # Commit the transaction
         conn.commit()
         logger.info("All data successfully loaded into the Datalake.")
-        return study_ids
+        return study_ids, statuses
 
     except psycopg2.Error as e:
         logger.error(f"Database error: {e}")
@@ -139,8 +278,319 @@ def load_subject_studies_to_datalake(studies_data):
     finally:
         if cursor:
             cursor.close()
-        if conn:
-            conn.close()
+
+def prepare_subject_study_rows(studies_data):
+    """
+    Flatten subject study records into the rows staged by the bulk loader.
+    - studies_data: List of study records from the JSON file.
+    Returns (study_rows, tag_rows, variant_rows); `ord` (the record position) links them.
+
+    Each study row ends with two fingerprints: one of the study text (name, summary,
+    description, url, category) and one of the whole subject study (study text, score,
+    tags and variants).
+    """
+    study_rows = []
+    tag_rows = []
+    variant_rows = []
+
+    for ord, study in enumerate(studies_data):
+        study_data = study["study"]
+        score_data = study["score"]
+
+        tags = study_data.get("tags", [])
+        variants = [
+            (
+                variant.get("variant"),
+                variant.get("genotype"),
+                variant.get("gene"),
+                variant.get("effect-size"),
+                variant.get("effect-polarity"),
+                variant.get("variant-frequency"),
+                float(variant.get("significance").replace(" x 10", "e"))
+            )
+            for variant in study.get("variants", [])
+        ]
+
+        study_text = (
+            study_data["name"],
+            study_data.get("summary"),
+            study_data.get("description"),
+            study_data.get("url"),
+            study_data.get("category")
+        )
+        score = (score_data.get("genetic-score"), score_data.get("percentile"))
+
+        study_rows.append((
+            ord,
+            study["patient_id"],
+            *study_text,
+            *score,
+            *subject_study_fingerprints(study_text, score, tags, variants)
+        ))
+
+        for tag in tags:
+            tag_rows.append((ord, tag))
+
+        for seq, variant in enumerate(variants):
+            variant_rows.append((ord, seq, *variant))
+
+    return study_rows, tag_rows, variant_rows
+
+
+def _copy_value(value):
+    """
+    Render a value for COPY ... FROM STDIN in PostgreSQL text format.
+    """
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """
+    Stream rows into a table with a single COPY statement.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _copy_table(cursor, table, columns, arrow_table):
+    """
+    Stream the columns of an Arrow table into a table with a single COPY statement,
+    without converting them to Python rows.
+    """
+    buffer = io.BytesIO()
+    write_copy_csv(arrow_table.select(columns), buffer)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def bulk_load_subject_studies_to_datalake(studies_data, conn=None):
+    """
+    Load subject study data into the Datalake PostgreSQL database with set-based statements.
+    - studies_data: List of study records from the JSON file, or a StudyTable read from
+      a columnar study file (its variant columns are copied as they are).
+    - conn: Optional connection to use; defaults to one borrowed from the pool.
+
+    All rows are streamed into temporary staging tables with COPY, then subjects are
+    resolved and studies, subject_studies, phenotype links and variants are written
+    with a fixed number of statements, independent of the number of studies.
+
+    Records are compared with what is stored through their fingerprints: a subject
+    study is "new" when the subject has no row for the study yet, "changed" when its
+    fingerprint differs (it is updated in place and its tags and variants replaced)
+    and "unchanged" otherwise (nothing is written). When a batch repeats a subject
+    study, only its last occurrence is loaded and the earlier ones are "duplicate".
+    Returns (study_ids, statuses), both in the same order as `studies_data`.
+    """
+    if conn is None:
+        with pooled_connection() as conn:
+            return bulk_load_subject_studies_to_datalake(studies_data, conn)
+
+    cursor = None
+    try:
+        # Before any dictionary upsert: the tag upsert needs the unique index on phenotype_tags.name
+        ensure_schema(conn)
+        if isinstance(studies_data, StudyTable):
+            study_rows, tag_rows, variant_rows = studies_data.stage_rows()
+        else:
+            study_rows, tag_rows, variant_rows = prepare_subject_study_rows(studies_data)
+        if not study_rows:
+            return [], []
+
+        # Phenotype tag ids come from the shared dictionary, never from per-row lookups;
+        # new tags are committed on this connection before the load writes anything
+        tag_ids = phenotype_tags.resolve((tag for _, tag in tag_rows), conn)
+        tag_rows = [(ord, tag_ids[tag]) for ord, tag in tag_rows]
+
+        cursor = conn.cursor()
+
+        # Staging tables live for the transaction only
+        cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS stage_subject_studies (
+            ord integer PRIMARY KEY,
+            de_id text,
+            name text,
+            summary text,
+            description text,
+            url text,
+            category text,
+            score double precision,
+            score_percentile integer,
+            study_fingerprint text,
+            fingerprint text,
+            subject_id bigint,
+            study_id bigint,
+            subject_study_id bigint,
+            status text
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE IF NOT EXISTS stage_study_tags (
+            ord integer,
+            tag_id bigint
+        ) ON COMMIT DROP;
+        CREATE TEMP TABLE IF NOT EXISTS stage_study_variants (
+            ord integer,
+            seq integer,
+            variant text,
+            genotype text,
+            gene text,
+            effect_size double precision,
+            effect_polarity text,
+            variant_frequency double precision,
+            significance double precision
+        ) ON COMMIT DROP;
+        TRUNCATE stage_subject_studies, stage_study_tags, stage_study_variants;
+        """)
+
+        _copy_rows(cursor, "stage_subject_studies",
+                   ["ord", "de_id", "name", "summary", "description", "url", "category", "score", "score_percentile",
+                    "study_fingerprint", "fingerprint"],
+                   study_rows)
+        _copy_rows(cursor, "stage_study_tags", ["ord", "tag_id"], tag_rows)
+        variant_columns = ["ord", "seq", "variant", "genotype", "gene", "effect_size", "effect_polarity", "variant_frequency", "significance"]
+        if isinstance(studies_data, StudyTable):
+            _copy_table(cursor, "stage_study_variants", variant_columns, variant_rows)
+        else:
+            _copy_rows(cursor, "stage_study_variants", variant_columns, variant_rows)
+        logger.info(f"Staged {len(study_rows)} studies, {len(tag_rows)} tags and {len(variant_rows)} variants")
+
+        # Resolve subjects by de_id
+        cursor.execute("""
+        UPDATE stage_subject_studies s SET subject_id = subj.id
+        FROM subjects subj
+        WHERE subj.de_id = s.de_id;
+        """)
+        cursor.execute("SELECT de_id FROM stage_subject_studies WHERE subject_id IS NULL ORDER BY ord LIMIT 1;")
+        missing = cursor.fetchone()
+        if missing:
+            raise ValueError(f"No subject found with de_id: {missing[0]}")
+
+        # Upsert studies whose fingerprint changed; the last record wins when a file
+        # repeats a study name
+        cursor.execute("""
+        INSERT INTO studies (name, summary, description, url, category, fingerprint)
+        SELECT latest.name, latest.summary, latest.description, latest.url, latest.category, latest.study_fingerprint
+        FROM (
+            SELECT DISTINCT ON (name) name, summary, description, url, category, study_fingerprint
+            FROM stage_subject_studies
+            ORDER BY name, ord DESC
+        ) latest
+        JOIN (
+            SELECT name, min(ord) AS first_ord FROM stage_subject_studies GROUP BY name
+        ) first_seen USING (name)
+        ORDER BY first_seen.first_ord
+        ON CONFLICT (name) DO UPDATE SET
+            summary = EXCLUDED.summary,
+            description = EXCLUDED.description,
+            url = EXCLUDED.url,
+            category = EXCLUDED.category,
+            fingerprint = EXCLUDED.fingerprint
+        WHERE studies.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint;
+        """)
+        cursor.execute("""
+        UPDATE stage_subject_studies s SET study_id = studies.id
+        FROM studies
+        WHERE studies.name = s.name;
+        """)
+
+        # Classify each record against the stored subject study for its subject and study
+        cursor.execute("""
+        UPDATE stage_subject_studies s SET status = 'duplicate'
+        WHERE EXISTS (
+            SELECT 1 FROM stage_subject_studies later
+            WHERE later.subject_id = s.subject_id AND later.study_id = s.study_id AND later.ord > s.ord
+        );
+        UPDATE stage_subject_studies s
+        SET subject_study_id = existing.id,
+            status = CASE WHEN existing.fingerprint = s.fingerprint THEN 'unchanged' ELSE 'changed' END
+        FROM subject_studies existing
+        WHERE s.status IS NULL AND existing.subject_id = s.subject_id AND existing.study_id = s.study_id;
+        UPDATE stage_subject_studies SET status = 'new' WHERE status IS NULL;
+        """)
+
+        # Changed: update in place, tags and variants are replaced below
+        cursor.execute("""
+        UPDATE subject_studies ss
+        SET score = s.score, score_percentile = s.score_percentile, fingerprint = s.fingerprint
+        FROM stage_subject_studies s
+        WHERE s.status = 'changed' AND ss.id = s.subject_study_id;
+        """)
+
+        # New: upsert on the (subject_id, study_id) unique constraint. A subject study
+        # inserted by a concurrent load since it was classified is updated instead, and
+        # counts as changed (xmax = 0 only for inserted rows).
+        cursor.execute("""
+        WITH upserted AS (
+            INSERT INTO subject_studies (subject_id, study_id, score, score_percentile, fingerprint)
+            SELECT subject_id, study_id, score, score_percentile, fingerprint
+            FROM stage_subject_studies
+            WHERE status = 'new'
+            ORDER BY ord
+            ON CONFLICT (subject_id, study_id) DO UPDATE SET
+                score = EXCLUDED.score,
+                score_percentile = EXCLUDED.score_percentile,
+                fingerprint = EXCLUDED.fingerprint
+            RETURNING id, subject_id, study_id, (xmax = 0) AS inserted
+        )
+        UPDATE stage_subject_studies s
+        SET subject_study_id = upserted.id,
+            status = CASE WHEN upserted.inserted THEN 'new' ELSE 'changed' END
+        FROM upserted
+        WHERE s.status = 'new' AND upserted.subject_id = s.subject_id AND upserted.study_id = s.study_id;
+        """)
+        cursor.execute("""
+        DELETE FROM subject_study_phenotypes p
+        USING stage_subject_studies s
+        WHERE s.status = 'changed' AND p.subject_study_id = s.subject_study_id;
+        DELETE FROM subject_study_variants v
+        USING stage_subject_studies s
+        WHERE s.status = 'changed' AND v.subject_id = s.subject_id AND v.study_id = s.subject_study_id;
+        """)
+
+        # Phenotype links
+        cursor.execute("""
+        INSERT INTO subject_study_phenotypes (subject_study_id, phenotype_tag_id)
+        SELECT s.subject_study_id, t.tag_id
+        FROM stage_study_tags t
+        JOIN stage_subject_studies s USING (ord)
+        WHERE s.status IN ('new', 'changed');
+        """)
+
+        # Variants
+        cursor.execute("""
+        INSERT INTO subject_study_variants (
+            study_id, subject_id, variant, genotype, gene, effect_size, effect_polarity, variant_frequency, significance
+        )
+        SELECT s.subject_study_id, s.subject_id, v.variant, v.genotype, v.gene, v.effect_size, v.effect_polarity, v.variant_frequency, v.significance
+        FROM stage_study_variants v
+        JOIN stage_subject_studies s USING (ord)
+        WHERE s.status IN ('new', 'changed')
+        ORDER BY v.ord, v.seq;
+        """)
+
+        cursor.execute("SELECT study_id, status FROM stage_subject_studies ORDER BY ord;")
+        rows = cursor.fetchall()
+        study_ids = [row[0] for row in rows]
+        statuses = [row[1] for row in rows]
+
+        # Commit the transaction
+        conn.commit()
+        logger.info(f"Bulk loaded {len(study_ids)} studies into the Datalake: "
+                    f"{statuses.count('new')} new, {statuses.count('changed')} changed, "
+                    f"{statuses.count('unchanged')} unchanged.")
+        return study_ids, statuses
+
+    except (psycopg2.Error, ValueError) as e:
+        logger.error(f"Bulk load failed: {e}")
+        conn.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
 
 def get_or_create_phenotype_tag(cursor, tag_name):
     """
@@ -205,8 +655,8 @@ def load_patient_studies_to_datalake_DELETE_ME(studies_data):
                 score_data.get("genetic-score"),
                 score_data.get("percentile")
             )
-            logger.info("Executing query:")
-            logger.info(cursor.mogrify(study_insert_query, study_values))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Executing query: {cursor.mogrify(study_insert_query, study_values).decode()}")
             cursor.execute(study_insert_query, study_values)
             logger.debug(f"Inserted study")
             result = cursor.fetchone()
@@ -271,41 +721,17 @@ def get_or_create_phenotype_tag_DELETE_ME(cursor, tag_name):
 
     return tag_id
 
-def export_subject_studies_to_json(subject_id, output_file):
-    # MongoDB connection
-    mongo_uri = "mongodb://localhost:27017"  # Update if needed
-    db_name = "genomic_pipeline_db"
-    collection_name = "studies"
-
+def export_subject_studies_to_json(subject_id, output_file, ndjson=None):
+    """
+    Export the studies of a subject (or a list of subjects) from MongoDB to a file.
+    - subject_id: Subject ID or list of subject IDs.
+    - output_file: Path to the JSON (or NDJSON) file to create.
+    - ndjson: Write NDJSON instead of a JSON array (defaults to the file extension).
+    Returns the number of studies exported per subject ID.
+    """
+    logger.info(f"Getting studies for subject: {subject_id}")
     try:
-        # Connect to MongoDB
-        client = MongoClient(mongo_uri)
-        db = client[db_name]
-        collection = db[collection_name]
-        logger.info(f"Connected to Beaker at {mongo_uri} using collection: {collection_name}")
-
-        # Query for the subject's studies
-        query = {"patient_id": subject_id}
-        logger.info(f"Getting studies for subject: {subject_id}")
-        studies = list(collection.find(query))
-
-        if not studies:
-            logger.warning(f"No studies found for subject_id: {subject_id}")
-            return
-
-        # Convert MongoDB data to JSON-serializable format
-        for study in studies:
-            study["_id"] = str(study["_id"])  # Convert ObjectId to string
-
-        # Write data to the JSON file
-        output_path = Path(output_file)
-        with output_path.open("w") as outfile:
-            json.dump(studies, outfile, indent=4)
-
-        logger.info(f"Exported {len(studies)} studies for subject_id '{subject_id}' to {output_file}")
-
+        return export_subject_studies(subject_id, output_file, ndjson=ndjson)
     except Exception as e:
         logger.error(f"Error: {e}")
-
-    finally:
-        client.close()
+        raise
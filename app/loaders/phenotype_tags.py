@@ -0,0 +1,114 @@
+from contextlib import nullcontext
+import logging
+import threading
+
+# Logger for this file
+logger = logging.getLogger(__name__)
+
+
+class PhenotypeTagDictionary:
+    """
+    Process-wide name -> id dictionary of the `phenotype_tags` table.
+
+    The table is read once on first use. Tags that are not known yet are upserted with a
+    single `INSERT ... ON CONFLICT (name)` statement per call (requires a unique constraint
+    on `phenotype_tags.name`) and committed at once, so the ids it hands out are always
+    visible to every concurrent load. Names are upserted in sorted order, so concurrent
+    upserts of the same new tags lock them in the same order and cannot deadlock. The
+    lock only guards the in-memory dictionary and is never held during SQL.
+
+    Loaders pass the connection they already hold, which must not have uncommitted
+    writes yet: borrowing a second pooled connection while holding one can exhaust the
+    pool when several loads run at once.
+    """
+
+    def __init__(self, connection):
+        # connection: Callable returning a context manager that yields a psycopg2 connection
+        self._connection = connection
+        self._ids = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def resolve(self, names, conn=None):
+        """
+        Return {name: id} for the given tag names, creating the missing ones.
+        - conn: Optional connection to use (and commit); defaults to one from the factory.
+        """
+        names = list(dict.fromkeys(names))
+        if not self._loaded:
+            self.load(conn)
+
+        with self._lock:
+            missing = [name for name in names if name not in self._ids]
+        if missing:
+            self.upsert(missing, conn)
+
+        with self._lock:
+            return {name: self._ids[name] for name in names}
+
+    def upsert(self, names, conn=None):
+        """
+        Insert the given tag names if needed, in one statement.
+        - conn: Optional connection to use (and commit); defaults to one from the factory.
+        Returns a list of (name, id, inserted) tuples.
+        """
+        names = sorted(set(names))
+        if not names:
+            return []
+
+        with self._use(conn) as conn:
+            try:
+                with conn.cursor() as cursor:
+                    # DO UPDATE (rather than DO NOTHING) so RETURNING also yields existing rows;
+                    # xmax = 0 only for rows inserted by this statement.
+                    cursor.execute(
+                        """
+                        INSERT INTO phenotype_tags (name)
+                        SELECT unnest(%s::text[])
+                        ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                        RETURNING name, id, (xmax = 0) AS inserted;
+                        """,
+                        (names,)
+                    )
+                    rows = cursor.fetchall()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            for name, tag_id, _ in rows:
+                self._ids[name] = tag_id
+        logger.info(f"Upserted {len(rows)} phenotype tags ({sum(1 for row in rows if row[2])} new)")
+        return rows
+
+    def load(self, conn=None):
+        """
+        (Re)load the whole dictionary from the `phenotype_tags` table.
+        - conn: Optional connection to use; defaults to one from the factory.
+        """
+        with self._use(conn) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT name, id FROM phenotype_tags ORDER BY id;")
+                rows = cursor.fetchall()
+            conn.rollback()
+
+        ids = {}
+        for name, tag_id in rows:
+            ids.setdefault(name, tag_id)
+        with self._lock:
+            self._ids = ids
+            self._loaded = True
+        logger.info(f"Loaded {len(ids)} phenotype tags")
+
+    def _use(self, conn):
+        # The caller's connection as is, or a new one from the factory
+        return nullcontext(conn) if conn is not None else self._connection()
+
+    def reset(self):
+        """
+        Forget the cached tags; the next resolve() reloads them.
+        """
+        with self._lock:
+            self._ids = {}
+            self._loaded = False
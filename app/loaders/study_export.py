@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import time
+from app.core.config import config
+from app.core.metrics import EXPORT_STAGE_SECONDS, STUDIES_EXPORTED
+from app.core.mongo import get_studies_collection
+from app.core.request_timing import record_timing
+
+# Logger for this file
+logger = logging.getLogger(__name__)
+
+# Only the fields read by the Datalake loaders
+STUDY_PROJECTION = {"_id": False, "patient_id": True, "study": True, "score": True, "variants": True}
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+
+def iter_subject_studies(subject_ids, collection=None, batch_size=None):
+    """
+    Stream the studies of one or more subjects from MongoDB, one cursor batch at a time.
+    - subject_ids: Subject ID or list of subject IDs (matched on `patient_id`).
+    - collection: Optional collection; defaults to the shared studies collection.
+    - batch_size: Documents per cursor batch (defaults to MONGO_EXPORT_BATCH_SIZE).
+    Studies are yielded subject by subject, in the order the IDs are given.
+    """
+    if isinstance(subject_ids, str):
+        subject_ids = [subject_ids]
+    collection = collection if collection is not None else get_studies_collection()
+    batch_size = batch_size or config.MONGO_EXPORT_BATCH_SIZE
+
+    for subject_id in subject_ids:
+        with collection.find({"patient_id": subject_id}, STUDY_PROJECTION, batch_size=batch_size) as cursor:
+            yield from cursor
+
+
+def export_subject_studies(subject_ids, output_file, ndjson=None, batch_size=None, collection=None):
+    """
+    Export the studies of one or more subjects from MongoDB to a file the loaders accept.
+    - subject_ids: Subject ID or list of subject IDs.
+    - output_file: Path of the file to create.
+    - ndjson: Write one record per line instead of a JSON array; by default NDJSON is
+      used when the file name ends in .ndjson or .jsonl.
+    - batch_size: Documents per cursor batch (defaults to MONGO_EXPORT_BATCH_SIZE).
+    - collection: Optional collection; defaults to the shared studies collection.
+    Returns the number of studies exported per subject ID.
+
+    Records are written as compact JSON while the cursor is iterated, so memory use is
+    bounded by one cursor batch. The file is written under a temporary name and moved
+    into place when complete; nothing is written when no studies are found.
+    """
+    if isinstance(subject_ids, str):
+        subject_ids = [subject_ids]
+    output_file = os.fspath(output_file)
+    if ndjson is None:
+        ndjson = output_file.endswith(NDJSON_SUFFIXES)
+    counts = dict.fromkeys(subject_ids, 0)  # Also drops repeated IDs
+    encode = json.JSONEncoder(separators=(",", ":"), default=str).encode
+
+    total = 0
+    temp_file = f"{output_file}.part"
+    started = time.perf_counter()
+    write_seconds = 0.0  # Encoding and writing; the rest of the time is spent on MongoDB reads
+    try:
+        with open(temp_file, "w") as outfile:
+            for study in iter_subject_studies(list(counts), collection, batch_size):
+                write_started = time.perf_counter()
+                if ndjson:
+                    outfile.write(encode(study) + "\n")
+                else:
+                    outfile.write(("[\n" if not total else ",\n") + encode(study))
+                write_seconds += time.perf_counter() - write_started
+                counts[study["patient_id"]] += 1
+                total += 1
+            if not ndjson and total:
+                outfile.write("\n]\n")
+    except BaseException:
+        os.remove(temp_file)
+        raise
+    finally:
+        mongo_seconds = time.perf_counter() - started - write_seconds
+        EXPORT_STAGE_SECONDS.labels("mongo").observe(mongo_seconds)
+        EXPORT_STAGE_SECONDS.labels("write").observe(write_seconds)
+        STUDIES_EXPORTED.inc(total)
+        record_timing("mongo", mongo_seconds)
+        record_timing("write", write_seconds)
+
+    if not total:
+        os.remove(temp_file)
+        logger.warning(f"No studies found for subject_ids: {subject_ids}")
+        return counts
+
+    os.replace(temp_file, output_file)
+    logger.info(f"Exported {total} studies for {len(counts)} subjects to {output_file}")
+    return counts
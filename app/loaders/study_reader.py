@@ -0,0 +1,135 @@
+import json
+import logging
+from itertools import islice
+import time
+
+# Logger for this file
+logger = logging.getLogger(__name__)
+
+# Extensions of the JSON array and NDJSON subject study files read by `iter_study_records`
+JSON_SUFFIXES = (".json", ".ndjson", ".jsonl")
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_study_records(file_path, read_size=1 << 16, timings=None):
+    """
+    Stream study records from a subject study file without loading the whole file.
+    - file_path: Path to a file holding a top-level JSON array of records, or NDJSON
+      (one record per line).
+    - read_size: Number of characters read at a time.
+    - timings: Optional dict; the seconds spent decoding JSON are added to its "decode"
+      key, so callers can tell file reads from decoding.
+    Raises json.JSONDecodeError for invalid JSON, including an empty (or whitespace-only)
+    file; an empty array yields no records.
+    """
+    loads = _timed(json.loads, timings)
+    with open(file_path, "r") as infile:
+        buffer = infile.read(read_size)
+        start = 0
+        while True:
+            while start < len(buffer) and buffer[start] in _WHITESPACE:
+                start += 1
+            if start < len(buffer):
+                break
+            more = infile.read(read_size)
+            if not more:
+                break
+            buffer += more
+
+        if start >= len(buffer):
+            # As json.load: an empty file is an error, not a file without records
+            raise json.JSONDecodeError("Expecting value", buffer, start)
+        if buffer[start:start + 1] == "[":
+            yield from _iter_array(infile, buffer, start + 1, read_size, _timed(_decoder.raw_decode, timings))
+        else:
+            # NDJSON: the first chunk is already read; its complete lines are decoded first
+            # and its trailing partial line is joined to the next line of the file
+            *lines, pending = buffer.split("\n")
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield loads(line)
+            for line in infile:
+                if pending:
+                    line, pending = pending + line, ""
+                line = line.strip()
+                if line:
+                    yield loads(line)
+            if pending.strip():
+                yield loads(pending)
+
+
+def _timed(decode, timings):
+    # Wraps a decode function to add its run time to timings["decode"]
+    if timings is None:
+        return decode
+    timings.setdefault("decode", 0.0)
+
+    def timed(*args):
+        started = time.perf_counter()
+        try:
+            return decode(*args)
+        finally:
+            timings["decode"] += time.perf_counter() - started
+
+    return timed
+
+
+def _iter_array(infile, buffer, position, read_size, raw_decode):
+    eof = False
+    chunk_size = read_size
+    while True:
+        # Skip whitespace and separators between records
+        while position < len(buffer) and buffer[position] in _WHITESPACE + ",":
+            position += 1
+
+        if position >= len(buffer):
+            if eof:
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, position)
+            buffer, position = buffer[position:] + infile.read(chunk_size), 0
+            eof = position >= len(buffer)
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        try:
+            record, end = raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Incomplete record: read more, growing the read size so large records are
+            # not re-parsed many times
+            more = infile.read(chunk_size)
+            eof = not more
+            buffer, position = buffer[position:] + more, 0
+            chunk_size *= 2
+            continue
+
+        if end == len(buffer) and not eof:
+            # A scalar may continue past the buffer; make sure the record is complete
+            more = infile.read(chunk_size)
+            if more:
+                buffer, position = buffer[position:] + more, 0
+                continue
+            eof = True
+
+        yield record
+        chunk_size = read_size
+        position = end
+        if position > read_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_batches(records, batch_size):
+    """
+    Group an iterator of records into lists of at most `batch_size` records.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
@@ -1,13 +1,58 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.routes import router
+from app.core.config import config
+from app.core.database import init_db_pool, close_db_pool
+from app.core.metrics import MetricsMiddleware
+from app.core.mongo import close_mongo_client
+from app.core.request_timing import RequestTimingMiddleware
+from app.core.schema import migrate_on_startup
+from app.services.embeddings_cache import close_embeddings_cache
+from app.services.http_client import init_http_client, close_http_client
+from app.services.ingest_daemon import ingest_daemon
+from app.services.jobs import job_manager
 from app.utils.logging import setup_logging
 # from app.api.routes.studies import router as studies_router
 
 # Set up logging for the application
-setup_logging(log_level="INFO", log_file="logs/vitaledge_genomics_handler.log")
+setup_logging(
+    log_level=config.LOG_LEVEL,
+    log_file=config.LOG_FILE,
+    json_format=config.LOG_JSON,
+    queue_size=config.LOG_QUEUE_SIZE,
+    rate_limit=config.LOG_RATE_LIMIT,
+    rate_burst=config.LOG_RATE_BURST,
+)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Long-lived resources shared across requests
+    await init_http_client()
+    init_db_pool()
+    if config.DB_AUTO_MIGRATE:
+        # Once, before serving; loads themselves never migrate
+        await asyncio.to_thread(migrate_on_startup)
+    await job_manager.start()
+    if config.INGEST_ENABLED:
+        await ingest_daemon.start()
+    yield
+    if config.INGEST_ENABLED:
+        await ingest_daemon.stop()
+    await job_manager.stop()
+    await close_http_client()
+    close_db_pool()
+    close_mongo_client()
+    close_embeddings_cache()
+
+app = FastAPI(lifespan=lifespan)
+
+# Server-Timing header and opt-in profiling (PROFILE_HEADER) of the studies routes
+app.add_middleware(RequestTimingMiddleware)
+
+# Request latency and in-flight metrics, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Include the routes
 app.include_router(router)
@@ -0,0 +1,185 @@
+"""
+File: embeddings_cache.py
+Project: VitalEdge Genomics Tubes
+Description: Content-addressed cache for text embeddings, checked by `EmbeddingsService`
+             before any call to the Embeddings microservice.
+
+Features:
+- Keys are a SHA-256 hash of the embedding model name and the text, so the same
+  study text shared by many subjects is embedded only once per model.
+- In-memory LRU bounded by EMBEDDINGS_CACHE_SIZE entries.
+- Optional SQLite backing store (EMBEDDINGS_CACHE_PATH) that survives restarts.
+  Entries evicted from memory stay on disk and are promoted back on the next hit.
+  With a store, `EmbeddingsService` runs lookups and stores on a worker thread so the
+  SQLite I/O does not block the event loop.
+- Hit, miss and eviction counters exposed through `stats()`.
+"""
+from array import array
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Optional
+from app.core.config import config
+from app.utils.logging import logger
+
+
+class EmbeddingsCache:
+    """
+    LRU embedding cache with an optional persistent SQLite store.
+    """
+
+    def __init__(self, model: str, max_size: int = 10000, db_path: Optional[str] = None):
+        self.model = model
+        self.max_size = max_size
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection, which is shared by the worker threads
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            db_dir = os.path.dirname(db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, embedding BLOB NOT NULL)")
+            self._db.commit()
+            logger.info(f"Embeddings cache backed by {db_path}")
+
+    @property
+    def persistent(self) -> bool:
+        """
+        True when lookups and stores touch the SQLite file, so callers on the event
+        loop should run them on a worker thread.
+        """
+        return self._db is not None
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: list) -> list:
+        """
+        Returns the cached embedding for each text, or None where it is not cached.
+        """
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(texts)
+        disk_lookups = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = embedding
+                    self.hits += 1
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+        # Disk reads hold only the SQLite lock, so memory lookups of other threads are not held up
+        found = self._read_from_disk(list(disk_lookups)) if disk_lookups and self._db is not None else {}
+
+        with self._lock:
+            for key, embedding in found.items():
+                for i in disk_lookups.pop(key):
+                    results[i] = embedding
+                    self.hits += 1
+                    self.disk_hits += 1
+                self._remember(key, embedding)
+            self.misses += sum(len(indices) for indices in disk_lookups.values())
+
+        return results
+
+    def put_many(self, texts: list, embeddings: list):
+        """
+        Stores the embeddings of the given texts in memory and, if configured, on disk.
+        """
+        items = [(self.key(text), list(embedding)) for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            for key, embedding in items:
+                self._remember(key, embedding)
+        if items:
+            with self._db_lock:
+                if self._db is not None:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, embedding) VALUES (?, ?)",
+                        [(key, array("d", embedding).tobytes()) for key, embedding in items],
+                    )
+                    self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model": self.model,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, embedding: list):
+        # Caller must hold the lock
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_from_disk(self, keys: list) -> dict:
+        # SQLite limits the number of bound parameters per statement
+        found = {}
+        with self._db_lock:
+            if self._db is None:
+                return found
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for key, blob in rows:
+                    found[key] = array("d", blob).tolist()
+        return found
+
+
+_cache: Optional[EmbeddingsCache] = None
+
+
+def get_embeddings_cache() -> Optional[EmbeddingsCache]:
+    """
+    Returns the process-wide embeddings cache, or None when caching is disabled.
+    """
+    global _cache
+    if _cache is None and config.EMBEDDINGS_CACHE_ENABLED:
+        _cache = EmbeddingsCache(
+            model=config.EMBEDDINGS_MODEL,
+            max_size=config.EMBEDDINGS_CACHE_SIZE,
+            db_path=config.EMBEDDINGS_CACHE_PATH,
+        )
+    return _cache
+
+
+def close_embeddings_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
@@ -12,6 +12,9 @@ Features:
 - Sends text data to the VitalEdge Embeddings microservice for embedding generation.
 - Processes and validates embedding responses.
 - Supports both single-text and batch embedding generation.
+- Uses the shared, pooled HTTP client from `app.services.http_client`.
+- Checks the content-addressed embeddings cache (`app.services.embeddings_cache`)
+  before calling the microservice.
 
 Usage:
     Import the `EmbeddingsService` class and call its methods to interact with 
@@ -21,7 +24,7 @@ Example:
     from app.services.embeddings_service import EmbeddingsService
 
     embeddings_service = EmbeddingsService()
-    embeddings = embeddings_service.generate_embeddings(["Sample text for embedding."])
+    embeddings = await embeddings_service.generate_embeddings(["Sample text for embedding."])
     print(embeddings)
 
 Notes:
@@ -34,8 +37,13 @@ Dependencies:
 - `httpx`: Used for HTTP communication with the embeddings microservice.
 
 """
+import asyncio
+from typing import Optional
 import httpx
 from app.core.config import config
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS_IN_FLIGHT
+from app.services.embeddings_cache import EmbeddingsCache, get_embeddings_cache
+from app.services.http_client import get_http_client
 from app.utils.logging import logger
 
 class EmbeddingsService:
@@ -43,18 +51,111 @@ class EmbeddingsService:
     Handles embedding requests to the VitalEdge Embeddings microservice.
     """
 
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, cache: Optional[EmbeddingsCache] = None):
+        # Defaults to the shared application client and cache so connections and embeddings are reused
+        self._client = client
+        self._cache = cache
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
+    @property
+    def cache(self) -> Optional[EmbeddingsCache]:
+        return self._cache or get_embeddings_cache()
+
     async def generate_embedding(self, text: str) -> list:
         try:
-            # Log the URL being used
-            
-            async with httpx.AsyncClient() as client:
-                logger.info(f"Calling embedding service at {config.EMBEDDINGS_URL}")
-                response = await client.post(
-                    f"{config.EMBEDDINGS_URL}/embeddings/generate",
-                    json={"texts": [text]}
-                )
-                response.raise_for_status()
-                embeddings = response.json().get("embeddings")
-                return embeddings[0]  # Return the first embedding
+            cache = self.cache
+            if cache is not None:
+                cached = (await self._cache_get(cache, [text]))[0]
+                if cached is not None:
+                    return cached
+
+            logger.info(f"Calling embedding service at {config.EMBEDDINGS_URL}")
+            response = await self.client.post(
+                f"{config.EMBEDDINGS_URL}/embeddings/generate",
+                json={"texts": [text]}
+            )
+            response.raise_for_status()
+            embeddings = response.json().get("embeddings")
+            if cache is not None:
+                await self._cache_put(cache, [text], embeddings[:1])
+            return embeddings[0]  # Return the first embedding
         except Exception as e:
             logger.error(f"Error: {e}")
+
+    async def generate_embeddings(self, texts: list, batch_size: int = None, max_concurrency: int = None,
+                                  cached: bool = True) -> list:
+        """
+        Generates embeddings for a list of texts.
+        - texts: Texts to embed.
+        - batch_size: Number of texts per request (defaults to EMBEDDINGS_BATCH_SIZE).
+        - max_concurrency: Maximum requests in flight (defaults to EMBEDDINGS_MAX_CONCURRENCY).
+        - cached: Look the texts up in, and add them to, the embeddings cache. Pass False
+          for one-off texts (e.g. search queries) that should not displace study embeddings.
+
+        Returns the embeddings in the same order as `texts`. Cached texts are not sent
+        to the service, and each distinct uncached text is sent only once.
+        """
+        if not texts:
+            return []
+
+        cache = self.cache if cached else None
+        if cache is None:
+            return await self._request_embeddings(texts, batch_size, max_concurrency)
+
+        embeddings = await self._cache_get(cache, texts)
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            generated = await self._request_embeddings(missing, batch_size, max_concurrency)
+            await self._cache_put(cache, missing, generated)
+            generated_by_text = dict(zip(missing, generated))
+            embeddings = [
+                embedding if embedding is not None else generated_by_text[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        logger.info(f"Embeddings for {len(texts)} texts: {len(texts) - len(missing)} from cache, {len(missing)} generated")
+        return embeddings
+
+    @staticmethod
+    async def _cache_get(cache: EmbeddingsCache, texts: list) -> list:
+        # A persistent cache reads SQLite, which must not block the event loop
+        if cache.persistent:
+            return await asyncio.to_thread(cache.get_many, texts)
+        return cache.get_many(texts)
+
+    @staticmethod
+    async def _cache_put(cache: EmbeddingsCache, texts: list, embeddings: list):
+        if cache.persistent:
+            await asyncio.to_thread(cache.put_many, texts, embeddings)
+        else:
+            cache.put_many(texts, embeddings)
+
+    async def _request_embeddings(self, texts: list, batch_size: int = None, max_concurrency: int = None) -> list:
+        """
+        Sends the texts to the Embeddings microservice in concurrent batches.
+        """
+        batch_size = batch_size or config.EMBEDDINGS_BATCH_SIZE
+        max_concurrency = max_concurrency or config.EMBEDDINGS_MAX_CONCURRENCY
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        url = f"{config.EMBEDDINGS_URL}/embeddings/generate"
+        client = self.client
+
+        async def embed_batch(batch):
+            async with semaphore:
+                with UPSTREAM_REQUESTS_IN_FLIGHT.labels("embeddings").track_inprogress(), \
+                        UPSTREAM_REQUEST_SECONDS.labels("embeddings").time():
+                    response = await client.post(url, json={"texts": batch})
+                response.raise_for_status()
+                embeddings = response.json().get("embeddings")
+                if not embeddings or len(embeddings) != len(batch):
+                    raise ValueError(f"Embedding service returned {len(embeddings or [])} embeddings for {len(batch)} texts")
+                return embeddings
+
+        logger.info(f"Calling embedding service at {config.EMBEDDINGS_URL} for {len(texts)} texts in {len(batches)} batches")
+        # gather() preserves the order of the batches, so results line up with the input texts
+        results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+
+        return [embedding for batch in results for embedding in batch]
@@ -0,0 +1,131 @@
+"""
+File: health.py
+Project: VitalEdge Genomics Tubes
+Description: Cached health and readiness probes of the service's dependencies.
+
+Postgres (on a dedicated connection outside the loaders' pool, so a pool fully in use
+by loads neither delays the probe nor hides a server that stopped answering), MongoDB
+(through the shared client), the Embeddings service and VectorDB (through the shared
+HTTP client) are probed
+concurrently, each with a HEALTH_PROBE_TIMEOUT. The report is cached for
+HEALTH_CACHE_TTL seconds, and concurrent callers share one probe run, so frequent
+polling by an orchestrator does not cost a probe per poll.
+
+Used by the `/health` and `/ready` endpoints.
+"""
+import asyncio
+from datetime import datetime, timezone
+import time
+from typing import Optional
+from app.core.config import config
+from app.core.database import ping_database, pool_stats
+from app.core.mongo import get_mongo_client
+from app.services.http_client import get_http_client
+from app.utils.logging import logger
+
+
+async def probe_postgres() -> dict:
+    await asyncio.to_thread(ping_database, config.HEALTH_PROBE_TIMEOUT)
+    return {"pool": pool_stats()}
+
+
+async def probe_mongo() -> dict:
+    await asyncio.to_thread(get_mongo_client().admin.command, "ping")
+    return {}
+
+
+async def _probe_http(url: str) -> dict:
+    # Any response below 500 means the service is up and answering
+    response = await get_http_client().get(url, timeout=config.HEALTH_PROBE_TIMEOUT)
+    if response.status_code >= 500:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    return {"http_status": response.status_code}
+
+
+async def probe_embeddings() -> dict:
+    return await _probe_http(f"{config.EMBEDDINGS_URL}{config.EMBEDDINGS_HEALTH_PATH}")
+
+
+async def probe_vectordb() -> dict:
+    return await _probe_http(f"{config.VECTORDB_URL}{config.VECTORDB_HEALTH_PATH}")
+
+
+PROBES = {
+    "postgres": probe_postgres,
+    "mongo": probe_mongo,
+    "embeddings": probe_embeddings,
+    "vectordb": probe_vectordb,
+}
+
+
+class HealthChecker:
+    """
+    Runs the dependency probes and caches the report.
+    """
+
+    def __init__(self, probes: dict, ttl: float, timeout: float, required):
+        self.probes = probes
+        self.ttl = ttl
+        self.timeout = timeout
+        self.required = set(required)
+        self._report: Optional[dict] = None
+        self._checked = None
+        self._running: Optional[asyncio.Task] = None
+
+    async def check(self) -> dict:
+        """
+        Returns the dependency report, probing again when it is older than the TTL.
+        """
+        fresh = self._checked is not None and time.monotonic() - self._checked < self.ttl
+        if fresh:
+            return {**self._report, "cached": True}
+        if self._running is None or self._running.done():
+            self._running = asyncio.create_task(self._probe_all())
+        # Shielded so a cancelled caller does not cancel the probes shared with others
+        return {**await asyncio.shield(self._running), "cached": False}
+
+    def is_ready(self, report: dict) -> bool:
+        """
+        Whether every required dependency is up.
+        """
+        return all(report["dependencies"][name]["status"] == "up" for name in self.required if name in report["dependencies"])
+
+    async def _probe_all(self) -> dict:
+        results = await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+        dependencies = dict(zip(self.probes, results))
+        down = [name for name, result in dependencies.items() if result["status"] != "up"]
+        if not down:
+            status = "ok"
+        elif self.required.intersection(down):
+            status = "down"
+        else:
+            status = "degraded"
+        self._report = {
+            "status": status,
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "dependencies": dependencies,
+        }
+        self._checked = time.monotonic()
+        if down:
+            logger.warning(f"Dependencies down: {', '.join(down)}")
+        return self._report
+
+    async def _probe(self, name: str, probe) -> dict:
+        started = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe(), timeout=self.timeout)
+            result = {"status": "up", **details}
+        except asyncio.TimeoutError:
+            result = {"status": "down", "error": f"Timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"status": "down", "error": str(e) or type(e).__name__}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+
+health_checker = HealthChecker(
+    probes=PROBES,
+    ttl=config.HEALTH_CACHE_TTL,
+    timeout=config.HEALTH_PROBE_TIMEOUT,
+    required=config.READY_REQUIRED_DEPENDENCIES,
+)
@@ -0,0 +1,63 @@
+"""
+File: http_client.py
+Project: VitalEdge Genomics Tubes
+Description: Shared, pooled HTTP client used by the microservice integrations
+             (Embeddings and VectorDB).
+
+The client is created and closed with the FastAPI app lifespan (see `app/main.py`),
+so connections are kept alive and reused across studies and requests instead of
+opening a new TCP connection per call. Pool size, timeouts and keep-alive come
+from `app.core.config.Config`.
+"""
+from typing import Optional
+import httpx
+from app.core.config import config
+from app.utils.logging import logger
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Builds a new AsyncClient using the pool and timeout settings from Config.
+    """
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    Creates the shared client. Called once at application startup.
+    """
+    global _client
+    if _client is None:
+        _client = create_http_client()
+        logger.info(f"Shared HTTP client created (max_connections={config.HTTP_MAX_CONNECTIONS})")
+    return _client
+
+
+async def close_http_client():
+    """
+    Closes the shared client and its pooled connections. Called at application shutdown.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Shared HTTP client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client, creating it lazily when used outside the app lifespan
+    (e.g. from scripts).
+    """
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
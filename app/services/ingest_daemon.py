@@ -0,0 +1,221 @@
+"""
+File: ingest_daemon.py
+Project: VitalEdge Genomics Tubes
+Description: Background task that ingests subject study files dropped in the queued folder.
+
+Subject study files (JSON array, NDJSON, Arrow IPC or Parquet, by extension) in
+INGEST_QUEUED_FOLDER are claimed atomically by renaming them into
+INGEST_PROCESSING_FOLDER, so a file is only ever picked up once, then run through the
+same pipeline as `/studies/load_subject_study`. Up to INGEST_CONCURRENCY files are
+processed at once. Loaded files are moved to INGEST_ARCHIVE_FOLDER, failed ones to
+INGEST_ERROR_FOLDER. Throughput (files and studies per second) is reported by `stats()`.
+
+A file is only claimed once its modification time is INGEST_SETTLE_SECONDS old, so files
+still being copied in are left alone. Writers that create the file under another name
+(e.g. `studies.json.part`) and rename it into place once complete can set it to 0.
+Errors reading the folder or moving a file are logged and the daemon keeps polling.
+
+The daemon runs in the app lifespan when INGEST_ENABLED is set.
+"""
+import asyncio
+from datetime import datetime
+import os
+import time
+from typing import Optional
+from app.core.config import config
+from app.loaders.columnar import COLUMNAR_SUFFIXES
+from app.loaders.study_reader import JSON_SUFFIXES
+from app.services.pipeline import PipelineProgress, load_subject_study_file
+from app.utils.logging import logger
+
+# Files the loader reads: JSON arrays, NDJSON, Arrow IPC and Parquet
+SUBJECT_STUDY_SUFFIXES = JSON_SUFFIXES + COLUMNAR_SUFFIXES
+
+
+class IngestDaemon:
+    """
+    Polls the queued folder and loads claimed files concurrently.
+    """
+
+    def __init__(self, queued_folder: str, processing_folder: str, archive_folder: str, error_folder: str,
+                 concurrency: int = 4, poll_interval: float = 2.0, settle_seconds: float = 2.0,
+                 suffixes: tuple = SUBJECT_STUDY_SUFFIXES):
+        self.queued_folder = queued_folder
+        self.processing_folder = processing_folder
+        self.archive_folder = archive_folder
+        self.error_folder = error_folder
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.suffixes = tuple(suffixes)
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        self._unclaimable = set()  # Names already reported as not movable, to log them once
+        self._started = None
+        self.files_succeeded = 0
+        self.files_failed = 0
+        self.studies_loaded = 0
+
+    async def start(self):
+        for folder in (self.queued_folder, self.processing_folder, self.archive_folder, self.error_folder):
+            os.makedirs(folder, exist_ok=True)
+        self._recover()
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Ingest daemon watching {self.queued_folder} with concurrency {self.concurrency}")
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._in_flight) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        logger.info("Ingest daemon stopped")
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued_folder": self.queued_folder,
+            "concurrency": self.concurrency,
+            "in_flight": len(self._in_flight),
+            "files_succeeded": self.files_succeeded,
+            "files_failed": self.files_failed,
+            "studies_loaded": self.studies_loaded,
+            "uptime_seconds": round(elapsed, 3),
+            "files_per_second": round((self.files_succeeded + self.files_failed) / elapsed, 4) if elapsed else None,
+            "studies_per_second": round(self.studies_loaded / elapsed, 4) if elapsed else None,
+        }
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            try:
+                claimed = await self._claim_queued(slots)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # An unexpected error must not end the daemon; the next scan starts over
+                logger.exception(f"Ingest daemon scan of {self.queued_folder} failed: {e}")
+                claimed = 0
+            if not claimed:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _claim_queued(self, slots: asyncio.Semaphore) -> int:
+        """
+        Claims the files of one scan of the queued folder, oldest first, waiting for a free
+        slot before each. Returns the number of files claimed.
+        """
+        claimed = 0
+        for name in self._list_queued():
+            await slots.acquire()
+            path = self._claim(name)
+            if path is None:
+                slots.release()
+                continue
+            claimed += 1
+            task = asyncio.create_task(self._process(path, slots))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+        return claimed
+
+    def _list_queued(self) -> list:
+        """
+        Names of the queued files that have settled, oldest first.
+        """
+        settled_before = time.time() - self.settle_seconds
+        ready = []
+        try:
+            with os.scandir(self.queued_folder) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(self.suffixes):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        # Claimed by another worker since the scan, or not readable
+                        continue
+                    if mtime <= settled_before:
+                        ready.append((mtime, entry.name))
+        except FileNotFoundError:
+            return []
+        ready.sort()
+        return [name for _, name in ready]
+
+    def _claim(self, name: str) -> Optional[str]:
+        """
+        Atomically moves a queued file to the processing folder. Returns None if another
+        worker claimed it first or it cannot be moved.
+        """
+        target = os.path.join(self.processing_folder, name)
+        try:
+            os.rename(os.path.join(self.queued_folder, name), target)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            # e.g. permissions, or the processing folder is on another file system
+            if name not in self._unclaimable:
+                self._unclaimable.add(name)
+                logger.error(f"Could not claim {name}: {e}")
+            return None
+        self._unclaimable.discard(name)
+        return target
+
+    async def _process(self, path: str, slots: asyncio.Semaphore):
+        name = os.path.basename(path)
+        progress = PipelineProgress()
+        started = time.perf_counter()
+        try:
+            logger.info(f"Ingesting {name}")
+            await load_subject_study_file(path, progress=progress)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to ingest {name}: {e}")
+            self.files_failed += 1
+            self._move(path, self.error_folder)
+        else:
+            self.files_succeeded += 1
+            self.studies_loaded += progress.studies_written
+            logger.info(f"Ingested {name}: {progress.studies_written} studies in {time.perf_counter() - started:.2f}s")
+            self._move(path, self.archive_folder)
+        finally:
+            slots.release()
+
+    def _move(self, path: str, folder: str) -> bool:
+        """
+        Moves a file into a folder, adding a timestamp to its name if the folder already
+        holds a file of that name. Returns whether the file was moved.
+        """
+        name = os.path.basename(path)
+        target = os.path.join(folder, name)
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(name)
+            target = os.path.join(folder, f"{stem}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}{ext}")
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            # The file stays in the processing folder and is queued again on the next start
+            logger.error(f"Could not move {name} to {folder}: {e}")
+            return False
+        return True
+
+    def _recover(self):
+        # Files left in processing by an interrupted run are queued again
+        for entry in os.scandir(self.processing_folder):
+            # A newer upload of the same name may be queued; _move keeps both
+            if entry.is_file() and entry.name.endswith(self.suffixes) and self._move(entry.path, self.queued_folder):
+                logger.warning(f"Re-queued interrupted file {entry.name}")
+
+
+ingest_daemon = IngestDaemon(
+    queued_folder=config.INGEST_QUEUED_FOLDER,
+    processing_folder=config.INGEST_PROCESSING_FOLDER,
+    archive_folder=config.INGEST_ARCHIVE_FOLDER,
+    error_folder=config.INGEST_ERROR_FOLDER,
+    concurrency=config.INGEST_CONCURRENCY,
+    poll_interval=config.INGEST_POLL_INTERVAL,
+    settle_seconds=config.INGEST_SETTLE_SECONDS,
+)
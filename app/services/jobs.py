@@ -0,0 +1,161 @@
+"""
+File: jobs.py
+Project: VitalEdge Genomics Tubes
+Description: Bounded in-process worker pool for background ingestion jobs.
+
+Jobs are queued and run by a fixed number of asyncio workers (JOBS_WORKERS), which
+also caps how many pipelines hit the Datalake, Embeddings and VectorDB services at
+once. Submitting to a full queue (JOBS_MAX_QUEUED) fails fast. Finished jobs are kept
+for status polling, up to JOBS_MAX_RETAINED.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+from app.core.config import config
+from app.services.pipeline import PipelineProgress
+from app.utils.logging import logger
+
+
+class JobQueueFull(Exception):
+    """
+    Raised when a job is submitted while the job queue is full.
+    """
+
+
+class Job:
+    """
+    One background job and its progress.
+    """
+
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.progress = PipelineProgress()
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self._started = None
+        self._elapsed = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        if self._elapsed is not None:
+            elapsed = self._elapsed
+        elif self._started is not None:
+            elapsed = time.perf_counter() - self._started
+        else:
+            elapsed = None
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "progress": self.progress.to_dict(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed number of asyncio worker tasks.
+    """
+
+    def __init__(self, workers: int, max_queued: int, max_retained: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+        self._jobs = OrderedDict()
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Job manager started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job manager stopped")
+
+    def submit(self, kind: str, params: dict, run: Callable[[PipelineProgress], Awaitable[dict]]) -> Job:
+        """
+        Queues a job. `run` is called with the job's progress object and returns the job result.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started")
+        job = Job(kind, params)
+        try:
+            self._queue.put_nowait((job, run))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs queued)")
+        self._jobs[job.id] = job
+        self._prune()
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def counts(self) -> dict:
+        """
+        Number of retained jobs per status.
+        """
+        counts = dict.fromkeys(("queued", "running", "succeeded", "failed"), 0)
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def _worker(self, index: int):
+        while True:
+            job, run = await self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            job._started = time.perf_counter()
+            try:
+                job.result = await run(job.progress)
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled at shutdown"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                job._elapsed = time.perf_counter() - job._started
+                self._queue.task_done()
+
+    def _prune(self):
+        # Drop the oldest finished jobs beyond the retention bound
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done][:excess]:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(
+    workers=config.JOBS_WORKERS,
+    max_queued=config.JOBS_MAX_QUEUED,
+    max_retained=config.JOBS_MAX_RETAINED,
+)
@@ -0,0 +1,467 @@
+"""
+File: pipeline.py
+Project: VitalEdge Genomics Tubes
+Description: The subject study load pipeline: stream subject studies from a file or
+             from MongoDB, load them into the Datalake, generate embeddings and
+             populate VectorDB, batch by batch.
+
+Used by the `/studies/load_subject_study`, `/studies/transfer_subject_studies` and
+`/studies/load_subject_studies_batch` endpoints, both inline and as background jobs.
+Progress (studies written, embedded and indexed) and the elapsed time of each stage
+are recorded on a `PipelineProgress` so callers can report them while the pipeline runs.
+"""
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+import logging
+import time
+from typing import Optional
+import psycopg2.extensions
+from app.core.config import config
+from app.core.metrics import PIPELINE_STAGE_SECONDS, STUDIES_PROCESSED, TAGS_PROCESSED, VARIANTS_PROCESSED
+from app.core.request_timing import record_timing
+from app.loaders.columnar import StudyTable, is_columnar_file, iter_study_tables
+from app.loaders.genomic_studies import aload_subject_studies_to_datalake, clear_subject_study_fingerprints
+from app.loaders.study_export import iter_subject_studies
+from app.loaders.study_reader import iter_batches, iter_study_records
+from app.services.embeddings_service import EmbeddingsService
+from app.services.study_reads import read_cache
+from app.services.vectordb_service import VectorDBService
+from app.utils.logging import logger
+
+# Shared service instances
+embeddings_service = EmbeddingsService()
+vectordb_service = VectorDBService()
+
+# VectorDB category of the study documents (the study's own category is in the Datalake)
+STUDY_DOCUMENT_CATEGORY = "genomics"
+
+
+class PipelineProgress:
+    """
+    Per-stage counters and timings of one pipeline run.
+    """
+
+    def __init__(self):
+        self.studies_total = None
+        self.studies_written = 0
+        self.studies_embedded = 0
+        self.studies_indexed = 0
+        # Load status of the written records: new, changed, unchanged or duplicate
+        self.studies_by_status = {"new": 0, "changed": 0, "unchanged": 0, "duplicate": 0}
+        self.current_stage = None
+        self.stage_seconds = {}
+        # Set by batch loads of several files or subjects
+        self.subjects_total = None
+        self.subjects_succeeded = 0
+        self.subjects_unindexed = 0
+        self.subjects_failed = 0
+
+    @contextmanager
+    def stage(self, name: str, timings: Optional[dict] = None, observe: bool = True):
+        """
+        Times a stage; time spent in a stage entered several times is accumulated.
+        - timings: Optional dict of seconds per sub-stage that the timed code adds to
+          (e.g. "decode" from `iter_study_records`); that time is attributed to the
+          sub-stages and the rest to `name`.
+        - observe: Also record each entry in the `genomics_pipeline_stage_seconds` histogram.
+        """
+        previous = self.current_stage
+        self.current_stage = name
+        before = dict(timings) if timings else {}
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            for sub_stage, seconds in (timings or {}).items():
+                seconds -= before.get(sub_stage, 0.0)
+                self.add_stage_seconds(sub_stage, seconds, observe)
+                elapsed -= seconds
+            self.add_stage_seconds(name, elapsed, observe)
+            self.current_stage = previous
+
+    def add_stage_seconds(self, name: str, seconds: float, observe: bool = True):
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        record_timing(name, seconds)  # Server-Timing of the current request, if any
+        if observe:
+            PIPELINE_STAGE_SECONDS.labels(name).observe(seconds)
+
+    def add_indexed(self, count: int):
+        self.studies_indexed += count
+
+    def merge(self, other: "PipelineProgress"):
+        """
+        Adds the counters and stage times of a finished run, e.g. one subject of a batch load.
+        """
+        self.studies_written += other.studies_written
+        self.studies_embedded += other.studies_embedded
+        self.studies_indexed += other.studies_indexed
+        for status, count in other.studies_by_status.items():
+            self.studies_by_status[status] += count
+        for name, seconds in other.stage_seconds.items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def to_dict(self) -> dict:
+        progress = {
+            "studies_total": self.studies_total,
+            "studies_written": self.studies_written,
+            "studies_embedded": self.studies_embedded,
+            "studies_indexed": self.studies_indexed,
+            "studies_by_status": dict(self.studies_by_status),
+            "current_stage": self.current_stage,
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()},
+        }
+        if self.subjects_total is not None:
+            progress.update({
+                "subjects_total": self.subjects_total,
+                "subjects_succeeded": self.subjects_succeeded,
+                "subjects_unindexed": self.subjects_unindexed,
+                "subjects_failed": self.subjects_failed,
+            })
+        return progress
+
+
+async def iter_enriched_documents(studies_data, study_ids, progress: Optional[PipelineProgress] = None):
+    """
+    Yields VectorDB documents for the given studies, embedding them one batch at a time.
+    """
+    progress = progress or PipelineProgress()
+    batch_size = config.EMBEDDINGS_BATCH_SIZE * config.EMBEDDINGS_MAX_CONCURRENCY
+    for start in range(0, len(studies_data), batch_size):
+        batch = studies_data[start:start + batch_size]
+        texts = [f"{study['study']['summary']}\n{study['study']['description']}" for study in batch]
+        with progress.stage("embedding"):
+            embeddings = await embeddings_service.generate_embeddings(texts)
+        progress.studies_embedded += len(embeddings)
+        logger.info(f"Embeddings generated for {len(embeddings)} studies")
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for study_id, study, text, embedding in zip(study_ids[start:start + batch_size], batch, texts, embeddings):
+            study = study["study"]
+            if debug:
+                logger.debug(f"Processing study {study_id} named {study['name']}")
+            yield {
+                "id": study_id,  # Use study ID as unique identifier
+                "text": text,
+                "embedding": embedding,
+                "category": STUDY_DOCUMENT_CATEGORY,
+                "tags": study['tags']
+            }
+
+
+def _subject_ids(studies_data):
+    if isinstance(studies_data, StudyTable):
+        return studies_data.table.column("patient_id").to_pylist()
+    return [study["patient_id"] for study in studies_data]
+
+
+def _count_variants_and_tags(studies_data):
+    if isinstance(studies_data, StudyTable):
+        return studies_data.value_count("variants"), studies_data.value_count("tags")
+    variants = sum(len(study.get("variants") or ()) for study in studies_data)
+    tags = sum(len(study["study"].get("tags") or ()) for study in studies_data)
+    return variants, tags
+
+
+async def load_subject_study_batches(
+    batches,
+    bulk: Optional[bool] = None,
+    progress: Optional[PipelineProgress] = None,
+    read_timings: Optional[dict] = None,
+) -> dict:
+    """
+    Runs the load pipeline over an iterator of batches of subject studies.
+    - batches: Iterator of study record lists (or StudyTable batches).
+    - bulk: Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD).
+    - progress: Optional progress object updated as the pipeline runs.
+    - read_timings: Optional sub-stage timings of the reader (see `PipelineProgress.stage`).
+
+    The batches are processed one after the other: each is read, written to the
+    Datalake in its own transaction and embedded before the next one is read. Only the
+    VectorDB requests overlap with the later batches (see `populate_stream`). Peak
+    memory depends on the batch size, not the number of records. The iterator is closed when the
+    pipeline ends.
+
+    Records whose fingerprint matches the stored one are not written, embedded or
+    indexed again. If embedding or indexing fails, the fingerprints of the records
+    written by this run are cleared, so loading them again indexes them. Returns the
+    number of studies read and their counts per load status (new, changed, unchanged,
+    duplicate).
+    """
+    progress = progress or PipelineProgress()
+    bulk = config.DATALAKE_BULK_LOAD if bulk is None else bulk
+    studies_loaded = 0
+    # (subject, study id) of the new and changed records, which VectorDB still has to index
+    written_studies = []
+
+    async def iter_documents():
+        nonlocal studies_loaded
+        while True:
+            # Reading the records is blocking I/O, so it runs on a worker thread
+            with progress.stage("read", timings=read_timings):
+                studies_data = await asyncio.to_thread(next, batches, None)
+            if studies_data is None:
+                return
+
+            # Call the loader function to load study data into Datalake
+            with progress.stage("datalake"):
+                study_ids, statuses = await aload_subject_studies_to_datalake(studies_data, bulk=bulk)
+            studies_loaded += len(study_ids)
+            progress.studies_written = studies_loaded
+            for status in statuses:
+                progress.studies_by_status[status] += 1
+            for status, count in Counter(statuses).items():
+                STUDIES_PROCESSED.labels(status).inc(count)
+            variants, tags = _count_variants_and_tags(studies_data)
+            VARIANTS_PROCESSED.inc(variants)
+            TAGS_PROCESSED.inc(tags)
+
+            # Cached read pages of the subjects written are stale now
+            subjects = _subject_ids(studies_data)
+            written = {subject for subject, status in zip(subjects, statuses) if status in ("new", "changed")}
+            if written:
+                read_cache.invalidate_subjects(written)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Study IDs from Datalake: {study_ids}")
+
+            if isinstance(studies_data, StudyTable):
+                # Embeddings only need the study text and tags, not the variants
+                studies_data = studies_data.to_records(variants=False)
+
+            # Only new and changed records are embedded and indexed again
+            updated = [i for i, status in enumerate(statuses) if status in ("new", "changed")]
+            written_studies.extend((subjects[i], study_ids[i]) for i in updated)
+            if len(updated) < len(statuses):
+                studies_data = [studies_data[i] for i in updated]
+                study_ids = [study_ids[i] for i in updated]
+
+            async for document in iter_enriched_documents(studies_data, study_ids, progress):
+                yield document
+
+    # Generate embeddings and populate VectorDB. Documents are streamed to VectorDB
+    # in chunks while later batches are still being loaded and embedded; the "vectordb"
+    # stage is the time spent in populate requests only, so it does not include the
+    # nested read, datalake and embeddings stages. Each request's latency is in the
+    # upstream request histogram.
+    try:
+        await vectordb_service.populate_stream(
+            iter_documents(),
+            on_flush=progress.add_indexed,
+            on_send=lambda seconds: progress.add_stage_seconds("vectordb", seconds, observe=False),
+        )  # Calls VectorDB `/populate`
+    except BaseException:
+        if written_studies:
+            await _mark_unindexed(written_studies)
+        raise
+    finally:
+        close = getattr(batches, "close", None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+    progress.studies_total = studies_loaded
+    return {"studies": studies_loaded, **progress.studies_by_status}
+
+
+async def _mark_unindexed(written_studies):
+    # The Datalake commits come before indexing; without this, reloading the records
+    # would find them unchanged and never index them
+    try:
+        cleared = await asyncio.to_thread(clear_subject_study_fingerprints, written_studies)
+        logger.warning(f"Indexing failed; {cleared} written subject studies will be indexed on their next load")
+    except Exception as e:
+        logger.error(f"Indexing failed and the fingerprints of {len(written_studies)} subject studies "
+                     f"could not be cleared: {e}")
+
+
+def _iter_single_batch(records):
+    """
+    Yields all the records as one batch. Raises ValueError, before anything is written,
+    when there are more than BATCH_LOAD_MAX_STUDIES of them.
+    """
+    limit = config.BATCH_LOAD_MAX_STUDIES
+    batch = list(islice(records, limit + 1))
+    if len(batch) > limit:
+        raise ValueError(f"More than {limit} studies to load in one transaction (BATCH_LOAD_MAX_STUDIES)")
+    if batch:
+        yield batch
+
+
+def _iter_single_table(tables):
+    """
+    Yields the study tables concatenated into one, with the same limit as `_iter_single_batch`.
+    """
+    limit = config.BATCH_LOAD_MAX_STUDIES
+    collected, rows = [], 0
+    for table in tables:
+        rows += len(table)
+        if rows > limit:
+            raise ValueError(f"More than {limit} studies to load in one transaction (BATCH_LOAD_MAX_STUDIES)")
+        collected.append(table)
+    if collected:
+        yield StudyTable.concat(collected)
+
+
+async def load_subject_study_records(
+    records,
+    bulk: Optional[bool] = None,
+    progress: Optional[PipelineProgress] = None,
+    read_timings: Optional[dict] = None,
+    single_batch: bool = False,
+) -> dict:
+    """
+    Runs the load pipeline over an iterator of subject study records, e.g. read from a
+    file or a MongoDB cursor, in batches of LOAD_BATCH_SIZE. The iterator is closed
+    when the pipeline ends. With `single_batch`, all records are held in memory and
+    written to the Datalake as one batch, in one transaction; more than
+    BATCH_LOAD_MAX_STUDIES records raise ValueError.
+    """
+    try:
+        batches = _iter_single_batch(records) if single_batch else iter_batches(records, config.LOAD_BATCH_SIZE)
+        return await load_subject_study_batches(batches, bulk=bulk, progress=progress, read_timings=read_timings)
+    finally:
+        close = getattr(records, "close", None)
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+async def load_subject_study_file(
+    file_path: str,
+    bulk: Optional[bool] = None,
+    progress: Optional[PipelineProgress] = None,
+    single_batch: bool = False,
+) -> dict:
+    """
+    Runs the full load pipeline for one subject study file.
+    - file_path: Path to the JSON (top-level array), NDJSON, Arrow IPC or Parquet file
+      containing subject studies.
+    - bulk: Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD).
+    - progress: Optional progress object updated as the pipeline runs.
+    - single_batch: Write the whole file to the Datalake in one transaction instead of
+      one per LOAD_BATCH_SIZE studies (up to BATCH_LOAD_MAX_STUDIES studies).
+    """
+    if is_columnar_file(file_path):
+        batches = iter_study_tables(file_path, config.LOAD_BATCH_SIZE)
+        if single_batch:
+            batches = _iter_single_table(batches)
+        return await load_subject_study_batches(batches, bulk=bulk, progress=progress)
+    # The reader reports its JSON decoding time, which is split out of the "read" stage
+    read_timings = {}
+    records = iter_study_records(file_path, timings=read_timings)
+    return await load_subject_study_records(
+        records, bulk=bulk, progress=progress, read_timings=read_timings, single_batch=single_batch
+    )
+
+
+async def transfer_subject_studies(
+    subject_ids,
+    bulk: Optional[bool] = None,
+    progress: Optional[PipelineProgress] = None,
+    single_batch: bool = False,
+) -> dict:
+    """
+    Runs the full load pipeline straight from the MongoDB genomics database, without
+    an intermediate JSON file.
+    - subject_ids: Subject ID or list of subject IDs to transfer.
+    - bulk: Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD).
+    - progress: Optional progress object updated as the pipeline runs.
+    - single_batch: Write all the studies to the Datalake in one transaction instead
+      of one per LOAD_BATCH_SIZE studies (up to BATCH_LOAD_MAX_STUDIES studies).
+
+    Studies are read from the cursor one batch at a time (projected to the fields the
+    loaders use) and go through the same Datalake, Embeddings and VectorDB stages as
+    `load_subject_study_file`.
+    """
+    records = iter_subject_studies(subject_ids, batch_size=config.LOAD_BATCH_SIZE)
+    return await load_subject_study_records(records, bulk=bulk, progress=progress, single_batch=single_batch)
+
+
+async def load_subjects(
+    file_paths=(),
+    subject_ids=(),
+    bulk: Optional[bool] = None,
+    concurrency: Optional[int] = None,
+    progress: Optional[PipelineProgress] = None,
+) -> dict:
+    """
+    Loads many subjects concurrently: subject study files and/or subjects transferred
+    from MongoDB.
+    - file_paths: Subject study files, each loaded as one subject.
+    - subject_ids: Subject IDs whose studies are transferred from MongoDB.
+    - bulk: Use the set-based bulk loader (defaults to DATALAKE_BULK_LOAD).
+    - concurrency: Subjects loaded at once (defaults to BATCH_LOAD_CONCURRENCY); the
+      Datalake writes are further capped by DB_LOAD_CONCURRENCY pooled connections.
+    - progress: Optional progress object updated as subjects finish.
+
+    Each subject's studies are written to the Datalake in one transaction of their own,
+    so a subject whose Datalake write fails leaves none of its studies behind there, and
+    does not affect the others. Concurrent subjects upsert the same studies, so a subject
+    whose transaction is rolled back by a deadlock or serialization failure is retried,
+    up to BATCH_LOAD_RETRIES times.
+
+    The guarantee covers the Datalake only: embedding and indexing come after the
+    commit. A subject whose studies were committed but not (fully) indexed is reported
+    as "unindexed", with `indexed` false; its fingerprints are cleared so loading it
+    again indexes it (see `load_subject_study_batches`).
+
+    Each subject is held in memory while it is written, so up to `concurrency` subjects
+    of at most BATCH_LOAD_MAX_STUDIES studies each are in memory at once; larger
+    subjects fail and should be loaded on their own with `load_subject_study_file`.
+
+    Returns the totals and one result per subject, in the order given.
+    """
+    progress = progress or PipelineProgress()
+    units = [("file_path", path) for path in file_paths] + [("subject_id", subject_id) for subject_id in subject_ids]
+    progress.subjects_total = len(units)
+    semaphore = asyncio.Semaphore(concurrency or config.BATCH_LOAD_CONCURRENCY)
+
+    async def load_unit(kind, value):
+        result = {kind: value}
+        async with semaphore:
+            started = time.perf_counter()
+            for attempt in range(1, config.BATCH_LOAD_RETRIES + 2):
+                unit_progress = PipelineProgress()
+                try:
+                    if kind == "file_path":
+                        counts = await load_subject_study_file(value, bulk=bulk, progress=unit_progress, single_batch=True)
+                    else:
+                        counts = await transfer_subject_studies(value, bulk=bulk, progress=unit_progress, single_batch=True)
+                    result.update(status="succeeded", indexed=True, counts=counts)
+                    progress.subjects_succeeded += 1
+                    break
+                except psycopg2.extensions.TransactionRollbackError as e:
+                    if attempt <= config.BATCH_LOAD_RETRIES:
+                        logger.warning(f"Retrying {kind} {value} after a rolled back transaction: {e}")
+                        await asyncio.sleep(0.1 * attempt)
+                        continue
+                    result.update(status="failed", indexed=False, error=str(e))
+                except Exception as e:
+                    result.update(status="failed", indexed=False, error=str(e) or type(e).__name__)
+                if unit_progress.studies_by_status["new"] or unit_progress.studies_by_status["changed"]:
+                    # The Datalake transaction committed; the failure came after it
+                    result.update(status="unindexed", counts={
+                        "studies": unit_progress.studies_written, **unit_progress.studies_by_status
+                    })
+                    progress.subjects_unindexed += 1
+                    logger.error(f"Loading {kind} {value} stored its studies but failed to index them: {result['error']}")
+                    break
+                progress.subjects_failed += 1
+                logger.error(f"Loading {kind} {value} failed: {result['error']}")
+                break
+            progress.merge(unit_progress)
+            result["attempts"] = attempt
+            result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    results = await asyncio.gather(*(load_unit(kind, value) for kind, value in units))
+    progress.studies_total = progress.studies_written
+    return {
+        "subjects": len(units),
+        "succeeded": progress.subjects_succeeded,
+        "unindexed": progress.subjects_unindexed,
+        "failed": progress.subjects_failed,
+        "studies": progress.studies_written,
+        **progress.studies_by_status,
+        "results": results,
+    }
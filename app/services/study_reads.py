@@ -0,0 +1,323 @@
+"""
+File: study_reads.py
+Project: VitalEdge Genomics Tubes
+Description: Read queries over the Datalake subject studies, with keyset pagination and
+             a TTL cache of the pages served.
+
+Pages are requested with `after` (the last id of the previous page) and `limit`, and
+read with `WHERE id > after ORDER BY id LIMIT limit + 1`, so a page costs the same
+however deep it is, and rows loaded meanwhile do not shift pages. Subject study and
+variant pages are one index range scan; phenotype tag pages walk subjects in id order
+until the page is full, so pages of a rare tag skip over more untagged subjects.
+Only the requested columns are selected.
+
+Each page is cached with an ETag (a hash of its content) for READ_CACHE_TTL seconds, so
+repeated and conditional requests for the same page are served without a query. Loads
+invalidate the pages of the subjects they write, and all phenotype tag pages (see
+`load_subject_study_batches`). The cache is per process, so with several workers a page
+can be up to READ_CACHE_TTL seconds stale on the workers that did not run the load.
+
+Used by the `/studies/subjects/...` and `/studies/phenotype_tags/...` endpoints.
+"""
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+from typing import Optional
+from app.core.config import config
+from app.core.database import pooled_connection
+from app.core.metrics import READ_CACHE_REQUESTS
+
+# Selectable fields: name -> SQL expression. The id used for pagination is always returned.
+SUBJECT_STUDY_FIELDS = {
+    "study_id": "s.id",
+    "name": "s.name",
+    "summary": "s.summary",
+    "description": "s.description",
+    "url": "s.url",
+    "category": "s.category",
+    "score": "ss.score",
+    "score_percentile": "ss.score_percentile",
+    "tags": """array(
+        SELECT pt.name FROM subject_study_phenotypes p
+        JOIN phenotype_tags pt ON pt.id = p.phenotype_tag_id
+        WHERE p.subject_study_id = ss.id
+        ORDER BY pt.name
+    )""",
+}
+SUBJECT_STUDY_DEFAULT_FIELDS = ["study_id", "name", "category", "score", "score_percentile"]
+
+VARIANT_FIELDS = {
+    "variant": "v.variant",
+    "genotype": "v.genotype",
+    "gene": "v.gene",
+    "effect_size": "v.effect_size",
+    "effect_polarity": "v.effect_polarity",
+    "variant_frequency": "v.variant_frequency",
+    "significance": "v.significance",
+}
+VARIANT_DEFAULT_FIELDS = list(VARIANT_FIELDS)
+
+TAG_SUBJECT_FIELDS = {
+    "de_id": "subj.de_id",
+    "studies": "tagged.studies",
+}
+TAG_SUBJECT_DEFAULT_FIELDS = ["de_id", "studies"]
+
+
+class NotFound(Exception):
+    """
+    Raised when the subject, study or phenotype tag of a read does not exist.
+    """
+
+
+class ReadCache:
+    """
+    LRU cache of read pages with a time to live. Each entry belongs to a subject
+    (or to none, for pages spanning subjects) so loads can invalidate it.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, subject, etag, payload)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a page read before one is not cached after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Returns (etag, payload) for a fresh entry, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                READ_CACHE_REQUESTS.labels("hit").inc()
+                return entry[2], entry[3]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        READ_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    def put(self, key, subject: Optional[str], etag: str, payload: dict, generation: Optional[int] = None):
+        """
+        Caches a page; skipped if the cache was invalidated since `generation` was read.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, subject, etag, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_subjects(self, subjects):
+        """
+        Drops the pages of the given subjects (de_ids) and the pages spanning subjects.
+        """
+        subjects = set(subjects)
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, entry in self._entries.items() if entry[1] is None or entry[1] in subjects]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+# Process-wide cache of read pages
+read_cache = ReadCache(max_size=config.READ_CACHE_SIZE, ttl=config.READ_CACHE_TTL)
+
+
+def select_fields(fields: Optional[str], allowed: dict, default: list) -> list:
+    """
+    Parses a comma-separated `fields` parameter into a list of allowed field names.
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return default
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return names or default
+
+
+def _etag(payload: dict) -> str:
+    body = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _page(rows, names, limit):
+    # The query reads one row more than the page, to know whether there is a next page
+    items = [dict(zip(["id"] + names, row)) for row in rows[:limit]]
+    next_after = items[-1]["id"] if len(rows) > limit else None
+    return items, next_after
+
+
+def _query_subject_studies(de_id, names, after, limit):
+    columns = ", ".join(SUBJECT_STUDY_FIELDS[name] for name in names)
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id FROM subjects WHERE de_id = %s;", (de_id,))
+                subject = cursor.fetchone()
+                if not subject:
+                    raise NotFound(f"Subject not found: {de_id}")
+                cursor.execute(f"""
+                SELECT ss.id, {columns}
+                FROM subject_studies ss
+                JOIN studies s ON s.id = ss.study_id
+                WHERE ss.subject_id = %s AND ss.id > %s
+                ORDER BY ss.id
+                LIMIT %s;
+                """, (subject[0], after, limit + 1))
+                return cursor.fetchall()
+        finally:
+            conn.rollback()
+
+
+def _query_study_variants(de_id, study_id, names, after, limit):
+    columns = ", ".join(VARIANT_FIELDS[name] for name in names)
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                SELECT ss.id, subj.id
+                FROM subjects subj
+                JOIN subject_studies ss ON ss.subject_id = subj.id
+                WHERE subj.de_id = %s AND ss.study_id = %s;
+                """, (de_id, study_id))
+                subject_study = cursor.fetchone()
+                if not subject_study:
+                    raise NotFound(f"Study {study_id} not found for subject {de_id}")
+                # Filtering on the subject too limits a partitioned variants table to one partition
+                cursor.execute(f"""
+                SELECT v.id, {columns}
+                FROM subject_study_variants v
+                WHERE v.subject_id = %s AND v.study_id = %s AND v.id > %s
+                ORDER BY v.id
+                LIMIT %s;
+                """, (subject_study[1], subject_study[0], after, limit + 1))
+                return cursor.fetchall()
+        finally:
+            conn.rollback()
+
+
+def _query_tag_subjects(tag, names, after, limit):
+    columns = ", ".join(TAG_SUBJECT_FIELDS[name] for name in names)
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id FROM phenotype_tags WHERE name = %s;", (tag,))
+                tag_row = cursor.fetchone()
+                if not tag_row:
+                    raise NotFound(f"Phenotype tag not found: {tag}")
+                # Walks subjects in id order and stops after the page, so a page does not
+                # aggregate every subject study of a common tag; counts are for the page only
+                cursor.execute(f"""
+                SELECT subj.id, {columns}
+                FROM (
+                    SELECT subj.id, subj.de_id
+                    FROM subjects subj
+                    WHERE subj.id > %s AND EXISTS (
+                        SELECT 1
+                        FROM subject_studies ss
+                        JOIN subject_study_phenotypes p ON p.subject_study_id = ss.id
+                        WHERE ss.subject_id = subj.id AND p.phenotype_tag_id = %s
+                    )
+                    ORDER BY subj.id
+                    LIMIT %s
+                ) subj
+                CROSS JOIN LATERAL (
+                    SELECT count(*) AS studies
+                    FROM subject_studies ss
+                    JOIN subject_study_phenotypes p ON p.subject_study_id = ss.id
+                    WHERE ss.subject_id = subj.id AND p.phenotype_tag_id = %s
+                ) tagged
+                ORDER BY subj.id;
+                """, (after, tag_row[0], limit + 1, tag_row[0]))
+                return cursor.fetchall()
+        finally:
+            conn.rollback()
+
+
+async def _cached_page(key, subject, names, limit, query, *args):
+    """
+    Returns (etag, payload) of a page, from the cache or by running `query` on a worker thread.
+    """
+    cached = read_cache.get(key)
+    if cached is not None:
+        return cached
+    generation = read_cache.generation
+    rows = await asyncio.to_thread(query, *args)
+    items, next_after = _page(rows, names, limit)
+    payload = {"items": items, "next_after": next_after}
+    etag = _etag(payload)
+    read_cache.put(key, subject, etag, payload, generation)
+    return etag, payload
+
+
+async def get_subject_studies(de_id: str, fields: list, after: int = 0, limit: int = 100):
+    """
+    A page of a subject's studies and scores, ordered by subject study id.
+    - de_id: Subject de-identified ID.
+    - fields: Field names from SUBJECT_STUDY_FIELDS.
+    - after: Subject study id the page starts after (0 for the first page).
+    - limit: Page size.
+    Returns (etag, {"items", "next_after"}); raises NotFound for an unknown subject.
+    """
+    key = ("subject_studies", de_id, tuple(fields), after, limit)
+    return await _cached_page(key, de_id, fields, limit, _query_subject_studies, de_id, fields, after, limit)
+
+
+async def get_study_variants(de_id: str, study_id: int, fields: list, after: int = 0, limit: int = 100):
+    """
+    A page of the variants of a subject's study, ordered by variant id.
+    - de_id: Subject de-identified ID.
+    - study_id: Study id (as returned by `get_subject_studies`).
+    - fields: Field names from VARIANT_FIELDS.
+    - after: Variant id the page starts after (0 for the first page).
+    - limit: Page size.
+    Returns (etag, {"items", "next_after"}); raises NotFound if the subject has no such study.
+    """
+    key = ("study_variants", de_id, study_id, tuple(fields), after, limit)
+    return await _cached_page(key, de_id, fields, limit, _query_study_variants, de_id, study_id, fields, after, limit)
+
+
+async def get_tag_subjects(tag: str, fields: list, after: int = 0, limit: int = 100):
+    """
+    A page of the subjects with studies tagged with a phenotype tag, ordered by subject
+    id, with the number of their tagged studies.
+    - tag: Phenotype tag name.
+    - fields: Field names from TAG_SUBJECT_FIELDS.
+    - after: Subject id the page starts after (0 for the first page).
+    - limit: Page size.
+    Returns (etag, {"items", "next_after"}); raises NotFound for an unknown tag.
+    """
+    key = ("tag_subjects", tag, tuple(fields), after, limit)
+    return await _cached_page(key, None, fields, limit, _query_tag_subjects, tag, fields, after, limit)
@@ -0,0 +1,176 @@
+"""
+File: study_search.py
+Project: VitalEdge Genomics Tubes
+Description: Semantic search over the indexed studies: embed the query text, find the
+             nearest studies in VectorDB and join them to their Datalake metadata.
+
+A search costs an Embeddings call, a VectorDB call and one Datalake query. VectorDB
+documents only carry the study tags, so a study category filter is applied in the
+Datalake query, over the nearest top_k * SEARCH_CATEGORY_OVERFETCH studies. Repeated
+searches are served from two bounded TTL caches:
+- Query embeddings (SEARCH_EMBEDDING_CACHE_*), keyed by the query text. They are kept
+  out of the study embeddings cache, so one-off queries do not displace study texts.
+- Result sets (SEARCH_RESULTS_CACHE_*), keyed by the query, top_k and filters. Studies
+  indexed meanwhile show up once the cached result set expires.
+
+Used by the `/studies/search` endpoint.
+"""
+import asyncio
+from collections import OrderedDict
+import threading
+import time
+from typing import Optional
+from app.core.config import config
+from app.core.database import pooled_connection
+from app.core.metrics import SEARCH_CACHE_REQUESTS
+from app.services.embeddings_service import EmbeddingsService
+from app.services.pipeline import STUDY_DOCUMENT_CATEGORY
+from app.services.vectordb_service import VectorDBService
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire `ttl` seconds after they are stored.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the value of a fresh entry, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                hit = False
+        SEARCH_CACHE_REQUESTS.labels(self.name, "hit" if hit else "miss").inc()
+        return entry[1] if hit else None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+query_embeddings = TTLCache("embedding", config.SEARCH_EMBEDDING_CACHE_SIZE, config.SEARCH_EMBEDDING_CACHE_TTL)
+search_results = TTLCache("results", config.SEARCH_RESULTS_CACHE_SIZE, config.SEARCH_RESULTS_CACHE_TTL)
+
+embeddings_service = EmbeddingsService()
+vectordb_service = VectorDBService()
+
+
+def normalize_query(query: str) -> str:
+    # Searches differing only in whitespace share their cache entries
+    return " ".join(query.split())
+
+
+async def embed_query(query: str) -> list:
+    """
+    Embedding of a (normalized) search query, from the query embedding cache if possible.
+    """
+    embedding = query_embeddings.get(query)
+    if embedding is None:
+        embedding = (await embeddings_service.generate_embeddings([query], cached=False))[0]
+        query_embeddings.put(query, embedding)
+    return embedding
+
+
+def _query_study_metadata(study_ids, category=None):
+    """
+    Returns {study id: metadata} for the given studies, in one query; with `category`,
+    only for the studies of that category.
+    """
+    query = """
+    SELECT id, name, summary, description, url, category
+    FROM studies
+    WHERE id = ANY(%s)
+    """
+    params = [list(study_ids)]
+    if category:
+        query += " AND category = %s"
+        params.append(category)
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                columns = [column.name for column in cursor.description]
+                return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+        finally:
+            conn.rollback()
+
+
+async def search_studies(query: str, top_k: Optional[int] = None, category: Optional[str] = None,
+                         tags: Optional[list] = None) -> dict:
+    """
+    Finds the studies nearest to a query text.
+    - query: Free-text query, e.g. a phenotype description.
+    - top_k: Number of studies to return (defaults to SEARCH_TOP_K).
+    - category: Optional study category; fewer than `top_k` studies come back when not
+      enough of the nearest top_k * SEARCH_CATEGORY_OVERFETCH studies have it.
+    - tags: Optional phenotype tag filter passed to VectorDB.
+    Returns {"results": [study metadata with "score" and "tags"], "cached": bool}, best
+    match first. Hits that are no longer in the Datalake are left out. Raises ValueError
+    for an empty query.
+    """
+    query = normalize_query(query)
+    if not query:
+        raise ValueError("The search query is empty")
+    top_k = top_k or config.SEARCH_TOP_K
+    tags = sorted(set(tags)) if tags else None
+    key = (query, top_k, category, tuple(tags) if tags else None)
+    results = search_results.get(key)
+    if results is not None:
+        return {"results": results, "cached": True}
+
+    filters = {"category": STUDY_DOCUMENT_CATEGORY}
+    if tags:
+        filters["tags"] = tags
+    candidates = top_k * config.SEARCH_CATEGORY_OVERFETCH if category else top_k
+
+    embedding = await embed_query(query)
+    hits = await vectordb_service.search(embedding, candidates, filters)
+    metadata = await asyncio.to_thread(
+        _query_study_metadata, {int(hit["id"]) for hit in hits}, category
+    ) if hits else {}
+
+    results = []
+    for hit in hits:
+        study = metadata.get(int(hit["id"]))
+        if study is None:
+            continue
+        results.append({**study, "score": hit.get("score"), "tags": hit.get("tags", [])})
+    results = results[:top_k]
+    search_results.put(key, results)
+    return {"results": results, "cached": False}
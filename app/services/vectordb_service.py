@@ -1,6 +1,11 @@
+import asyncio
 import httpx
 import json
+import time
+from typing import AsyncIterator, Callable, Optional
 from app.core.config import config  # Import the instantiated Config
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS_IN_FLIGHT
+from app.services.http_client import get_http_client
 from app.utils.logging import logger
 
 class VectorDBService:
@@ -8,10 +13,130 @@ class VectorDBService:
     Handles interactions with the VectorDB microservice.
     """
 
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        # Defaults to the shared application client so connections are pooled
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
     async def populate(self, documents: list):
         """
         Populates the VectorDB with the given documents.
         """
+        return await self._post_documents(json=documents)
+
+    async def populate_stream(
+        self,
+        documents: AsyncIterator[dict],
+        max_documents: int = None,
+        max_bytes: int = None,
+        max_pending_chunks: int = None,
+        on_flush: Optional[Callable[[int], None]] = None,
+        on_send: Optional[Callable[[float], None]] = None,
+    ) -> dict:
+        """
+        Populates the VectorDB from an async iterator of documents, flushing them in chunks
+        while the iterator is still producing (e.g. while embeddings are being generated).
+        - documents: Async iterator of VectorDB documents.
+        - max_documents: Flush once a chunk holds this many documents (defaults to VECTORDB_FLUSH_DOCUMENTS).
+        - max_bytes: Flush before a chunk's JSON body exceeds this size (defaults to VECTORDB_FLUSH_BYTES).
+        - max_pending_chunks: Chunks allowed to wait for the sender before the iterator is paused
+          (defaults to VECTORDB_MAX_PENDING_CHUNKS).
+        - on_flush: Optional callback called with the number of documents of each written chunk.
+        - on_send: Optional callback called with the seconds taken by each populate request,
+          failed ones included.
+
+        Each document is serialized once and then dropped, so memory stays bounded by
+        the pending chunks regardless of the number of documents. Returns the documents
+        and chunks written and the seconds spent in populate requests.
+        """
+        max_documents = max_documents or config.VECTORDB_FLUSH_DOCUMENTS
+        max_bytes = max_bytes or config.VECTORDB_FLUSH_BYTES
+        queue = asyncio.Queue(maxsize=max_pending_chunks or config.VECTORDB_MAX_PENDING_CHUNKS)
+        totals = {"documents": 0, "chunks": 0, "seconds": 0.0}
+
+        async def sender():
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    await self._post_documents(content=b"[" + b",".join(chunk) + b"]")
+                finally:
+                    seconds = time.perf_counter() - started
+                    totals["seconds"] += seconds
+                    if on_send:
+                        on_send(seconds)
+                totals["documents"] += len(chunk)
+                totals["chunks"] += 1
+                if on_flush:
+                    on_flush(len(chunk))
+                logger.debug(f"Flushed {len(chunk)} documents to vectorDB")
+
+        async def enqueue(item):
+            # Blocks while the queue is full (backpressure), but surfaces sender failures
+            put = asyncio.ensure_future(queue.put(item))
+            await asyncio.wait({put, sender_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not put.done():
+                put.cancel()
+                sender_task.result()  # Re-raises the sender's error
+
+        sender_task = asyncio.create_task(sender())
+        try:
+            chunk, chunk_bytes = [], 0
+            async for document in documents:
+                encoded = json.dumps(document, separators=(",", ":")).encode("utf-8")
+                if chunk and chunk_bytes + len(encoded) > max_bytes:
+                    await enqueue(chunk)
+                    chunk, chunk_bytes = [], 0
+                chunk.append(encoded)
+                chunk_bytes += len(encoded) + 1
+                if len(chunk) >= max_documents:
+                    await enqueue(chunk)
+                    chunk, chunk_bytes = [], 0
+            if chunk:
+                await enqueue(chunk)
+            await enqueue(None)
+            await sender_task
+        except BaseException:
+            sender_task.cancel()
+            raise
+
+        logger.info(f"Wrote {totals['documents']} documents to vectorDB in {totals['chunks']} chunks")
+        return totals
+
+    async def search(self, embedding: list, top_k: int, filters: Optional[dict] = None) -> list:
+        """
+        Returns the `top_k` documents nearest to an embedding, best first.
+        - embedding: Query embedding.
+        - top_k: Number of documents to return.
+        - filters: Optional document metadata filters, e.g. {"category": "genomics", "tags": ["Eyes"]}.
+        Each hit is a dict with at least the document `id` and its `score`.
+        """
+        url = f"{config.VECTORDB_URL}{config.VECTORDB_SEARCH_PATH}"
+        body = {"embedding": embedding, "top_k": top_k}
+        if filters:
+            body["filters"] = filters
+        try:
+            with UPSTREAM_REQUESTS_IN_FLIGHT.labels("vectordb").track_inprogress(), \
+                    UPSTREAM_REQUEST_SECONDS.labels("vectordb").time():
+                response = await self.client.post(url, json=body)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}")
+            raise
+        result = response.json()
+        # The hits come either as a list or under "results"
+        hits = result.get("results", []) if isinstance(result, dict) else result
+        return [hit for hit in hits if hit.get("id") is not None]
+
+    async def _post_documents(self, **body):
+        """
+        Sends one populate request. `body` is either `json=` (documents) or `content=` (encoded JSON array).
+        """
         vectordb_url = f"{config.VECTORDB_URL}/populate/populate"
         headers = {"Content-Type": "application/json"}
 
@@ -22,30 +147,33 @@ class VectorDBService:
             # print("Payload being sent:")
             # print(json.dumps(documents, indent=2))
 
-            async with httpx.AsyncClient() as client:
-                # Prepare the request
-                request = client.build_request(
-                    method="POST",
-                    url=vectordb_url,
-                    headers=headers,
-                    json=documents,
-                )
-
-                # Log the full request details
-                # print("Prepared request:")
-                # print(f"Request method: {request.method}")
-                # print(f"Request URL: {request.url}")
-                # print(f"Request headers: {request.headers}")
-                # print(f"Request content: {request.content.decode()}")
-
-                # Send the request
+            client = self.client
+
+            # Prepare the request
+            request = client.build_request(
+                method="POST",
+                url=vectordb_url,
+                headers=headers,
+                **body,
+            )
+
+            # Log the full request details
+            # print("Prepared request:")
+            # print(f"Request method: {request.method}")
+            # print(f"Request URL: {request.url}")
+            # print(f"Request headers: {request.headers}")
+            # print(f"Request content: {request.content.decode()}")
+
+            # Send the request
+            with UPSTREAM_REQUESTS_IN_FLIGHT.labels("vectordb").track_inprogress(), \
+                    UPSTREAM_REQUEST_SECONDS.labels("vectordb").time():
                 response = await client.send(request)
-                response.raise_for_status()
+            response.raise_for_status()
 
-                logger.info(f"Wrote to vectorDB with status code: {response.status_code}")
-                # logger.debug(f"Response body: {response.text}")
+            logger.info(f"Wrote to vectorDB with status code: {response.status_code}")
+            # logger.debug(f"Response body: {response.text}")
 
-                return response.json()
+            return response.json()
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error occurred: {e.response.status_code} - {e.response.text}")
             raise
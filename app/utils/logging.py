@@ -1,8 +1,104 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+import threading
+import time
+from app.core.metrics import LOG_RECORDS_DROPPED
 
-def setup_logging(log_level: str = "INFO", log_file: str = "app.log", max_file_size: int = 10_000_000, backup_count: int = 5):
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener = None
+_traceback_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with fields passed in `extra=`.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits DEBUG and INFO records to `rate` per second per call site (file and line),
+    with bursts of up to `burst`; warnings and errors always pass. The next record let
+    through from a call site reports how many of its records were dropped.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # (pathname, lineno) -> [tokens, last refill, dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            dropped, bucket[2] = bucket[2], 0
+        if dropped:
+            record.msg = f"{record.getMessage()} ({dropped} similar messages dropped)"
+            record.args = None
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    # Drops records when the queue is full instead of blocking the caller
+
+    def prepare(self, record):
+        # Only merge the message arguments and render the traceback here; the rest
+        # of the formatting is left to the listener's handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def setup_logging(log_level: str = "INFO", log_file: str = "app.log", max_file_size: int = 10_000_000, backup_count: int = 5,
+                  json_format: bool = False, queue_size: int = 10_000, rate_limit: float = 0, rate_burst: int = 50):
     """
     Configures logging for the application.
 
@@ -11,22 +107,64 @@ def setup_logging(log_level: str = "INFO", log_file: str = "app.log", max_file_s
         log_file (str): Path to the log file.
         max_file_size (int): Maximum size of the log file in bytes before rotation.
         backup_count (int): Number of rotated log files to keep.
+        json_format (bool): Write one JSON object per record instead of text lines.
+        queue_size (int): Records buffered for the listener thread; records are dropped when it is full.
+        rate_limit (float): DEBUG/INFO records allowed per second per call site (0 for no limit).
+        rate_burst (int): Records a call site may log at once before the rate limit applies.
+
+    Loggers only put records on a queue; formatting and console/file I/O run on a
+    listener thread, so logging does not block request handling or loads. The
+    listener is flushed and stopped at interpreter exit.
     """
+    global _listener
+
     # Ensure the log directory exists
     log_dir = os.path.dirname(log_file)
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    handlers = [
+        logging.StreamHandler(),  # Console logging
+        RotatingFileHandler(log_file, maxBytes=max_file_size, backupCount=backup_count),  # File logging
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = _NonBlockingQueueHandler(log_queue)
+    if rate_limit:
+        queue_handler.addFilter(RateLimitFilter(rate_limit, rate_burst))
+
     # Set up the root logger
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper(), logging.INFO),
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-        handlers=[
-            logging.StreamHandler(),  # Console logging
-            RotatingFileHandler(log_file, maxBytes=max_file_size, backupCount=backup_count),  # File logging
-        ],
-    )
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _NonBlockingQueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, log_level.upper(), logging.INFO))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """
+    Writes out the queued records and stops the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
 
 # Example usage for debugging
 if __name__ == "__main__":
@@ -36,4 +174,4 @@ if __name__ == "__main__":
     logger.debug("This is a debug message.")
     logger.error("This is an error message.")
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
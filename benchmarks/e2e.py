@@ -0,0 +1,114 @@
+"""
+File: e2e.py
+Project: VitalEdge Genomics Tubes
+Description: End-to-end benchmark of `load_subject_study_endpoint` against the local
+             Embeddings and VectorDB stand-ins.
+
+The load writes to the configured Datalake (DB_* settings), so run it against a
+scratch database migrated with `scripts/migrate_datalake.py`. Synthetic subjects are created if missing, study names are unique
+per run, and the rows written by the run are deleted afterwards unless `keep_data`
+is set. Each run loads the file twice: a cold load, where every study is new, and a
+reload, where every study is unchanged.
+
+EMBEDDINGS_URL and VECTORDB_URL must point at the stand-ins before `app` is imported;
+`benchmarks/run.py` takes care of that.
+"""
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from benchmarks import synthetic
+
+
+def _ensure_subjects(subject_ids):
+    from app.core.database import pooled_connection
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            for de_id in subject_ids:
+                cursor.execute(
+                    "INSERT INTO subjects (de_id) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM subjects WHERE de_id = %s);",
+                    (de_id, de_id),
+                )
+        conn.commit()
+
+
+def _delete_run_data(name_prefix):
+    from app.core.database import pooled_connection
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            pattern = f"{name_prefix} %"
+            cursor.execute("""
+            DELETE FROM subject_study_variants WHERE study_id IN (
+                SELECT ss.id FROM subject_studies ss JOIN studies s ON s.id = ss.study_id WHERE s.name LIKE %s
+            );
+            DELETE FROM subject_study_phenotypes WHERE subject_study_id IN (
+                SELECT ss.id FROM subject_studies ss JOIN studies s ON s.id = ss.study_id WHERE s.name LIKE %s
+            );
+            DELETE FROM subject_studies WHERE study_id IN (SELECT id FROM studies WHERE name LIKE %s);
+            DELETE FROM studies WHERE name LIKE %s;
+            """, (pattern, pattern, pattern, pattern))
+        conn.commit()
+
+
+async def _timed_load(file_path, bulk, services):
+    from app.api.routes.studies import LoadRequestStudies, load_subject_study_endpoint
+
+    for service in services.values():
+        service.reset_stats()
+    started = time.perf_counter()
+    response = await load_subject_study_endpoint(LoadRequestStudies(file_path=file_path, subject_id=None, bulk=bulk))
+    elapsed = time.perf_counter() - started
+
+    counts = response["counts"]
+    result = {
+        "seconds": round(elapsed, 4),
+        "studies_per_second": round(counts["studies"] / elapsed, 1) if elapsed else None,
+        "counts": counts,
+    }
+    for name, service in services.items():
+        stats = service.stats
+        stats["mean_request_seconds"] = round(stats["busy_seconds"] / stats["requests"], 4) if stats["requests"] else None
+        stats["busy_seconds"] = round(stats["busy_seconds"], 4)
+        result[name] = stats
+    return result
+
+
+async def _run(studies, variants, subjects, bulk, services, keep_data):
+    from app.core.database import close_db_pool, init_db_pool
+    from app.services.http_client import close_http_client, init_http_client
+
+    await init_http_client()
+    init_db_pool()
+    name_prefix = f"Benchmark-{uuid.uuid4().hex[:8]}"
+    subject_ids = [f"benchmark-subject-{i}" for i in range(subjects)]
+    try:
+        await asyncio.to_thread(_ensure_subjects, subject_ids)
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "subject_studies.json")
+            synthetic.write_subject_study_file(
+                file_path, synthetic.subject_studies(subject_ids, studies, variants, name_prefix=name_prefix)
+            )
+            return {
+                "cold_load": await _timed_load(file_path, bulk, services),
+                "reload": await _timed_load(file_path, bulk, services),
+            }
+    finally:
+        if not keep_data:
+            await asyncio.to_thread(_delete_run_data, name_prefix)
+        await close_http_client()
+        close_db_pool()
+
+
+def run_e2e(services: dict, studies: int = 500, variants: int = 20, subjects: int = 5,
+            bulk: bool = True, keep_data: bool = False) -> dict:
+    """
+    Runs the end-to-end load benchmark.
+    - services: {"embeddings": ServiceThread, "vectordb": ServiceThread} already started.
+    - studies, variants, subjects: Size of the synthetic subject study file.
+    - bulk: Use the set-based bulk loader instead of the row-by-row loader.
+    - keep_data: Leave the loaded rows in the Datalake.
+    """
+    return asyncio.run(_run(studies, variants, subjects, bulk, services, keep_data))
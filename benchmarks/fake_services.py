@@ -0,0 +1,114 @@
+"""
+File: fake_services.py
+Project: VitalEdge Genomics Tubes
+Description: Local stand-ins for the Embeddings and VectorDB microservices.
+
+Both are small FastAPI apps served by uvicorn on a background thread, with a
+configurable per-request latency, so the end-to-end benchmarks exercise the real
+HTTP client, pooling and batching code without the real services. Each app counts
+its requests and items in `app.state.stats`.
+"""
+import asyncio
+import hashlib
+import socket
+import threading
+import time
+from typing import List
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+import uvicorn
+
+
+class EmbeddingsRequest(BaseModel):
+    texts: List[str]
+
+
+def _new_stats():
+    return {"requests": 0, "items": 0, "busy_seconds": 0.0}
+
+
+def create_embeddings_app(latency: float = 0.02, dimensions: int = 384) -> FastAPI:
+    """
+    Embeddings stand-in: `POST /embeddings/generate` returns one deterministic vector per text.
+    - latency: Seconds each request takes.
+    - dimensions: Length of the returned vectors.
+    """
+    app = FastAPI()
+    app.state.stats = _new_stats()
+
+    @app.post("/embeddings/generate")
+    async def generate(data: EmbeddingsRequest):
+        started = time.perf_counter()
+        await asyncio.sleep(latency)
+        embeddings = []
+        for text in data.texts:
+            seed = hashlib.blake2b(text.encode(), digest_size=8).digest()
+            embeddings.append([((seed[i % 8] + i) % 255) / 255.0 for i in range(dimensions)])
+        stats = app.state.stats
+        stats["requests"] += 1
+        stats["items"] += len(data.texts)
+        stats["busy_seconds"] += time.perf_counter() - started
+        return {"embeddings": embeddings}
+
+    return app
+
+
+def create_vectordb_app(latency: float = 0.02) -> FastAPI:
+    """
+    VectorDB stand-in: `POST /populate/populate` accepts a JSON array of documents.
+    - latency: Seconds each request takes.
+    """
+    app = FastAPI()
+    app.state.stats = _new_stats()
+
+    @app.post("/populate/populate")
+    async def populate(request: Request):
+        started = time.perf_counter()
+        documents = await request.json()
+        await asyncio.sleep(latency)
+        stats = app.state.stats
+        stats["requests"] += 1
+        stats["items"] += len(documents)
+        stats["busy_seconds"] += time.perf_counter() - started
+        return {"status": "success", "count": len(documents)}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServiceThread:
+    """
+    Serves an app with uvicorn on a daemon thread.
+    """
+
+    def __init__(self, app: FastAPI, port: int = None):
+        self.app = app
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self, timeout: float = 10.0):
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Service on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+    def reset_stats(self):
+        self.app.state.stats = _new_stats()
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.app.state.stats)
@@ -0,0 +1,93 @@
+"""
+File: micro.py
+Project: VitalEdge Genomics Tubes
+Description: Micro-benchmarks of the CPU-bound steps: the Nebula parser, the
+             screen-scrape formatter and the loader's row preparation.
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks import synthetic
+
+# The parsers live in scripts/, which is not a package
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+
+def measure(func, items: int, repeat: int = 5) -> dict:
+    """
+    Times `func()` `repeat` times. Returns the best and median run in seconds and the
+    throughput of the best run, for a run that processes `items` items.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "best_seconds": round(best, 6),
+        "median_seconds": round(statistics.median(timings), 6),
+        "items_per_second": round(items / best, 1) if best else None,
+    }
+
+
+def bench_parse_nebula_dna_score(studies: int, variants: int, repeat: int) -> dict:
+    from parsing_utils import parse_nebula_dna_score
+    from parsing_utils.parse_nebula_dna_score import parse_nebula_dna_score_legacy
+
+    records = synthetic.nebula_raw_dump(studies, variants).split("######")
+    known_tags = synthetic.TAGS
+
+    def run(parser):
+        # The legacy parser prints for every record
+        with contextlib.redirect_stdout(io.StringIO()):
+            for record in records:
+                parser("synthetic", "https://example.com", record.strip(), known_tags=known_tags)
+
+    return {
+        "parse_nebula_dna_score": measure(lambda: run(parse_nebula_dna_score), studies, repeat),
+        "parse_nebula_dna_score_legacy": measure(lambda: run(parse_nebula_dna_score_legacy), studies, repeat),
+    }
+
+
+def bench_screen_scrape_formatter(studies: int, variants: int, repeat: int) -> dict:
+    from screen_scrape_formatter import parse_raw_studies
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_file = os.path.join(folder, "raw_studies.txt")
+        output_file = os.path.join(folder, "formatted_studies.txt")
+        with open(input_file, "w") as outfile:
+            outfile.write(synthetic.screen_scrape_dump(studies, variants))
+        return {
+            "screen_scrape_formatter.parse_raw_studies": measure(
+                lambda: parse_raw_studies(input_file, output_file), studies, repeat
+            ),
+        }
+
+
+def bench_prepare_subject_study_rows(studies: int, variants: int, repeat: int) -> dict:
+    from app.loaders.genomic_studies import prepare_subject_study_rows
+
+    records = synthetic.subject_studies(["synthetic"], studies, variants)
+    return {
+        "prepare_subject_study_rows": measure(lambda: prepare_subject_study_rows(records), studies, repeat),
+    }
+
+
+def run_micro(studies: int = 500, variants: int = 20, repeat: int = 5) -> dict:
+    """
+    Runs all micro-benchmarks on `studies` synthetic studies of `variants` variants each.
+    """
+    results = {}
+    results.update(bench_parse_nebula_dna_score(studies, variants, repeat))
+    results.update(bench_screen_scrape_formatter(studies, variants, repeat))
+    results.update(bench_prepare_subject_study_rows(studies, variants, repeat))
+    return results
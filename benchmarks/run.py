@@ -0,0 +1,146 @@
+"""
+File: run.py
+Project: VitalEdge Genomics Tubes
+Description: Runs the benchmarks and writes the results as JSON, optionally comparing
+             them with a baseline run.
+
+Usage (from the project root):
+    python -m benchmarks.run --micro --output bench/micro.json
+    python -m benchmarks.run --e2e --embeddings-latency-ms 20 --vectordb-latency-ms 50 --output bench/e2e.json
+    python -m benchmarks.run --micro --baseline bench/micro.json --tolerance 0.2
+
+With --baseline, every "*seconds" metric that is slower than the baseline by more
+than --tolerance (a fraction) is reported, and the run exits with status 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results, prefix=""):
+    # {"a": {"b_seconds": 1}} -> {"a.b_seconds": 1}
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compares the "*seconds" metrics of two result documents. Returns a list of
+    (metric, baseline_seconds, seconds) for the metrics slower by more than `tolerance`.
+    """
+    current = _flatten(results["results"])
+    previous = _flatten(baseline["results"])
+    regressions = []
+    for name, value in current.items():
+        if not name.endswith("seconds") or name not in previous:
+            continue
+        if isinstance(value, (int, float)) and previous[name] and value > previous[name] * (1 + tolerance):
+            regressions.append((name, previous[name], value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the VitalEdge Genomics Tubes benchmarks.")
+    parser.add_argument("--micro", action="store_true", help="Run the parser and row preparation micro-benchmarks")
+    parser.add_argument("--e2e", action="store_true", help="Run the end-to-end load against fake services (needs a scratch Datalake)")
+    parser.add_argument("--studies", type=int, default=500, help="Synthetic studies per benchmark (default: 500)")
+    parser.add_argument("--variants", type=int, default=20, help="Variants per synthetic study (default: 20)")
+    parser.add_argument("--subjects", type=int, default=5, help="Subjects the end-to-end studies are spread over (default: 5)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per micro-benchmark (default: 5)")
+    parser.add_argument("--row", action="store_true", help="Use the row-by-row loader instead of the bulk loader for --e2e")
+    parser.add_argument("--embeddings-latency-ms", type=float, default=20.0, help="Fake Embeddings latency per request")
+    parser.add_argument("--vectordb-latency-ms", type=float, default=20.0, help="Fake VectorDB latency per request")
+    parser.add_argument("--keep-data", action="store_true", help="Leave the rows loaded by --e2e in the Datalake")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed slowdown against the baseline (default: 0.1)")
+    args = parser.parse_args()
+
+    if not (args.micro or args.e2e):
+        args.micro = True
+
+    document = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": {},
+    }
+
+    services = {}
+    if args.e2e:
+        from benchmarks.fake_services import ServiceThread, create_embeddings_app, create_vectordb_app
+
+        # The fake services and their URLs come first: the micro-benchmarks import the app
+        # config, which reads the environment only once
+        services = {
+            "embeddings": ServiceThread(create_embeddings_app(args.embeddings_latency_ms / 1000)).start(),
+            "vectordb": ServiceThread(create_vectordb_app(args.vectordb_latency_ms / 1000)).start(),
+        }
+        os.environ["EMBEDDINGS_URL"] = services["embeddings"].url
+        os.environ["VECTORDB_URL"] = services["vectordb"].url
+        os.environ["EMBEDDINGS_CACHE_ENABLED"] = "false"
+
+    try:
+        if args.micro:
+            from benchmarks.micro import run_micro
+
+            document["results"]["micro"] = run_micro(args.studies, args.variants, args.repeat)
+
+        if args.e2e:
+            from app.core.config import config
+            from benchmarks.e2e import run_e2e
+
+            if (config.EMBEDDINGS_URL, config.VECTORDB_URL) != (services["embeddings"].url, services["vectordb"].url) \
+                    or config.EMBEDDINGS_CACHE_ENABLED:
+                raise RuntimeError("The app config was loaded before the fake service settings were set")
+            document["results"]["e2e"] = run_e2e(
+                services, args.studies, args.variants, args.subjects, bulk=not args.row, keep_data=args.keep_data
+            )
+    finally:
+        for service in services.values():
+            service.stop()
+
+    output = json.dumps(document, indent=4)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as outfile:
+            outfile.write(output + "\n")
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as infile:
+            regressions = compare(document, json.load(infile), args.tolerance)
+        for name, previous, value in regressions:
+            print(f"REGRESSION {name}: {previous:.6f}s -> {value:.6f}s (+{(value / previous - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+File: synthetic.py
+Project: VitalEdge Genomics Tubes
+Description: Synthetic Nebula DNA score data for the benchmarks.
+
+Generates raw Nebula records (as pasted from the Nebula site and read by
+`scripts/parse_raw_file.py`), the screen-scrape dump read by
+`scripts/screen_scrape_formatter.py`, and subject study records in the JSON layout
+read by the Datalake loaders. All generators are deterministic for a given seed.
+"""
+import json
+import random
+
+TAGS = ["Mouth", "Eyes", "Sleep", "Mind", "Skin", "Heart", "Metabolism", "Immunity"]
+GENES = ["BRCA1", "APOE", "FTO", "MC1R", "TCF7L2", "HLA-DQA1", "CYP2D6", "LCT"]
+GENOTYPES = ["AA", "AG", "GG", "CT", "TT", "CC"]
+WORDS = (
+    "genetic variants associated with increased risk of the trait were identified in a "
+    "large genome wide association study of european ancestry participants cohort"
+).split()
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _study(rng, index):
+    return {
+        "name": f"Synthetic {rng.choice(TAGS)} Study {index} (Author{index % 97}, {2000 + index % 25})",
+        "summary": _sentence(rng, 24),
+        "description": " ".join(_sentence(rng, 18) for _ in range(4)),
+        "tags": rng.sample(TAGS, rng.randint(0, 3)),
+        "percentile": rng.randint(1, 99),
+        "genetic_score": round(rng.uniform(-3, 3), 3),
+    }
+
+
+def _variants(rng, count):
+    return [
+        {
+            "variant": f"rs{rng.randint(1000, 99_999_999)}",
+            "genotype": rng.choice(GENOTYPES),
+            "gene": rng.choice(GENES),
+            "effect_size": round(rng.uniform(-0.5, 0.5), 4),
+            "variant_frequency": round(rng.uniform(0.1, 99.9), 1),
+            "significance": f"{round(rng.uniform(1, 9.9), 1)} x 10-{rng.randint(5, 40)}",
+        }
+        for _ in range(count)
+    ]
+
+
+def _percentile_suffix(value):
+    if value % 10 == 1 and value != 11:
+        return "st"
+    if value % 10 == 2 and value != 12:
+        return "nd"
+    if value % 10 == 3 and value != 13:
+        return "rd"
+    return "th"
+
+
+def nebula_raw_record(rng, index, variants=20):
+    """
+    One raw Nebula DNA score record with a 6-column variants table.
+    """
+    study = _study(rng, index)
+    lines = ["SHARE", study["name"], *study["tags"],
+             "STUDY SUMMARY", study["summary"],
+             "YOUR RESULT", f"{study['percentile']}{_percentile_suffix(study['percentile'])} PERCENTILE",
+             f"Based on the variants below, your personal genetic score is {study['genetic_score']}.",
+             "STUDY DESCRIPTION", study["description"],
+             "DID YOU KNOW?", _sentence(rng, 12),
+             "VARIANT", "YOUR GENOTYPE", "GENE", "EFFECT SIZE", "VARIANT FREQUENCY", "SIGNIFICANCE"]
+    for variant in _variants(rng, variants):
+        lines += [variant["variant"], f"YOUR {variant['genotype']}", variant["gene"],
+                  f"{variant['effect_size']} ({'+' if variant['effect_size'] >= 0 else '-'})",
+                  f"{variant['variant_frequency']}%", variant["significance"]]
+    return "\n".join(lines) + "\n"
+
+
+def nebula_raw_dump(studies, variants=20, seed=0):
+    """
+    A raw dump of `studies` records separated by "######", as read by parse_raw_file.
+    """
+    rng = random.Random(seed)
+    return "\n######\n".join(nebula_raw_record(rng, index, variants) for index in range(studies))
+
+
+def screen_scrape_dump(studies, variants=20, seed=0):
+    """
+    A screen-scrape dump of `studies` records separated by "---END RECORD---", as read
+    by screen_scrape_formatter.parse_raw_studies.
+    """
+    rng = random.Random(seed)
+    records = []
+    for index in range(studies):
+        study = _study(rng, index)
+        rows = [
+            f"{v['variant']}\t{v['genotype']}\t{v['effect_size']}\t{v['variant_frequency']}%\t{v['significance']}"
+            for v in _variants(rng, variants)
+        ]
+        records.append("\n".join([
+            "SHARE", study["name"], *study["tags"],
+            "STUDY SUMMARY", study["summary"],
+            "YOUR RESULT", f"{study['percentile']}th PERCENTILE",
+            f"Your personal genetic score is {study['genetic_score']}.",
+            "STUDY DESCRIPTION", study["description"], "DID YOU KNOW?", _sentence(rng, 12),
+            "VARIANTS", "Variant\tGenotype\tEffect Size\tVariant Frequency\tSignificance", *rows,
+        ]))
+    return "\n---END RECORD---\n".join(records) + "\n---END RECORD---\n"
+
+
+def subject_studies(subject_ids, studies, variants=20, seed=0, name_prefix="Synthetic"):
+    """
+    `studies` subject study records in the loader JSON layout, spread round-robin over
+    `subject_ids`. `name_prefix` makes study names unique across benchmark runs.
+    """
+    rng = random.Random(seed)
+    records = []
+    for index in range(studies):
+        study = _study(rng, index)
+        records.append({
+            "patient_id": subject_ids[index % len(subject_ids)],
+            "study": {
+                "name": study["name"].replace("Synthetic", name_prefix, 1),
+                "summary": study["summary"],
+                "description": study["description"],
+                "url": f"https://example.com/studies/{index}",
+                "tags": study["tags"],
+            },
+            "score": {"percentile": study["percentile"], "genetic-score": study["genetic_score"]},
+            "variants": [
+                {
+                    "variant": v["variant"],
+                    "genotype": v["genotype"],
+                    "effect-size": v["effect_size"],
+                    "variant-frequency": v["variant_frequency"],
+                    "significance": v["significance"],
+                }
+                for v in _variants(rng, variants)
+            ],
+        })
+    return records
+
+
+def write_subject_study_file(path, records):
+    """
+    Write subject study records as a JSON array, as exported for the loader.
+    """
+    with open(path, "w") as outfile:
+        json.dump(records, outfile)
@@ -1,52 +1,41 @@
-from pymongo import MongoClient
-import json
+import argparse
 import sys
 from pathlib import Path
 
-def export_studies_to_json(patient_id, output_file):
-    # MongoDB connection
-    mongo_uri = "mongodb://localhost:27017"  # Update if needed
-    db_name = "genomic_pipeline_db"
-    collection_name = "studies"
+# Make the app package importable when run as `python scripts/export_studies_to_json.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.core.mongo import close_mongo_client
+from app.loaders.study_export import export_subject_studies
 
+def export_studies_to_json(patient_ids, output_file, ndjson=None, batch_size=None):
+    """
+    Export the studies of one or more patients from MongoDB (MONGO_URI, MONGO_DB_NAME and
+    MONGO_STUDIES_COLLECTION settings) to a JSON array or NDJSON file.
+    """
     try:
-        # Connect to MongoDB
-        client = MongoClient(mongo_uri)
-        db = client[db_name]
-        collection = db[collection_name]
+        counts = export_subject_studies(patient_ids, output_file, ndjson=ndjson, batch_size=batch_size)
 
-        # Query for the patient's studies
-        query = {"patient_id": patient_id}
-        studies = list(collection.find(query))
-
-        if not studies:
-            print(f"No studies found for patient_id: {patient_id}")
-            return
-
-        # Convert MongoDB data to JSON-serializable format
-        for study in studies:
-            study["_id"] = str(study["_id"])  # Convert ObjectId to string
-
-        # Write data to the JSON file
-        output_path = Path(output_file)
-        with output_path.open("w") as outfile:
-            json.dump(studies, outfile, indent=4)
-
-        print(f"Exported {len(studies)} studies for patient_id '{patient_id}' to {output_file}")
+        for patient_id, count in counts.items():
+            if count:
+                print(f"Exported {count} studies for patient_id '{patient_id}' to {output_file}")
+            else:
+                print(f"No studies found for patient_id: {patient_id}")
+        return counts
 
     except Exception as e:
         print(f"Error: {e}")
 
     finally:
-        client.close()
+        close_mongo_client()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python export_studies_to_json.py <patient_id> <output_file>")
-        sys.exit(1)
-
-    patient_id = sys.argv[1]
-    output_file = sys.argv[2]
-
-    export_studies_to_json(patient_id, output_file)
+    parser = argparse.ArgumentParser(description="Export patient studies from MongoDB to a JSON or NDJSON file.")
+    parser.add_argument("patient_ids", nargs="+", metavar="patient_id")
+    parser.add_argument("output_file")
+    parser.add_argument("--ndjson", action="store_true", default=None,
+                        help="Write one record per line (default for .ndjson and .jsonl files)")
+    parser.add_argument("--batch-size", type=int, help="Documents fetched per cursor batch")
+    args = parser.parse_args()
+
+    export_studies_to_json(args.patient_ids, args.output_file, ndjson=args.ndjson, batch_size=args.batch_size)
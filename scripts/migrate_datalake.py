@@ -0,0 +1,61 @@
+import argparse
+import sys
+from contextlib import closing
+from pathlib import Path
+import psycopg2
+
+# Make the app package importable when run as `python scripts/migrate_datalake.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.core.config import config
+from app.core.schema import (
+    MIGRATIONS, SCHEMA_VERSION, applied_versions, apply_migrations, explain_hot_queries, is_partitioned,
+    partition_variants,
+)
+
+def migrate_datalake(target=None, partitions=None, explain=False, status=False):
+    """
+    Apply the Datalake schema to the database of the DB_* settings, optionally
+    partition the variants by subject, and check the hot queries with EXPLAIN.
+    Returns 1 if an EXPLAIN check failed, 0 otherwise.
+    """
+    with closing(psycopg2.connect(**config.DATABASE)) as conn:
+        if status:
+            applied = set(applied_versions(conn))
+            for version, description, _ in MIGRATIONS:
+                print(f"{version:>3} {'applied' if version in applied else 'pending':<8} {description}")
+            print(f"subject_study_variants partitioned: {is_partitioned(conn, 'subject_study_variants')}")
+            return 0
+
+        applied = apply_migrations(conn, target)
+        if applied:
+            print(f"Applied migrations {', '.join(map(str, applied))}; schema at version {target or SCHEMA_VERSION}")
+        else:
+            print(f"Schema already at version {target or SCHEMA_VERSION}")
+
+        if partitions:
+            if partition_variants(conn, partitions):
+                print(f"Partitioned subject_study_variants by subject into {partitions} partitions")
+            else:
+                print("subject_study_variants is already partitioned")
+
+        if explain:
+            failed = 0
+            for result in explain_hot_queries(conn):
+                indexes = ", ".join(result["indexes"]) or "sequential scan"
+                print(f"{'ok  ' if result['ok'] else 'FAIL'} {result['name']:<36} {indexes}")
+                failed += not result["ok"]
+            return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the Datalake schema migrations (DB_* settings).")
+    parser.add_argument("--target", type=int, help="Migrate up to this version (default: latest)")
+    parser.add_argument("--partition-variants", type=int, metavar="N",
+                        help="Hash-partition subject_study_variants by subject into N partitions")
+    parser.add_argument("--explain", action="store_true",
+                        help="Check with EXPLAIN that the loader's hot queries use indexes")
+    parser.add_argument("--status", action="store_true", help="List the migrations and whether they are applied")
+    args = parser.parse_args()
+
+    sys.exit(migrate_datalake(args.target, args.partition_variants, args.explain, args.status))
@@ -1,57 +1,190 @@
-import re
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import json
+import os
 import sys
+from itertools import islice
 from pathlib import Path
-from parsing_utils import parse_nebula_dna_score  # Assuming this contains the logic you provided earlier
+from parsing_utils import parse_nebula_dna_score
 
-def parse_raw_file(input_file, output_file, patient_id):
-    print(f"parse_raw_file called")
-    # Read raw input file
+# Make the app package importable for the columnar (Arrow/Parquet) output format
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.loaders.columnar import StudyTableWriter, is_columnar_file
+
+RECORD_SEPARATOR = "######"
+STUDY_URL = "https://example.com"  # Placeholder, replace with real logic if necessary
+
+
+def iter_raw_records(input_file, separator=RECORD_SEPARATOR, read_size=1 << 20):
+    """
+    Stream the non-empty records of a raw dump, split on `separator`, without reading
+    the whole file into memory.
+    """
     with open(input_file, "r") as infile:
-        raw_data = infile.read()
+        pending = ""
+        while True:
+            chunk = infile.read(read_size)
+            if not chunk:
+                break
+            pending += chunk
+            *records, pending = pending.split(separator)
+            for record in records:
+                record = record.strip()
+                if record:
+                    yield record
+        pending = pending.strip()
+        if pending:
+            yield pending
 
-    # Split records by the separator
-    records = raw_data.split("######")
-    print(f"{len(records)} records read")
-    structured_records = []
 
-    for record in records:
-        record = record.strip()
-        if not record:
-            continue
+def iter_chunks(records, chunk_size):
+    """
+    Group records into lists of at most `chunk_size`. Yields (first, chunk) pairs, where
+    `first` is the 1-based number of the chunk's first record in the input.
+    """
+    first = 1
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield first, chunk
+        first += len(chunk)
 
-        try:
-            # Parse the study using existing logic
-            study_url = "https://example.com"  # Placeholder, replace with real logic if necessary
-            print(f"Parsed study_url: {study_url}")
-            known_tags = []  # Pass known tags if required
-            parsed_study = parse_nebula_dna_score(patient_id, study_url, record, known_tags=known_tags)
-            print(f"Parsed parsed_study: {parsed_study}")
-        
-            if not parsed_study:
-                print(f"Skipping empty or unparseable record: {record[:50]}...")
-                continue
-
-            # Add to structured records
-            structured_records.append(parsed_study)
 
+def parse_records(records, patient_id, known_tags=()):
+    """
+    Parse a list of raw records. Returns one (parsed_study, error) pair per record.
+    """
+    results = []
+    for record in records:
+        try:
+            results.append((parse_nebula_dna_score(patient_id, STUDY_URL, record, known_tags=known_tags), None))
         except Exception as e:
-            print(f"Error parsing record: {record[:50]}... - {e}")
-            continue
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
 
-    # Write the structured records to the output file
-    with open(output_file, "w") as outfile:
-        json.dump(structured_records, outfile, indent=4)
 
-    print(f"Structured records written to {output_file}")
+class StudyArrayWriter:
+    """
+    Writes parsed studies as a JSON array, one at a time, with the same layout as
+    json.dump(studies, outfile, indent=4).
+    """
+
+    def __init__(self, output_file):
+        self.outfile = open(output_file, "w")
+        self.count = 0
+
+    def write(self, study):
+        self.outfile.write("[\n    " if self.count == 0 else ",\n    ")
+        self.outfile.write(json.dumps(study, indent=4).replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        self.outfile.write("\n]" if self.count else "[]")
+        self.outfile.close()
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python parse_raw_file.py <input_file> <output_file> <patient_id>")
-        sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    patient_id = sys.argv[3]
+def _iter_chunk_results(chunks, patient_id, known_tags, workers, ordered):
+    """
+    Parse (first, chunk) pairs of records on a process pool, keeping at most 2 chunks per
+    worker in flight. Yields (first, chunk, results), in input order when `ordered` is set.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        chunks = iter(chunks)
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < workers * 2:
+                item = next(chunks, None)
+                if item is None:
+                    exhausted = True
+                    break
+                first, chunk = item
+                in_flight.append((first, chunk, executor.submit(parse_records, chunk, patient_id, known_tags)))
+            if not in_flight:
+                return
+
+            if ordered:
+                first, chunk, future = in_flight.popleft()
+                yield first, chunk, future.result()
+            else:
+                wait([future for _, _, future in in_flight], return_when=FIRST_COMPLETED)
+                for first, chunk, future in [item for item in in_flight if item[2].done()]:
+                    in_flight.remove((first, chunk, future))
+                    yield first, chunk, future.result()
+
+
+def parse_raw_file(input_file, output_file, patient_id, workers=1, chunk_size=64, ordered=True, errors_file=None):
+    """
+    Parse a raw dump of Nebula DNA score records into a subject study file: JSON, or
+    Arrow IPC / Parquet when the output file name ends in .arrow, .feather, .ipc or .parquet.
+    - workers: Number of parser processes (1 parses in this process, 0 uses all cores).
+    - chunk_size: Number of records sent to a worker at a time.
+    - ordered: Keep the input order in the output; otherwise write records as they finish.
+    - errors_file: Optional JSON file listing the records that failed to parse.
+    Returns counts of records read, parsed, skipped (no variants table) and failed.
+    """
+    workers = workers or os.cpu_count()
+    known_tags = ()  # Pass known tags if required
+    stats = {"records": 0, "parsed": 0, "skipped": 0, "failed": 0}
+    failures = []
+
+    chunks = iter_chunks(iter_raw_records(input_file), chunk_size)
+    if workers == 1:
+        results = ((first, chunk, parse_records(chunk, patient_id, known_tags)) for first, chunk in chunks)
+    else:
+        results = _iter_chunk_results(chunks, patient_id, known_tags, workers, ordered)
+
+    # .arrow/.feather/.ipc and .parquet outputs are written as columnar study files
+    writer = StudyTableWriter(output_file) if is_columnar_file(output_file) else StudyArrayWriter(output_file)
+    try:
+        for first, chunk, chunk_results in results:
+            for i, (record, (parsed_study, error)) in enumerate(zip(chunk, chunk_results)):
+                stats["records"] += 1
+                if error is not None:
+                    stats["failed"] += 1
+                    # The record's position in the input, also when chunks finish out of order
+                    failures.append({"record": first + i, "error": error, "text": record[:50]})
+                elif not parsed_study:
+                    stats["skipped"] += 1
+                else:
+                    stats["parsed"] += 1
+                    writer.write(parsed_study)
+    finally:
+        writer.close()
+
+    failures.sort(key=lambda failure: failure["record"])
+    if errors_file:
+        with open(errors_file, "w") as outfile:
+            json.dump(failures, outfile, indent=4)
+
+    print(f"Structured records written to {output_file}: {stats['parsed']} parsed, "
+          f"{stats['skipped']} skipped, {stats['failed']} failed of {stats['records']} records")
+    for failure in failures[:10]:
+        print(f"Error parsing record {failure['record']}: {failure['text']}... - {failure['error']}")
+    if len(failures) > 10:
+        print(f"... and {len(failures) - 10} more failures")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a raw Nebula DNA score dump into subject study JSON.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("patient_id")
+    parser.add_argument("--workers", type=int, default=1, help="Parser processes (1 = serial, 0 = all cores)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Records sent to a worker at a time")
+    parser.add_argument("--unordered", action="store_true", help="Write records as they finish instead of in input order")
+    parser.add_argument("--errors-file", help="Write the records that failed to parse to this JSON file")
+    args = parser.parse_args()
 
-    parse_raw_file(input_file, output_file, patient_id)
+    parse_raw_file(
+        args.input_file,
+        args.output_file,
+        args.patient_id,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        ordered=not args.unordered,
+        errors_file=args.errors_file,
+    )
@@ -0,0 +1 @@
+from .parse_nebula_dna_score import parse_nebula_dna_score
@@ -0,0 +1,180 @@
+"""
+scripts/parsing_utils/nebula_parser.py
+
+Single-pass parser engine for Nebula DNA score records.
+
+The record is scanned once for the section markers (SHARE, STUDY SUMMARY, ...), then
+each field is read with a precompiled pattern anchored at its marker instead of
+searching the whole record again. Known tags are held in a set, variant rows are
+parsed with string operations, and debug messages are only formatted when DEBUG
+logging is enabled.
+
+The output is identical to `parse_nebula_dna_score_legacy`.
+"""
+from functools import lru_cache
+import logging
+import re
+import unidecode
+
+logger = logging.getLogger(__name__)
+
+_MARKERS = re.compile(r"SHARE|STUDY SUMMARY|STUDY DESCRIPTION|YOUR RESULT|your personal genetic score")
+
+_STUDY_NAME = re.compile(r"SHARE\s+(.+?\(\w+, \d{4}\))", re.S)
+_TAGS_SECTION = re.compile(r"SHARE\s+(.+?)STUDY SUMMARY", re.S)
+_SUMMARY = re.compile(r"STUDY SUMMARY\s+([^\n]+)")
+_DESCRIPTION = re.compile(r"STUDY DESCRIPTION\s+(.*?)\s+DID YOU KNOW\?", re.S)
+_PERCENTILE = re.compile(r"YOUR RESULT\s+(\d+)(?:th|st|nd|rd)?\s+PERCENTILE")
+_GENETIC_SCORE = re.compile(r"your personal genetic score.*?([\d.]+)")
+_PARENTHESIZED = re.compile(r"\s*\(.*?\)")
+
+_TABLE_5_COLUMNS = "VARIANT\nYOUR GENOTYPE\nEFFECT SIZE\nVARIANT FREQUENCY\nSIGNIFICANCE"
+_TABLE_6_COLUMNS = "VARIANT\nYOUR GENOTYPE\nGENE\nEFFECT SIZE\nVARIANT FREQUENCY\nSIGNIFICANCE"
+
+
+def _first_match(pattern, text, positions):
+    # Same result as pattern.search(text): every match of these patterns starts at a marker
+    for position in positions:
+        match = pattern.match(text, position)
+        if match:
+            return match
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class NebulaDnaScoreParser:
+    """
+    Parses Nebula DNA score records for a fixed set of known tags.
+    """
+
+    def __init__(self, known_tags=()):
+        self.known_tags = frozenset(known_tags)
+
+    def parse(self, patient_id, study_url, text):
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"Parsing {len(text)} characters of text for the study: {study_url}")
+
+        markers = {}
+        for match in _MARKERS.finditer(text):
+            marker, position = match.group(), match.start()
+            markers.setdefault(marker, []).append(position)
+            # The only way two markers can overlap: "STUDY SUMMARY" + "OUR RESULT"
+            if marker == "STUDY SUMMARY" and text.startswith("YOUR RESULT", position + 12):
+                markers.setdefault("YOUR RESULT", []).append(position + 12)
+        share = markers.get("SHARE", ())
+
+        # Study details
+        study_match = _first_match(_STUDY_NAME, text, share)
+        study_name = unidecode.unidecode(study_match.group(1).strip()) if study_match else None
+
+        # Tags: lines between "SHARE" and "STUDY SUMMARY" that are known tags
+        tags = []
+        tags_section_match = _first_match(_TAGS_SECTION, text, share)
+        if tags_section_match:
+            known_tags = self.known_tags
+            for line in tags_section_match.group(1).splitlines():
+                line = line.strip()
+                if line in known_tags:
+                    tags.append(line)
+
+        summary_match = _first_match(_SUMMARY, text, markers.get("STUDY SUMMARY", ()))
+        if not summary_match:
+            raise ValueError(f"No study summary found for the study: {study_url}")
+        study_summary = summary_match.group(1).strip()
+
+        description_match = _first_match(_DESCRIPTION, text, markers.get("STUDY DESCRIPTION", ()))
+        if not description_match:
+            raise ValueError(f"No study description found for the study: {study_url}")
+        study_description = description_match.group(1).strip()
+
+        if debug:
+            logger.debug(f"Parsed study name: {study_name}, tags: {tags}, summary of {len(study_summary)} "
+                         f"and description of {len(study_description)} characters")
+
+        study_info = {
+            "name": study_name,
+            "summary": study_summary,
+            "description": study_description,
+            "url": study_url,
+            "tags": tags
+        }
+
+        # Score details
+        percentile_match = _first_match(_PERCENTILE, text, markers.get("YOUR RESULT", ()))
+        percentile = int(percentile_match.group(1)) if percentile_match else None
+
+        genetic_score_match = _first_match(_GENETIC_SCORE, text, markers.get("your personal genetic score", ()))
+        genetic_score = float(genetic_score_match.group(1).strip('.')) if genetic_score_match else None
+
+        score_info = {
+            "percentile": percentile,
+            "genetic-score": genetic_score
+        }
+
+        # Variants table
+        ncol = 5
+        variant_table_start = text.find(_TABLE_5_COLUMNS)
+        if variant_table_start == -1:
+            ncol = 6
+            variant_table_start = text.find(_TABLE_6_COLUMNS)
+            if variant_table_start == -1:
+                if debug:
+                    logger.debug("Variant table not found. Unable to parse")
+                return None
+
+        variant_lines = text[variant_table_start:].splitlines()
+        variants = []
+
+        # Data rows follow the header, ncol lines per row
+        for i in range(ncol, len(variant_lines), ncol):
+            line = variant_lines[i]
+            # Stop at the first row that does not start with 'rs' followed by a digit
+            if not (line.startswith("rs") and line[2:3].isdecimal()):
+                if debug:
+                    logger.debug(f"Invalid variant: {line}")
+                break
+
+            j = i + 1
+            genotype = variant_lines[j].replace("YOUR ", "").strip()
+
+            # Skip the GENE column if present
+            if ncol == 6:
+                j += 1
+
+            j += 1
+            effect_size = variant_lines[j]
+            if "(" in effect_size:
+                effect_size = _PARENTHESIZED.sub("", effect_size)
+
+            variants.append({
+                "variant": line.strip(),
+                "genotype": genotype,
+                "effect-size": _to_float(effect_size.strip()),
+                "variant-frequency": _to_float(variant_lines[j + 1].replace("%", "").strip()),
+                "significance": variant_lines[j + 2].strip()
+            })
+
+        if debug:
+            logger.debug(f"Parser successfully parsed the study {study_name} with {len(variants)} variants")
+
+        return {
+            "patient_id": patient_id,
+            "study": study_info,
+            "score": score_info,
+            "variants": variants
+        }
+
+
+@lru_cache(maxsize=32)
+def get_parser(known_tags=()):
+    """
+    Returns a parser for the given known tags (as a tuple), reused across records.
+    """
+    return NebulaDnaScoreParser(known_tags)
@@ -5,8 +5,21 @@ import json
 import re
 import unidecode
 import logging
+from .nebula_parser import get_parser
 
 def parse_nebula_dna_score(patient_id, study_url, text, known_tags=[]):
+    """
+    Parse one Nebula DNA score record into the subject study structure used by the loader.
+    Runs on the single-pass engine in `nebula_parser`; the output is identical to
+    `parse_nebula_dna_score_legacy`.
+    """
+    return get_parser(tuple(known_tags)).parse(patient_id, study_url, text)
+
+
+def parse_nebula_dna_score_legacy(patient_id, study_url, text, known_tags=[]):
+    """
+    Original multi-pass implementation, kept as the reference for equivalence checks.
+    """
     print(f"parse_nebula_dna_score called")
     logging.debug(f"Utility method parse_nebula_dna_score called with {len(text)} characters of text to parse for the study: {study_url}")
 
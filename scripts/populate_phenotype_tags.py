@@ -1,5 +1,12 @@
+import sys
+from contextlib import closing
+from pathlib import Path
 import psycopg2
 
+# Make the app package importable when run as `python scripts/populate_phenotype_tags.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.loaders.phenotype_tags import PhenotypeTagDictionary
+
 DB_CONFIG = {
     "dbname": "vitaledge_datalake",
     "user": "samseatt",
@@ -14,53 +21,27 @@ def add_phenotype_tags(tags):
     - tags: List of tag strings to add.
     """
     try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-
-        # Query to check if a tag exists
-        check_query = "SELECT id FROM phenotype_tags WHERE name = %s;"
-
-        # Query to insert a new tag
-        insert_query = "INSERT INTO phenotype_tags (name) VALUES (%s) RETURNING id;"
-
-        for tag in tags:
-            # Check if the tag already exists
-            cursor.execute(check_query, (tag,))
-            result = cursor.fetchone()
-
-            if result:
-                tag_id = result[0]
-                print(f"Tag '{tag}' already exists with ID {tag_id}.")
-            else:
-                # Insert the tag if it doesn't exist
-                cursor.execute(insert_query, (tag,))
-                tag_id = cursor.fetchone()[0]
+        # All missing tags are inserted with one statement
+        dictionary = PhenotypeTagDictionary(lambda: closing(psycopg2.connect(**DB_CONFIG)))
+        for tag, tag_id, inserted in dictionary.upsert(tags):
+            if inserted:
                 print(f"Tag '{tag}' added with ID {tag_id}.")
-
-        # Commit the transaction
-        conn.commit()
+            else:
+                print(f"Tag '{tag}' already exists with ID {tag_id}.")
 
     except psycopg2.Error as e:
         print(f"Database error: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 if __name__ == "__main__":
     # Example list of tags to add
     tags_to_add = [
-        "Mouth", 
-        "Autoimmunity", 
-        "Eyes", 
-        "Sleep", 
-        "Mind", 
-        "Skin", 
+        "Mouth",
+        "Autoimmunity",
+        "Eyes",
+        "Sleep",
+        "Mind",
+        "Skin",
         "Heart"
     ]
 
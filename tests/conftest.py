@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The tests import the app package and the scripts' parsing_utils package from the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "scripts")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
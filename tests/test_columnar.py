@@ -0,0 +1,88 @@
+import pytest
+from app.loaders.genomic_studies import prepare_subject_study_rows
+
+pytest.importorskip("pyarrow")
+
+from app.loaders.columnar import StudyTable, StudyTableWriter, iter_study_tables, studies_to_table  # noqa: E402
+
+
+def _records():
+    return [
+        {
+            "patient_id": "p1",
+            "study": {
+                "name": "Myopia (Tedja, 2018)",
+                "summary": "Summary",
+                "description": "Description",
+                "url": "https://example.org/1",
+                "category": "Eyes",
+                "tags": ["Eyes", "Vision"],
+            },
+            "score": {"genetic-score": 1.42, "percentile": 73},
+            "variants": [
+                {"variant": "rs1", "genotype": "AG", "gene": "GJD2", "effect-size": 0.12,
+                 "effect-polarity": "+", "variant-frequency": 12.5, "significance": "1.2 x 10-8"},
+                {"variant": "rs2", "genotype": "TT", "gene": None, "effect-size": None,
+                 "effect-polarity": None, "variant-frequency": None, "significance": "3 x 10-12"},
+            ],
+        },
+        {
+            "patient_id": "p1",
+            "study": {"name": "No variants", "tags": []},
+            "score": {"genetic-score": -0.5, "percentile": 2},
+            "variants": [],
+        },
+        {
+            "patient_id": "p2",
+            "study": {"name": "Myopia (Tedja, 2018)", "summary": "Summary", "description": "Description",
+                      "url": "https://example.org/1", "category": "Eyes", "tags": ["Eyes"]},
+            "score": {"genetic-score": 0.3, "percentile": 51},
+            "variants": [
+                {"variant": "rs3", "genotype": "CC", "gene": "RASGRF1", "effect-size": -0.05,
+                 "effect-polarity": "-", "variant-frequency": 40.0, "significance": "5 x 10-9"},
+            ],
+        },
+    ]
+
+
+def test_stage_rows_match_json_rows():
+    records = _records()
+    study_rows, tag_rows, variant_rows = prepare_subject_study_rows(records)
+    table_study_rows, table_tag_rows, variant_table = StudyTable(studies_to_table(records)).stage_rows()
+    assert table_study_rows == study_rows
+    assert table_tag_rows == tag_rows
+    assert [tuple(row.values()) for row in variant_table.to_pylist()] == variant_rows
+
+
+def test_to_records_round_trip():
+    records = _records()
+    converted = StudyTable(studies_to_table(records)).to_records()
+    assert prepare_subject_study_rows(converted) == prepare_subject_study_rows(records)
+    assert "variants" not in StudyTable(studies_to_table(records)).to_records(variants=False)[0]
+
+
+def test_concat_and_value_count():
+    records = _records()
+    table = StudyTable.concat([StudyTable(studies_to_table(records[:1])), StudyTable(studies_to_table(records[1:]))])
+    assert len(table) == 3
+    assert table.value_count("variants") == 3
+    assert table.value_count("tags") == 3
+    # Variant `ord`/`seq` are positions in the concatenated table
+    _, _, variant_table = table.stage_rows()
+    assert [(row["ord"], row["seq"]) for row in variant_table.to_pylist()] == [(0, 0), (0, 1), (2, 0)]
+
+
+@pytest.mark.parametrize("file_name", ["studies.arrow", "studies.parquet"])
+def test_file_round_trip(tmp_path, file_name):
+    records = _records() * 3
+    path = tmp_path / file_name
+    writer = StudyTableWriter(path, batch_size=4)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    assert writer.count == 9
+
+    tables = list(iter_study_tables(path, batch_size=2))
+    assert all(len(table) <= 2 for table in tables)
+    assert sum(len(table) for table in tables) == 9
+    assert StudyTable.concat(tables).stage_rows()[0] == prepare_subject_study_rows(records)[0]
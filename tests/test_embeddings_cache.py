@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+import httpx
+import pytest
+from app.services.embeddings_cache import EmbeddingsCache
+from app.services.embeddings_service import EmbeddingsService
+
+
+def test_memory_lru():
+    cache = EmbeddingsCache("model", max_size=2)
+    cache.put_many(["a", "b"], [[1.0], [2.0]])
+    assert cache.get_many(["a"]) == [[1.0]]  # "a" is now the most recently used
+    cache.put_many(["c"], [[3.0]])
+    assert cache.get_many(["a", "b", "c"]) == [[1.0], None, [3.0]]
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+    assert not cache.persistent
+
+
+def test_keys_depend_on_the_model():
+    assert EmbeddingsCache("m1").key("text") != EmbeddingsCache("m2").key("text")
+
+
+def test_sqlite_store_survives_restarts(tmp_path):
+    path = str(tmp_path / "cache" / "embeddings.db")
+    cache = EmbeddingsCache("model", max_size=1, db_path=path)
+    assert cache.persistent
+    cache.put_many(["a", "b"], [[0.5, 0.25], [1.5, 2.5]])
+    # "a" was evicted from memory but is read back from disk
+    assert cache.get_many(["a", "b", "c"]) == [[0.5, 0.25], [1.5, 2.5], None]
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    reopened = EmbeddingsCache("model", db_path=path)
+    assert reopened.get_many(["b", "a", "b"]) == [[1.5, 2.5], [0.5, 0.25], [1.5, 2.5]]
+    assert reopened.stats()["disk_hits"] == 3
+    reopened.close()
+
+
+def _service(cache, calls):
+    async def handler(request):
+        texts = json.loads(request.content)["texts"]
+        calls.extend(texts)
+        return httpx.Response(200, json={"embeddings": [[float(len(text))] for text in texts]})
+
+    return EmbeddingsService(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), cache=cache)
+
+
+@pytest.mark.asyncio
+async def test_service_sends_each_uncached_text_once():
+    calls = []
+    service = _service(EmbeddingsCache("model"), calls)
+    assert await service.generate_embeddings(["a", "bb", "a"], batch_size=1) == [[1.0], [2.0], [1.0]]
+    assert await service.generate_embeddings(["bb", "ccc"]) == [[2.0], [3.0]]
+    assert calls == ["a", "bb", "ccc"]
+
+
+@pytest.mark.asyncio
+async def test_service_uncached_requests_bypass_the_cache():
+    calls = []
+    cache = EmbeddingsCache("model")
+    service = _service(cache, calls)
+    assert await service.generate_embeddings(["query"], cached=False) == [[5.0]]
+    assert await service.generate_embeddings(["query"], cached=False) == [[5.0]]
+    assert calls == ["query", "query"]
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_service_runs_sqlite_off_the_event_loop(tmp_path):
+    cache = EmbeddingsCache("model", max_size=1, db_path=str(tmp_path / "embeddings.db"))
+    loop_thread = threading.get_ident()
+    disk_threads = set()
+    read_from_disk = cache._read_from_disk
+
+    def tracked(keys):
+        disk_threads.add(threading.get_ident())
+        return read_from_disk(keys)
+
+    cache._read_from_disk = tracked
+    calls = []
+    service = _service(cache, calls)
+    await service.generate_embeddings(["a", "b"])
+    assert await service.generate_embeddings(["a", "b"]) == [[1.0], [1.0]]
+    assert calls == ["a", "b"]
+    assert disk_threads and loop_thread not in disk_threads
+    cache.close()
@@ -0,0 +1,13 @@
+from app.loaders.fingerprints import fingerprint, subject_study_fingerprints
+
+
+def test_fingerprints():
+    assert fingerprint("a", 1, None) == fingerprint("a", 1, None)
+    assert fingerprint("a", 1) != fingerprint("a", "1")
+    text = ("name", None, None, None, None)
+    study_fingerprint, whole = subject_study_fingerprints(text, (1.0, 50), ["Eyes"], [])
+    assert study_fingerprint == fingerprint(*text)
+    # The study fingerprint only covers the study text
+    assert subject_study_fingerprints(text, (2.0, 50), [], [("rs1",)])[0] == study_fingerprint
+    assert subject_study_fingerprints(text, (2.0, 50), ["Eyes"], [])[1] != whole
+    assert subject_study_fingerprints(text, (1.0, 50), ["Eyes"], [("rs1",)])[1] != whole
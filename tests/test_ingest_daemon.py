@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+import pytest
+from app.services import ingest_daemon as ingest_module
+from app.services.ingest_daemon import IngestDaemon
+
+
+@pytest.fixture
+def folders(tmp_path):
+    names = ("queued", "processing", "archive", "error")
+    for name in names:
+        (tmp_path / name).mkdir()
+    return {name: str(tmp_path / name) for name in names}
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    loaded = []
+
+    async def fake_load(path, progress=None):
+        await asyncio.sleep(0.01)
+        loaded.append(os.path.basename(path))
+        if "bad" in path:
+            raise ValueError("bad file")
+
+    monkeypatch.setattr(ingest_module, "load_subject_study_file", fake_load)
+    return loaded
+
+
+def _queue(folders, name, age=10.0):
+    path = os.path.join(folders["queued"], name)
+    with open(path, "w") as outfile:
+        outfile.write("[]")
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+
+
+def _daemon(folders, **kwargs):
+    kwargs = {"concurrency": 2, "poll_interval": 0.02, "settle_seconds": 0.3, **kwargs}
+    return IngestDaemon(folders["queued"], folders["processing"], folders["archive"], folders["error"], **kwargs)
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_ingests_settled_files_from_one_scan(folders, loaded):
+    for i in range(8):
+        _queue(folders, f"s{i}.json", age=10 + i)
+    _queue(folders, "bad.json")
+    _queue(folders, "notes.txt")
+    daemon = _daemon(folders)
+    scans = []
+    list_queued = daemon._list_queued
+    daemon._list_queued = lambda: scans.append(1) or list_queued()
+    await daemon.start()
+    try:
+        await _wait_for(lambda: len(loaded) == 9)
+        await _wait_for(lambda: not daemon._in_flight)
+    finally:
+        await daemon.stop()
+    assert loaded[0] == "s7.json"  # Oldest first
+    assert sorted(os.listdir(folders["archive"])) == [f"s{i}.json" for i in range(8)]
+    assert os.listdir(folders["error"]) == ["bad.json"]
+    assert os.listdir(folders["queued"]) == ["notes.txt"]
+    assert (daemon.files_succeeded, daemon.files_failed) == (8, 1)
+    # All nine files were claimed from the first scan, not one scan per claim batch
+    assert len(scans) <= 3
+
+
+@pytest.mark.asyncio
+async def test_waits_for_files_to_settle(folders, loaded):
+    _queue(folders, "fresh.json", age=0)
+    daemon = _daemon(folders)
+    await daemon.start()
+    try:
+        await asyncio.sleep(0.1)
+        assert loaded == []
+        await _wait_for(lambda: loaded == ["fresh.json"])
+    finally:
+        await daemon.stop()
+
+
+@pytest.mark.asyncio
+async def test_survives_scan_and_claim_errors(folders, loaded, monkeypatch):
+    _queue(folders, "locked.json")
+    _queue(folders, "ok.json")
+    rename = os.rename
+
+    def failing_rename(source, target):
+        if "locked" in source:
+            raise PermissionError(13, "Permission denied")
+        return rename(source, target)
+
+    monkeypatch.setattr(ingest_module.os, "rename", failing_rename)
+    daemon = _daemon(folders)
+    list_queued = daemon._list_queued
+    failures = [RuntimeError("scan failed")]
+
+    def failing_list_queued():
+        if failures:
+            raise failures.pop()
+        return list_queued()
+
+    daemon._list_queued = failing_list_queued
+    await daemon.start()
+    try:
+        await _wait_for(lambda: loaded == ["ok.json"])
+        await asyncio.sleep(0.1)
+        assert daemon.stats()["running"]
+    finally:
+        await daemon.stop()
+    assert os.listdir(folders["queued"]) == ["locked.json"]
+
+
+@pytest.mark.asyncio
+async def test_requeues_interrupted_files(folders, loaded):
+    with open(os.path.join(folders["processing"], "interrupted.json"), "w") as outfile:
+        outfile.write("[]")
+    daemon = _daemon(folders, settle_seconds=0)
+    await daemon.start()
+    try:
+        await _wait_for(lambda: loaded == ["interrupted.json"])
+    finally:
+        await daemon.stop()
+
+
+@pytest.mark.asyncio
+async def test_ingests_every_loader_format(folders, loaded):
+    for name in ("a.ndjson", "b.jsonl", "c.parquet", "d.arrow", "e.json.part"):
+        _queue(folders, name)
+    daemon = _daemon(folders)
+    await daemon.start()
+    try:
+        await _wait_for(lambda: len(loaded) == 4)
+        await _wait_for(lambda: not daemon._in_flight)
+    finally:
+        await daemon.stop()
+    assert sorted(loaded) == ["a.ndjson", "b.jsonl", "c.parquet", "d.arrow"]
+    assert os.listdir(folders["queued"]) == ["e.json.part"]
+
+
+@pytest.mark.asyncio
+async def test_recovery_keeps_a_newer_queued_file(folders, loaded):
+    with open(os.path.join(folders["processing"], "studies.ndjson"), "w") as outfile:
+        outfile.write("interrupted")
+    _queue(folders, "studies.ndjson", age=0)
+    daemon = _daemon(folders, poll_interval=10)
+    await daemon.start()
+    try:
+        queued = sorted(os.listdir(folders["queued"]))
+        assert len(queued) == 2 and "studies.ndjson" in queued
+        contents = set()
+        for name in queued:
+            with open(os.path.join(folders["queued"], name)) as infile:
+                contents.add(infile.read())
+        assert contents == {"interrupted", "[]"}
+    finally:
+        await daemon.stop()
@@ -0,0 +1,141 @@
+"""
+NebulaDnaScoreParser must produce exactly what parse_nebula_dna_score_legacy does.
+"""
+import json
+import random
+import pytest
+from parsing_utils import parse_nebula_dna_score
+from parsing_utils.nebula_parser import NebulaDnaScoreParser
+from parsing_utils.parse_nebula_dna_score import parse_nebula_dna_score_legacy
+
+KNOWN_TAGS = ["Mouth", "Eyes", "Sleep", "Mind", "Skin", "Heart"]
+
+TABLE_5 = "VARIANT\nYOUR GENOTYPE\nEFFECT SIZE\nVARIANT FREQUENCY\nSIGNIFICANCE\n"
+TABLE_6 = "VARIANT\nYOUR GENOTYPE\nGENE\nEFFECT SIZE\nVARIANT FREQUENCY\nSIGNIFICANCE\n"
+
+SAMPLE = (
+    "SHARE\n"
+    "Genome-wide association study of myopia (Tedja, 2018)\n"
+    "Eyes\n"
+    "Other\n"
+    "STUDY SUMMARY\n"
+    "Myopia is associated with variants in genes involved in eye development.\n"
+    "YOUR RESULT\n"
+    "73rd\n"
+    "PERCENTILE\n"
+    "Based on the variants below, your personal genetic score is 1.42.\n"
+    "STUDY DESCRIPTION\n"
+    "The study analysed 160,420 participants.\nIt identified 161 loci.\n"
+    "DID YOU KNOW?\n"
+    "Myopia is becoming more common.\n"
+    + TABLE_6
+    + "rs524952\nYOUR AT\nGJD2\n0.06 (↑)\n47%\n1.8 x 10-87\n"
+    + "rs7744813\nYOUR AC\nKCNQ5\n-0.05 (↓)\n59%\n2.4 x 10-41\n"
+    + "rs1\nYOUR GG\n\nn/a\nabc\n3 x 10-5\n"
+    + "END\n"
+)
+
+
+def record(table=TABLE_5, rows=("rs1\nYOUR AG\n0.12\n12.5%\n1.2 x 10-8\n",), head=None):
+    head = head if head is not None else (
+        "SHARE\nStudy name (Smith, 2019)\nEyes\nSTUDY SUMMARY\nA summary.\n"
+        "YOUR RESULT\n41st PERCENTILE\nyour personal genetic score is 0.5\n"
+        "STUDY DESCRIPTION\nA description.\nDID YOU KNOW?\nfact\n"
+    )
+    return head + (table or "") + "".join(rows)
+
+
+EDGE_CASES = {
+    "sample": SAMPLE,
+    "sample_crlf": SAMPLE.replace("\n", "\r\n"),
+    "five_columns": record(),
+    "six_columns": record(TABLE_6, ["rs2\nYOUR  T T\nBRCA1\n1.5 (a) (b)\n7%\n 3 x 10-5 \n"]),
+    "no_table": record(table=None, rows=()),
+    "empty_table": record(rows=()),
+    "stops_at_non_rs_row": record(rows=["rs3\nGG\n(x)\n\n1 x 10-2\n", "rsX\nAG\n0.1\n1%\n1\n"]),
+    "unicode_name": record(head=(
+        "SHARE\nCafé au lait spots (Müller, 2020)\nSkin\nSTUDY SUMMARY\ns\n"
+        "STUDY DESCRIPTION\nd DID YOU KNOW? x\n"
+    )),
+    "name_without_citation": record(head="SHARE\nStudy\nSTUDY SUMMARY\ns\nSTUDY DESCRIPTION\nd\n\nDID YOU KNOW?\n"),
+    "markers_repeated": record(head=(
+        "xSHARE\nSHARE\nTitle (Lee, 2001)\nSHARE\nMind\nSTUDY SUMMARY\n  spaced  \nmore\n"
+        "your personal genetic score is 7\nYOUR RESULT\n9\nSTUDY DESCRIPTION\nd DID YOU KNOW?\n"
+    )),
+    "genetic_score_trailing_dot": record(head=(
+        "SHARE\nT (A, 1999)\nSTUDY SUMMARY\ns\nyour personal genetic score is 1.23.\n"
+        "STUDY DESCRIPTION\nd DID YOU KNOW?\n"
+    )),
+    "truncated_row": record(rows=["rs4\nAG\n0.1\n"]),
+    "missing_summary": record(head="SHARE\nT (A, 1999)\nSTUDY DESCRIPTION\nd DID YOU KNOW?\n"),
+    "missing_description": record(head="SHARE\nT (A, 1999)\nSTUDY SUMMARY\ns\n"),
+}
+
+
+def _outcome(parse, text, known_tags):
+    # Records both parsers reject only need to fail in both; the error type may differ
+    try:
+        return "ok", json.dumps(parse("patient", "https://example.org/study", text, known_tags))
+    except Exception:
+        return "error", None
+
+
+@pytest.mark.parametrize("known_tags", [KNOWN_TAGS, [], ["Eyes"]])
+@pytest.mark.parametrize("name", sorted(EDGE_CASES))
+def test_edge_cases_match_legacy(name, known_tags):
+    text = EDGE_CASES[name]
+    assert _outcome(parse_nebula_dna_score, text, known_tags) == _outcome(parse_nebula_dna_score_legacy, text, known_tags)
+
+
+def test_sample_record():
+    result = NebulaDnaScoreParser(KNOWN_TAGS).parse("patient", "https://example.org/study", SAMPLE)
+    assert result["study"]["name"] == "Genome-wide association study of myopia (Tedja, 2018)"
+    assert result["study"]["tags"] == ["Eyes"]
+    assert result["score"] == {"percentile": 73, "genetic-score": 1.42}
+    assert [variant["variant"] for variant in result["variants"]] == ["rs524952", "rs7744813", "rs1"]
+    assert result["variants"][1]["effect-size"] == -0.05
+    assert result["variants"][2]["effect-size"] is None
+
+
+def _fuzzed_record(rng):
+    parts = []
+    if rng.random() < 0.95:
+        parts.append(rng.choice(["SHARE\n", "SHARE  ", "xSHARE\n"]))
+    parts.append(rng.choice(["Café Study", "Some Study Name", "Study\nwith newline"])
+                 + rng.choice([" (Smith, 2019)", " (Lee 2020)", "", " (O_K, 2001)"]) + "\n")
+    for _ in range(rng.randint(0, 4)):
+        parts.append(rng.choice(KNOWN_TAGS + ["  Eyes  ", "Other", "SHARE"]) + "\n")
+    if rng.random() < 0.93:
+        parts.append("STUDY SUMMARY\n" + rng.choice(["A summary line.", "x", "  spaced  "]) + "\nmore\n")
+    if rng.random() < 0.9:
+        parts.append("YOUR RESULT\n" + str(rng.randint(1, 99)) + rng.choice(["th", "st", "", " "])
+                     + rng.choice(["\nPERCENTILE\n", " PERCENTILE\n", "\n"]))
+    if rng.random() < 0.9:
+        parts.append("Text your personal genetic score is " + rng.choice(["1.23.", "0.5", "...", "7", ""]) + "\n")
+    if rng.random() < 0.93:
+        parts.append("STUDY DESCRIPTION\n" + rng.choice(["Desc body.\nline2", "d"])
+                     + rng.choice(["\n\nDID YOU KNOW?\n", " DID YOU KNOW?", ""]) + "fact\n")
+    ncol = rng.choice([5, 6, 6, 0])
+    if ncol:
+        parts.append(TABLE_5 if ncol == 5 else TABLE_6)
+        for i in range(rng.randint(0, 6)):
+            row = [rng.choice([f"rs{rng.randint(1, 10 ** 6)}", "rsX", "chr1", f"rs{i} extra"]),
+                   rng.choice(["YOUR AG", "GG", "YOUR  T T"])]
+            if ncol == 6:
+                row.append(rng.choice(["BRCA1", ""]))
+            row += [rng.choice(["0.12", "-0.3 (↓)", "1.5 (a) (b)", "n/a", "(x)", " 2 "]),
+                    rng.choice(["12.5%", "7%", "", "abc"]),
+                    rng.choice(["1.2 x 10-8", " 3 x 10-5 "])]
+            parts.append("\n".join(row) + "\n")
+        if rng.random() < 0.3:
+            parts.append(rng.choice(["rs99\nAG\n", "END\n", "rs1\r\nAG\x0bx\n"]))
+    text = "".join(parts)
+    return text.replace("\n", "\r\n") if rng.random() < 0.2 else text
+
+
+def test_fuzzed_records_match_legacy():
+    rng = random.Random(11)
+    for _ in range(2000):
+        text = _fuzzed_record(rng)
+        known_tags = rng.choice([KNOWN_TAGS, [], ["Eyes"]])
+        assert _outcome(parse_nebula_dna_score, text, known_tags) == _outcome(parse_nebula_dna_score_legacy, text, known_tags), text
@@ -0,0 +1,66 @@
+import json
+import pytest
+import parse_raw_file
+
+GOOD = (
+    "SHARE\nStudy {} (Smith, 2019)\nEyes\nSTUDY SUMMARY\nA summary.\n"
+    "YOUR RESULT\n41st PERCENTILE\nyour personal genetic score is 0.5\n"
+    "STUDY DESCRIPTION\nA description.\nDID YOU KNOW?\nfact\n"
+    "VARIANT\nYOUR GENOTYPE\nEFFECT SIZE\nVARIANT FREQUENCY\nSIGNIFICANCE\n"
+    "rs1\nYOUR AG\n0.12\n12.5%\n1.2 x 10-8\n"
+)
+BAD = "SHARE\nBroken {} (Lee, 2001)\nSTUDY DESCRIPTION\nd DID YOU KNOW?\n"
+FAILING = {3, 8, 9}
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    records = [(BAD if number in FAILING else GOOD).format(number) for number in range(1, 11)]
+    path = tmp_path / "raw.txt"
+    path.write_text(f"\n{parse_raw_file.RECORD_SEPARATOR}\n".join(records))
+    return path
+
+
+def _run(raw_file, tmp_path, **kwargs):
+    errors_file = tmp_path / "errors.json"
+    stats = parse_raw_file.parse_raw_file(
+        raw_file, tmp_path / "studies.json", "patient", chunk_size=2, errors_file=errors_file, **kwargs
+    )
+    failures = json.loads(errors_file.read_text())
+    names = [study["study"]["name"] for study in json.loads((tmp_path / "studies.json").read_text())]
+    return stats, failures, names
+
+
+def test_iter_chunks():
+    assert list(parse_raw_file.iter_chunks(iter("abcde"), 2)) == [(1, ["a", "b"]), (3, ["c", "d"]), (5, ["e"])]
+
+
+def test_failures_point_at_the_input_records(raw_file, tmp_path):
+    stats, failures, names = _run(raw_file, tmp_path)
+    assert (stats["records"], stats["parsed"], stats["failed"]) == (10, 7, 3)
+    assert [failure["record"] for failure in failures] == sorted(FAILING)
+    assert all(failure["text"].startswith(f"SHARE\nBroken {failure['record']} ") for failure in failures)
+    assert names == [f"Study {number} (Smith, 2019)" for number in range(1, 11) if number not in FAILING]
+
+
+def test_unordered_failures_point_at_the_input_records(raw_file, tmp_path, monkeypatch):
+    # Chunks completing in reverse order, as they can with --unordered
+    def reversed_results(chunks, patient_id, known_tags, workers, ordered):
+        assert not ordered
+        chunks = list(chunks)
+        for first, chunk in reversed(chunks):
+            yield first, chunk, parse_raw_file.parse_records(chunk, patient_id, known_tags)
+
+    monkeypatch.setattr(parse_raw_file, "_iter_chunk_results", reversed_results)
+    stats, failures, names = _run(raw_file, tmp_path, workers=2, ordered=False)
+    assert stats["failed"] == 3
+    assert [failure["record"] for failure in failures] == sorted(FAILING)
+    assert all(failure["text"].startswith(f"SHARE\nBroken {failure['record']} ") for failure in failures)
+    assert sorted(names) == sorted(f"Study {number} (Smith, 2019)" for number in range(1, 11) if number not in FAILING)
+
+
+def test_unordered_process_pool(raw_file, tmp_path):
+    stats, failures, names = _run(raw_file, tmp_path, workers=2, ordered=False)
+    assert (stats["records"], stats["failed"]) == (10, 3)
+    assert [failure["record"] for failure in failures] == sorted(FAILING)
+    assert len(names) == 7
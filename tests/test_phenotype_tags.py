@@ -0,0 +1,81 @@
+from app.loaders.phenotype_tags import PhenotypeTagDictionary
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((query.split()[0], params))
+        if query.lstrip().startswith("SELECT"):
+            self._rows = list(self.conn.tags.items())
+        else:
+            names = params[0]
+            self._rows = []
+            for name in names:
+                inserted = name not in self.conn.tags
+                self.conn.tags.setdefault(name, len(self.conn.tags) + 1)
+                self._rows.append((name, self.conn.tags[name], inserted))
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    def __init__(self, tags=None):
+        self.tags = dict(tags or {})
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def _no_factory():
+    raise AssertionError("a second connection was borrowed")
+
+
+def test_resolve_uses_the_callers_connection():
+    conn = FakeConnection({"Eyes": 1})
+    tags = PhenotypeTagDictionary(_no_factory)
+    assert tags.resolve(["Vision", "Eyes", "Vision"], conn) == {"Vision": 2, "Eyes": 1}
+    assert [statement for statement, _ in conn.statements] == ["SELECT", "INSERT"]
+    assert conn.commits == 1
+    # Known tags are served from memory
+    assert tags.resolve(["Eyes"], conn) == {"Eyes": 1}
+    assert len(conn.statements) == 2
+
+
+def test_upsert_locks_names_in_sorted_order():
+    conn = FakeConnection()
+    tags = PhenotypeTagDictionary(_no_factory)
+    rows = tags.upsert(["b", "c", "a", "b"], conn)
+    assert conn.statements[-1][1] == (["a", "b", "c"],)
+    assert [(name, inserted) for name, _, inserted in rows] == [("a", True), ("b", True), ("c", True)]
+
+
+def test_defaults_to_the_factory_connection():
+    conn = FakeConnection({"Eyes": 1})
+
+    class Borrowed:
+        def __enter__(self):
+            return conn
+
+        def __exit__(self, *exc):
+            return False
+
+    tags = PhenotypeTagDictionary(Borrowed)
+    assert tags.resolve(["Eyes", "Skin"]) == {"Eyes": 1, "Skin": 2}
+    assert conn.commits == 1
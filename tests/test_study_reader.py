@@ -0,0 +1,84 @@
+import json
+import pytest
+from app.loaders.study_reader import iter_batches, iter_study_records
+
+RECORDS = [
+    {"patient_id": "p1", "study": {"name": "A [x], {y}", "tags": ["Eyes"]}, "score": {"percentile": 12}},
+    {"patient_id": "p1", "study": {"name": "B \"quoted\" \\ name", "tags": []}, "variants": [{"variant": "rs1"}] * 40},
+    {"patient_id": "p2", "study": {"name": "C ünïcode", "tags": None}, "score": {"genetic-score": 1.5e-8}},
+    {"patient_id": "p3", "value": 12345678901234567890},
+]
+
+READ_SIZES = [1, 2, 7, 64, 1 << 16]
+
+
+def _write(tmp_path, text, name="studies.json"):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_array(tmp_path, read_size, indent):
+    path = _write(tmp_path, "  \n" + json.dumps(RECORDS, indent=indent) + "\n")
+    assert list(iter_study_records(path, read_size=read_size)) == RECORDS
+
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_ndjson(tmp_path, read_size, newline):
+    text = newline.join(json.dumps(record) for record in RECORDS) + newline + newline
+    path = _write(tmp_path, text, "studies.ndjson")
+    assert list(iter_study_records(path, read_size=read_size)) == RECORDS
+
+
+def test_ndjson_first_chunk_with_several_records(tmp_path):
+    # The first read holds whole records and the start of another one
+    text = "\n".join(json.dumps(record) for record in RECORDS)
+    path = _write(tmp_path, text, "studies.ndjson")
+    read_size = len(json.dumps(RECORDS[0])) + len(json.dumps(RECORDS[1])) + 10
+    assert list(iter_study_records(path, read_size=read_size)) == RECORDS
+
+
+def test_ndjson_without_trailing_newline(tmp_path):
+    path = _write(tmp_path, json.dumps(RECORDS[0]) + "\n" + json.dumps(RECORDS[1]), "studies.ndjson")
+    assert list(iter_study_records(path, read_size=5)) == RECORDS[:2]
+
+
+@pytest.mark.parametrize("text", ["[]", " [ \n ] "])
+def test_empty_array(tmp_path, text):
+    assert list(iter_study_records(_write(tmp_path, text))) == []
+
+
+@pytest.mark.parametrize("text", ["", "  \n ", "\n" * 10])
+@pytest.mark.parametrize("name", ["studies.json", "studies.ndjson"])
+def test_empty_file_raises(tmp_path, text, name):
+    # Like json.load, so an empty or truncated upload is not loaded as zero studies
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_study_records(_write(tmp_path, text, name), read_size=4))
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}, {"b": ', '[{"a": 1}'])
+def test_truncated_array_raises(tmp_path, text):
+    records = iter_study_records(_write(tmp_path, text), read_size=4)
+    with pytest.raises(json.JSONDecodeError):
+        list(records)
+
+
+def test_records_before_a_decode_error_are_yielded(tmp_path):
+    records = iter_study_records(_write(tmp_path, '[{"a": 1}, {"b": nope}]'), read_size=4)
+    assert next(records) == {"a": 1}
+    with pytest.raises(json.JSONDecodeError):
+        next(records)
+
+
+def test_decode_timings(tmp_path):
+    timings = {}
+    assert list(iter_study_records(_write(tmp_path, json.dumps(RECORDS)), timings=timings)) == RECORDS
+    assert timings["decode"] > 0
+
+
+def test_iter_batches():
+    assert list(iter_batches(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_batches([], 3)) == []
@@ -0,0 +1,117 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from app.api.routes import router
+from app.services import study_reads
+from app.services.study_reads import NotFound, ReadCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(study_reads.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire(clock):
+    cache = ReadCache(max_size=10, ttl=30)
+    cache.put("page", "s1", '"e"', {"items": []})
+    assert cache.get("page") == ('"e"', {"items": []})
+    clock[0] += 31
+    assert cache.get("page") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_page_is_evicted(clock):
+    cache = ReadCache(max_size=2)
+    cache.put("a", "s1", "1", {})
+    cache.put("b", "s1", "2", {})
+    cache.get("a")
+    cache.put("c", "s1", "3", {})
+    assert [cache.get(key) is not None for key in ("a", "b", "c")] == [True, False, True]
+
+
+def test_invalidate_subjects(clock):
+    cache = ReadCache()
+    cache.put("s1 studies", "s1", "1", {})
+    cache.put("s2 studies", "s2", "2", {})
+    cache.put("tag subjects", None, "3", {})
+    cache.invalidate_subjects(["s1", "s3"])
+    # The written subject's pages and the pages spanning subjects go, the others stay
+    assert cache.get("s1 studies") is None
+    assert cache.get("tag subjects") is None
+    assert cache.get("s2 studies") == ("2", {})
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_page_read_before_an_invalidation_is_not_cached(clock):
+    cache = ReadCache()
+    generation = cache.generation
+    cache.invalidate_subjects(["s1"])
+    cache.put("s1 studies", "s1", "1", {"items": ["stale"]}, generation)
+    assert cache.get("s1 studies") is None
+    cache.put("s1 studies", "s1", "2", {"items": ["fresh"]}, cache.generation)
+    assert cache.get("s1 studies") == ("2", {"items": ["fresh"]})
+
+
+def test_page():
+    rows = [(1, "a"), (2, "b"), (3, "c")]
+    assert study_reads._page(rows, ["name"], 2) == ([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], 2)
+    assert study_reads._page(rows, ["name"], 3)[1] is None
+
+
+def test_select_fields():
+    assert study_reads.select_fields(None, study_reads.VARIANT_FIELDS, ["gene"]) == ["gene"]
+    assert study_reads.select_fields(" gene,variant,gene ", study_reads.VARIANT_FIELDS, []) == ["gene", "variant"]
+    with pytest.raises(ValueError):
+        study_reads.select_fields("gene,ssn", study_reads.VARIANT_FIELDS, [])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Subject studies "in the Datalake", read by the patched query
+    rows = {"s1": [(1, "Myopia"), (2, "Height"), (3, "Sleep")]}
+    queries = []
+
+    def query_subject_studies(de_id, names, after, limit):
+        queries.append((de_id, after, limit))
+        if de_id not in rows:
+            raise NotFound(f"Subject not found: {de_id}")
+        return [row for row in rows[de_id] if row[0] > after][:limit + 1]
+
+    monkeypatch.setattr(study_reads, "_query_subject_studies", query_subject_studies)
+    monkeypatch.setattr(study_reads, "read_cache", ReadCache())
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app), rows, queries
+
+
+def test_conditional_requests(client):
+    client, rows, queries = client
+    url = "/studies/subjects/s1/studies?fields=name&limit=2"
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.json()["studies"] == [{"id": 1, "name": "Myopia"}, {"id": 2, "name": "Height"}]
+    assert first.json()["next_after"] == 2
+    etag = first.headers["etag"]
+
+    not_modified = client.get(url, headers={"If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag and not_modified.content == b""
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+    assert len(queries) == 1  # Served from the cache
+
+    # A load writing the subject invalidates its pages; the new content has a new ETag
+    rows["s1"][0] = (1, "Myopia (updated)")
+    study_reads.read_cache.invalidate_subjects(["s1"])
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["studies"][0]["name"] == "Myopia (updated)"
+    assert len(queries) == 2
+
+
+def test_read_errors(client):
+    client, _, _ = client
+    assert client.get("/studies/subjects/unknown/studies").status_code == 404
+    assert client.get("/studies/subjects/s1/studies?fields=ssn").status_code == 400
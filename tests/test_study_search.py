@@ -0,0 +1,104 @@
+import pytest
+from app.services import study_search
+from app.services.pipeline import STUDY_DOCUMENT_CATEGORY
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    async def generate_embeddings(self, texts, cached=True):
+        self.calls.append(texts)
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorDB:
+    def __init__(self, hits):
+        self.hits = hits
+        self.calls = []
+
+    async def search(self, embedding, top_k, filters):
+        self.calls.append((top_k, filters))
+        return self.hits[:top_k]
+
+
+STUDIES = {
+    1: {"id": 1, "name": "Myopia", "category": "Eyes"},
+    2: {"id": 2, "name": "Height", "category": "Body"},
+    3: {"id": 3, "name": "Astigmatism", "category": "Eyes"},
+}
+
+
+@pytest.fixture
+def services(monkeypatch):
+    embeddings = FakeEmbeddings()
+    # Study 4 was indexed but is no longer in the Datalake
+    vectordb = FakeVectorDB([{"id": str(i), "score": 1 - i / 10, "tags": ["t"]} for i in (4, 2, 1, 3)])
+    queries = []
+
+    def query_study_metadata(study_ids, category=None):
+        queries.append((set(study_ids), category))
+        return {i: STUDIES[i] for i in study_ids if i in STUDIES and category in (None, STUDIES[i]["category"])}
+
+    monkeypatch.setattr(study_search, "embeddings_service", embeddings)
+    monkeypatch.setattr(study_search, "vectordb_service", vectordb)
+    monkeypatch.setattr(study_search, "_query_study_metadata", query_study_metadata)
+    study_search.query_embeddings.clear()
+    study_search.search_results.clear()
+    yield embeddings, vectordb, queries
+    study_search.query_embeddings.clear()
+    study_search.search_results.clear()
+
+
+@pytest.mark.asyncio
+async def test_search_joins_metadata_in_vectordb_order(services):
+    _, vectordb, queries = services
+    result = await study_search.search_studies("  myopia   risk ", top_k=3)
+    assert not result["cached"]
+    assert [study["id"] for study in result["results"]] == [2, 1]
+    assert result["results"][0]["score"] == 0.8 and result["results"][0]["tags"] == ["t"]
+    assert vectordb.calls == [(3, {"category": STUDY_DOCUMENT_CATEGORY})]
+    assert queries == [({4, 2, 1}, None)]
+
+
+@pytest.mark.asyncio
+async def test_category_filter_overfetches(services, monkeypatch):
+    _, vectordb, queries = services
+    monkeypatch.setattr(study_search.config, "SEARCH_CATEGORY_OVERFETCH", 3)
+    result = await study_search.search_studies("myopia", top_k=1, category="Eyes", tags=["t", "t"])
+    assert [study["id"] for study in result["results"]] == [1]
+    assert vectordb.calls == [(3, {"category": STUDY_DOCUMENT_CATEGORY, "tags": ["t"]})]
+    assert queries == [({4, 2, 1}, "Eyes")]
+
+
+@pytest.mark.asyncio
+async def test_repeated_searches_are_cached(services):
+    embeddings, vectordb, _ = services
+    first = await study_search.search_studies("myopia", top_k=2)
+    second = await study_search.search_studies(" myopia ", top_k=2)
+    assert second == {"results": first["results"], "cached": True}
+    # A different top_k misses the results cache but reuses the query embedding
+    await study_search.search_studies("myopia", top_k=3)
+    assert embeddings.calls == [["myopia"]]
+    assert len(vectordb.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_empty_query(services):
+    with pytest.raises(ValueError):
+        await study_search.search_studies("   ")
+
+
+def test_ttl_cache(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(study_search.time, "monotonic", lambda: now[0])
+    cache = study_search.TTLCache("test", max_size=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] += 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 1, 2)
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import httpx
+import pytest
+from app.services.vectordb_service import VectorDBService
+
+
+def _service(handler):
+    return VectorDBService(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+async def _documents(count, produced=None, size=0):
+    for i in range(count):
+        if produced is not None:
+            produced.append(i)
+        yield {"id": str(i), "text": "x" * size}
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_chunks_by_documents():
+    bodies = []
+
+    async def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json={"status": "ok"})
+
+    flushed = []
+    totals = await _service(handler).populate_stream(
+        _documents(7), max_documents=3, max_bytes=1 << 20, on_flush=flushed.append
+    )
+    assert [[document["id"] for document in body] for body in bodies] == [["0", "1", "2"], ["3", "4", "5"], ["6"]]
+    assert flushed == [3, 3, 1]
+    assert (totals["documents"], totals["chunks"]) == (7, 3)
+
+
+@pytest.mark.asyncio
+async def test_chunks_by_bytes():
+    bodies = []
+
+    async def handler(request):
+        bodies.append(request.content)
+        return httpx.Response(200, json={"status": "ok"})
+
+    # Each document is about 130 bytes of JSON, so two fit in 300 bytes but not three
+    totals = await _service(handler).populate_stream(_documents(5, size=100), max_documents=100, max_bytes=300)
+    assert [len(json.loads(body)) for body in bodies] == [2, 2, 1]
+    assert all(len(body) <= 300 for body in bodies)
+    assert [document["id"] for body in bodies for document in json.loads(body)] == ["0", "1", "2", "3", "4"]
+    assert (totals["documents"], totals["chunks"]) == (5, 3)
+
+
+@pytest.mark.asyncio
+async def test_sender_error_stops_the_producer():
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        return httpx.Response(500, json={"error": "down"})
+
+    produced = []
+    with pytest.raises(httpx.HTTPStatusError):
+        await _service(handler).populate_stream(
+            _documents(1000, produced), max_documents=1, max_bytes=1 << 20, max_pending_chunks=2
+        )
+    assert len(requests) == 1
+    # The producer stopped within the queue bound instead of draining the iterator
+    assert len(produced) < 10
+
+
+@pytest.mark.asyncio
+async def test_queue_bound_pauses_the_iterator():
+    release = asyncio.Event()
+    sent = []
+
+    async def handler(request):
+        await release.wait()
+        sent.extend(json.loads(request.content))
+        return httpx.Response(200, json={"status": "ok"})
+
+    produced = []
+    task = asyncio.create_task(_service(handler).populate_stream(
+        _documents(50, produced), max_documents=1, max_bytes=1 << 20, max_pending_chunks=2
+    ))
+    await asyncio.sleep(0.1)
+    # One chunk being sent, two queued, one waiting to be queued
+    assert not task.done()
+    assert len(produced) == 4
+    release.set()
+    totals = await task
+    assert (totals["documents"], totals["chunks"]) == (50, 50)
+    assert [document["id"] for document in sent] == [str(i) for i in range(50)]
+
+
+@pytest.mark.asyncio
+async def test_send_time_excludes_the_producer():
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        return httpx.Response(500 if b'"id":"3"' in request.content else 200, json={})
+
+    async def slow_documents():
+        for i in range(4):
+            await asyncio.sleep(0.05)  # e.g. reading and embedding the next batch
+            yield {"id": str(i)}
+
+    sends = []
+    with pytest.raises(httpx.HTTPStatusError):
+        await _service(handler).populate_stream(slow_documents(), max_documents=1, on_send=sends.append)
+    # Failed requests count too; the producer's time does not
+    assert len(sends) == 4
+    assert all(seconds >= 0.02 for seconds in sends)
+    assert sum(sends) < 0.15